@@ -0,0 +1,69 @@
+"""Measures records per second of the app for batches of WITS-like records.
+
+The data API request is mocked, so the numbers cover computing and encoding outputs.
+
+Usage: python -m benchmarks.throughput
+"""
+
+import os
+import random
+import timeit
+import unittest.mock
+
+# corva reads its settings on import, the values are not used here
+for key, value in {
+    "API_ROOT_URL": "http://localhost",
+    "DATA_API_ROOT_URL": "http://localhost",
+    "CACHE_URL": "redis://localhost:6379",
+    "APP_KEY": "big-data-energy.example-stream-depth-app",
+    "PROVIDER": "big-data-energy",
+}.items():
+    os.environ.setdefault(key, value)
+
+from corva import StreamDepthEvent  # noqa: E402
+
+from src.app import example_stream_depth_app  # noqa: E402
+
+RECORD_COUNTS = [10, 100, 1_000, 10_000]
+
+
+def make_event(record_count: int) -> StreamDepthEvent:
+    """Records with some missing, null and 0 channels."""
+
+    rng = random.Random(0)
+
+    def data() -> dict:
+        data = {"sppa": round(rng.uniform(0, 5000), 2), "tflo": rng.choice([0, rng.randint(0, 1200)])}
+        if rng.random() < 0.05:
+            del data["sppa"]
+        if rng.random() < 0.05:
+            data["tflo"] = None
+        return data
+
+    return StreamDepthEvent(
+        company_id=1,
+        asset_id=1234,
+        log_identifier="5701c048cf9a",
+        records=[{"measured_depth": 1000.0 + idx * 0.5, "data": data()} for idx in range(record_count)],
+    )
+
+
+def run(event: StreamDepthEvent) -> list:
+    # no last exported measured depth in the cache and the request is not sent
+    api = unittest.mock.Mock(default_headers={})
+    cache = unittest.mock.Mock(**{"get.return_value": None})
+
+    return example_stream_depth_app(event, api, cache)
+
+
+def main() -> None:
+    for record_count in RECORD_COUNTS:
+        event = make_event(record_count)
+        number = max(1, 10_000 // record_count)
+        seconds = min(timeit.repeat(lambda: run(event), number=number, repeat=5)) / number
+
+        print(f"{record_count} records: {seconds * 1000:.3f} ms, {record_count / seconds:,.0f} records/s")
+
+
+if __name__ == "__main__":
+    main()
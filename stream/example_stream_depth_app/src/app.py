@@ -1,6 +1,9 @@
 from corva import Api, Cache, Logger, StreamDepthEvent
 
+from src.buffer import OutputBuffer
 from src.configuration import SETTINGS
+from src.state import get_state, set_state
+from src.watermark import skip_exported
 
 
 def example_stream_depth_app(event: StreamDepthEvent, api: Api, cache: Cache):
@@ -25,19 +28,25 @@ def example_stream_depth_app(event: StreamDepthEvent, api: Api, cache: Cache):
     Logger.info(f"{start_measured_depth=} {end_measured_depth=} {record_count=}")
 
     # Utililize the Cache functionality to get a set key value. The Cache functionality is built on Redis Cache. See the Cache documentation for more information.
-    # Getting last exported measured_depth from Cache 
-    last_exported_measured_depth = int(float(cache.get(key='last_exported_measured_depth') or 0))
+    # Getting last exported measured_depth from Cache. get_state reads it with cache.get, or from memory of a warm container if STATE_IN_MEMORY is set, see src/state.py
+    last_exported_measured_depth = int(float(get_state(cache, asset_id, key='last_exported_measured_depth') or 0))
+
+    # Outputs of previous invocations that wait in the Cache to be posted together with the outputs of this one. The buffer is always empty, unless BUFFER_OUTPUTS is set, see src/buffer.py
+    buffer = OutputBuffer(cache)
+
+    # Buffered outputs are not exported yet, but their records are processed already
+    if buffer.outputs:
+        last_exported_measured_depth = max(last_exported_measured_depth, buffer.outputs[-1]["measured_depth"])
 
 # 4. Here is where you can add your app logic.
     
+    # Making sure we are not processing duplicate data. Records that are not deeper than last_exported_measured_depth are skipped, see src/watermark.py
+    records = skip_exported(records, last_exported_measured_depth)
+
     # Setting state to append data to an arrray 
     outputs = []
     for record in records:
 
-        # Making sure we are not processing duplicate data
-        if record.measured_depth <= last_exported_measured_depth:
-            Logger.info(f"Skipping record with measured_depth={record.measured_depth} because it's less than or equal to last_exported_measured_depth={last_exported_measured_depth}")
-            continue
         # Each element of records has data. This is how to get specific key values from an embedded object
         standpipe_pressure = record.data.get("sppa", 0)   # psi
         flow_rate = record.data.get("tflo", 0)            # gpm
@@ -68,16 +77,26 @@ def example_stream_depth_app(event: StreamDepthEvent, api: Api, cache: Cache):
 # 5. Save the newly calculated data in a custom dataset
 
     # Set up an if statement so that if request fails, lambda will be reinvoked. So no exception handling
-    if outputs:
-        # Utilize Logger functionality to confirm data in log files
-        Logger.debug(f"{outputs=}")
+    # The outputs are posted once the buffer is full, that is on every invocation with outputs, unless BUFFER_OUTPUTS is set
+    buffer.add(outputs)
+
+    if buffer.is_full():
+        # Utilize Logger functionality to confirm data in log files. The arguments are formatted only if debug logging is enabled: an f-string would format all outputs on every invocation, which takes longer than computing them for large batches of records
+        Logger.debug("outputs=%r", buffer.outputs)
 
-        # Utilize the Api functionality. The data=outputs needs to be an an array because Corva's data is saved as an array of objects. Objects being records. See the Api documentation for more information.
+        # Utilize the Api functionality. The data=buffer.outputs needs to be an an array because Corva's data is saved as an array of objects. Objects being records. See the Api documentation for more information.
         api.post(
-            f"api/v1/data/{SETTINGS.provider}/{SETTINGS.output_collection}/", data=outputs,
+            f"api/v1/data/{SETTINGS.provider}/{SETTINGS.output_collection}/", data=buffer.outputs,
         ).raise_for_status()
 
         # Utililize the Cache functionality to set a key value. The Cache functionality is built on Redis Cache. See the Cache documentation for more information. This example is setting the last measured_depth of the output to Cache
-        cache.set(key='last_exported_measured_depth', value=str(outputs[-1].get("measured_depth")))
+        # set_state writes it with cache.set, and keeps it in memory if STATE_IN_MEMORY is set
+        set_state(cache, asset_id, key='last_exported_measured_depth', value=str(buffer.outputs[-1].get("measured_depth")))
+
+        # The buffered outputs are exported now
+        buffer.clear()
+    else:
+        # Keeping the outputs in the Cache until the buffer is full. The last exported measured_depth does not change until they are posted
+        buffer.save()
 
     return outputs
\ No newline at end of file
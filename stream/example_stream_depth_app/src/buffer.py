@@ -0,0 +1,83 @@
+import json
+import time
+from typing import Optional
+
+from corva import Cache
+
+from src.configuration import SETTINGS
+
+# With BUFFER_OUTPUTS set, outputs of several invocations are posted together in one request instead of one small request per invocation.
+# Outputs wait in the Cache, so they are kept if the next invocation of the asset runs in another container, and are posted once the buffer holds SETTINGS.buffer_max_rows outputs or SETTINGS.buffer_max_bytes of JSON, or its first output has waited SETTINGS.buffer_max_seconds.
+# The buffer is checked only when an invocation runs, so SETTINGS.buffer_max_seconds is a lower bound of the wait, not an upper one: if the stream of the asset stops, the buffered outputs are not posted and the last exported value does not move until the next event of the asset arrives.
+# Every invocation that adds outputs encodes the whole buffer again and writes it to the Cache, that is up to SETTINGS.buffer_max_bytes per invocation, so larger limits mean more Cache traffic per invocation.
+OUTPUTS_KEY = "buffered_outputs"
+SINCE_KEY = "buffered_since"
+
+
+class OutputBuffer:
+    """Outputs waiting in the Cache to be posted.
+
+    Without BUFFER_OUTPUTS the buffer is not stored, and it is full as soon as it has outputs, so every invocation posts its outputs.
+    """
+
+    def __init__(self, cache: Cache):
+        self.cache = cache
+        self.outputs: list = []
+        # time.time() when the first output was buffered
+        self.since: Optional[float] = None
+        self.encoded: Optional[bytes] = None
+        # outputs were added since the buffer was read from the Cache
+        self.modified = False
+
+        if SETTINGS.buffer_outputs:
+            cached = cache.get_many([OUTPUTS_KEY, SINCE_KEY])
+
+            if cached[OUTPUTS_KEY]:
+                self.outputs = json.loads(cached[OUTPUTS_KEY])
+                self.since = float(cached[SINCE_KEY] or time.time())
+                self.encoded = cached[OUTPUTS_KEY].encode()
+
+    def add(self, outputs: list) -> None:
+        if not outputs:
+            return
+
+        self.outputs.extend(outputs)
+        self.since = self.since or time.time()
+        self.encoded = None
+        self.modified = True
+
+    def is_full(self) -> bool:
+        if not self.outputs:
+            return False
+
+        if not SETTINGS.buffer_outputs:
+            return True
+
+        if self.encoded is None:
+            self.encoded = json.dumps(self.outputs).encode()
+
+        return (
+            len(self.outputs) >= SETTINGS.buffer_max_rows
+            or len(self.encoded) >= SETTINGS.buffer_max_bytes
+            or time.time() - self.since >= SETTINGS.buffer_max_seconds
+        )
+
+    def save(self) -> None:
+        """Stores the outputs in the Cache until the buffer is full."""
+
+        if SETTINGS.buffer_outputs and self.modified:
+            if self.encoded is None:
+                self.encoded = json.dumps(self.outputs).encode()
+
+            self.cache.set_many([(OUTPUTS_KEY, self.encoded.decode()), (SINCE_KEY, str(self.since))])
+
+    def clear(self) -> None:
+        """Empties the buffer after its outputs are posted."""
+
+        if SETTINGS.buffer_outputs:
+            self.cache.delete_many([OUTPUTS_KEY, SINCE_KEY])
+
+        self.outputs = []
+        self.since = None
+        self.encoded = None
+        self.modified = False
@@ -5,6 +5,13 @@ class Settings(BaseSettings):
     provider: str = "big-data-energy"
     output_collection: str = "example-stream-depth-app"
     version: int = 1
+    # Keep the last exported measured depth in memory of a warm container. Every read then fetches only a short version stamp from the Cache and reads the value again only if another container has written it since. Writes always go to the Cache. See src/state.py
+    state_in_memory: bool = False
+    # Post outputs of several invocations together once the buffer holds buffer_max_rows outputs or buffer_max_bytes of JSON, or has waited buffer_max_seconds. The buffer is only checked when the next event of the asset arrives, so outputs are not posted if the stream stops. Every invocation re-encodes the whole buffer and writes up to buffer_max_bytes to the Cache. See src/buffer.py
+    buffer_outputs: bool = False
+    buffer_max_rows: int = 1000
+    buffer_max_bytes: int = 1_000_000
+    buffer_max_seconds: int = 60
 
 
 SETTINGS = Settings()
\ No newline at end of file
@@ -0,0 +1,59 @@
+import dataclasses
+import itertools
+import uuid
+from typing import Dict, Optional, Tuple
+
+from corva import Cache
+
+from src.configuration import SETTINGS
+
+# A warm container usually handles the same asset invocation after invocation, so the values it read from or wrote to the Cache are kept in memory.
+# Every write to the Cache stores a version stamp next to the value. Stamps are unique to this container. Every read fetches only the stamp from the Cache and reads the value again if the stamp differs from the one in memory, i.e. another container has written the value since (e.g. the asset moved to another container and back), or the value was deleted from the Cache.
+# Writes go straight to the Cache, so the Cache never lags behind memory and nothing is lost when the container stops.
+CONTAINER_ID = uuid.uuid4().hex
+VERSIONS = itertools.count(1)
+
+
+@dataclasses.dataclass
+class State:
+    value: Optional[str]
+    # version stamp in the Cache when the value was read or written
+    version: Optional[str]
+
+
+# States by asset id and key, kept between invocations of a warm container
+STATES: Dict[Tuple[int, str], State] = {}
+
+
+def version_key(key: str) -> str:
+    return f"{key}_version"
+
+
+def get_state(cache: Cache, asset_id: int, key: str) -> Optional[str]:
+    """Same as cache.get(key), but the value is served from memory while its version stamp in the Cache is unchanged.
+
+    A value written to the Cache other than with set_state keeps the old stamp, so delete the stamp along with it.
+    """
+
+    if not SETTINGS.state_in_memory:
+        return cache.get(key=key)
+
+    state = STATES.get((asset_id, key))
+
+    if state is None or cache.get(key=version_key(key)) != state.version:
+        cached = cache.get_many([key, version_key(key)])
+        state = STATES[asset_id, key] = State(value=cached[key], version=cached[version_key(key)])
+
+    return state.value
+
+
+def set_state(cache: Cache, asset_id: int, key: str, value) -> None:
+    """Same as cache.set(key, value), but also keeps the value in memory for get_state."""
+
+    if not SETTINGS.state_in_memory:
+        cache.set(key=key, value=value)
+        return
+
+    version = f"{CONTAINER_ID}:{next(VERSIONS)}"
+    cache.set_many([(key, str(value)), (version_key(key), version)])
+    STATES[asset_id, key] = State(value=str(value), version=version)
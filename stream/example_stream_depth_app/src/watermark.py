@@ -0,0 +1,31 @@
+import bisect
+import operator
+
+from corva import Logger
+
+
+def skip_exported(records: list, last_exported_measured_depth: float) -> list:
+    """Returns the records deeper than the last exported measured depth and logs one summary line for the skipped ones.
+
+    Records arrive sorted by measured depth, so the first record to process is found with a binary search and the records are sliced once.
+    Unsorted records fall back to comparing every record with the last exported measured depth.
+    """
+
+    measured_depths = [record.measured_depth for record in records]
+
+    if all(map(operator.le, measured_depths, measured_depths[1:])):
+        start = bisect.bisect_right(measured_depths, last_exported_measured_depth)
+        skipped = measured_depths[:start]
+        records = records[start:]
+    else:
+        skipped = [measured_depth for measured_depth in measured_depths if measured_depth <= last_exported_measured_depth]
+        records = [record for record in records if record.measured_depth > last_exported_measured_depth]
+
+    if skipped:
+        # One line per batch instead of one per record, e.g. for a replayed batch of thousands of records
+        Logger.info(
+            "Skipped %d records with measured_depth from %s to %s, less than or equal to last_exported_measured_depth=%s",
+            len(skipped), min(skipped), max(skipped), last_exported_measured_depth,
+        )
+
+    return records
@@ -1,8 +1,12 @@
 import unittest.mock
 
-from corva import Api, StreamDepthEvent
+import pytest
+from corva import Api, Logger, StreamDepthEvent
+from corva.configuration import SETTINGS
+from corva.service.cache_sdk import UserRedisSdk
 
 from lambda_function import lambda_handler
+from src.configuration import SETTINGS as APP_SETTINGS
 
 # Since we do not have a localhost API running we will mock our API requests with the help of unittest.mock built-in python library. 
 
@@ -44,3 +48,49 @@ def test_app(app_runner):
             },
         }
     ]
+
+
+# Records that are not deeper than the last exported measured depth in the Cache are skipped with one summary log line, whether the records are sorted or not.
+@pytest.mark.parametrize("measured_depths", ([999.0, 1000.0, 1000.5, 1001.0], [1001.0, 1000.0, 999.0, 1000.5]))
+def test_skip_exported_records(app_runner, measured_depths):
+    event = StreamDepthEvent(
+        company_id=1,
+        asset_id=1234,
+        records=[{"measured_depth": measured_depth, "data": {"sppa": 100, "tflo": 200}} for measured_depth in measured_depths],
+    )
+    cache = UserRedisSdk(hash_name="hash_name", redis_dsn=SETTINGS.CACHE_URL, use_fakes=True)
+    cache.set(key="last_exported_measured_depth", value="1000")
+
+    with unittest.mock.patch.object(Api, 'post') as post_patch, unittest.mock.patch.object(Logger, 'info') as info_patch:
+        app_runner(lambda_handler, event=event, cache=cache)
+
+    assert [output["measured_depth"] for output in post_patch.call_args.kwargs['data']] == [
+        measured_depth for measured_depth in measured_depths if measured_depth > 1000
+    ]
+    assert [call.args[1:4] for call in info_patch.call_args_list if call.args[0].startswith("Skipped")] == [(2, 999.0, 1000.0)]
+
+
+# With BUFFER_OUTPUTS set, outputs wait in the Cache and are posted together once the buffer holds buffer_max_rows outputs. The last exported measured depth advances only then, and a replayed record that is buffered already is skipped.
+def test_buffer_outputs(app_runner):
+    cache = UserRedisSdk(hash_name="buffer_test", redis_dsn=SETTINGS.CACHE_URL, use_fakes=True)
+
+    with (
+        unittest.mock.patch.object(APP_SETTINGS, "buffer_outputs", True),
+        unittest.mock.patch.object(APP_SETTINGS, "buffer_max_rows", 3),
+        unittest.mock.patch.object(Api, 'post') as post_patch,
+    ):
+        for measured_depths in ([1000.0], [1000.0, 1000.5], [1001.0]):
+            assert not post_patch.called
+            assert cache.get(key="last_exported_measured_depth") is None
+
+            event = StreamDepthEvent(
+                company_id=1,
+                asset_id=1234,
+                records=[{"measured_depth": measured_depth, "data": {"sppa": 100, "tflo": 200}} for measured_depth in measured_depths],
+            )
+            app_runner(lambda_handler, event=event, cache=cache)
+
+    assert post_patch.call_count == 1
+    assert [output["measured_depth"] for output in post_patch.call_args.kwargs['data']] == [1000.0, 1000.5, 1001.0]
+    assert cache.get(key="last_exported_measured_depth") == "1001.0"
+    assert cache.get(key="buffered_outputs") is None
@@ -0,0 +1,38 @@
+import unittest.mock
+
+from corva.configuration import SETTINGS as CORVA_SETTINGS
+from corva.service.cache_sdk import UserRedisSdk
+
+from src import state
+from src.configuration import SETTINGS
+from src.state import get_state, set_state
+
+# With STATE_IN_MEMORY set, the value is served from memory while its version stamp in the Cache is unchanged, and writes go straight to the Cache.
+
+
+def test_state_is_served_from_memory_while_unchanged():
+    cache = UserRedisSdk(hash_name="state_test", redis_dsn=CORVA_SETTINGS.CACHE_URL, use_fakes=True)
+    cache.set(key="last_exported_measured_depth", value="1")
+
+    with (
+        unittest.mock.patch.object(SETTINGS, "state_in_memory", True),
+        unittest.mock.patch.object(state, "STATES", {}),
+        unittest.mock.patch.object(cache, "get_many", wraps=cache.get_many) as get_many_patch,
+    ):
+        assert get_state(cache, 1234, key="last_exported_measured_depth") == "1"
+        set_state(cache, 1234, key="last_exported_measured_depth", value=2)
+
+        # written through, then served from memory
+        assert cache.get(key="last_exported_measured_depth") == "2"
+        assert get_state(cache, 1234, key="last_exported_measured_depth") == "2"
+        assert get_many_patch.call_count == 1
+
+        # another container writes the value, e.g. the asset moved to another container and back, so the value is read again
+        cache.set_many([("last_exported_measured_depth", "10"), ("last_exported_measured_depth_version", "other")])
+        assert get_state(cache, 1234, key="last_exported_measured_depth") == "10"
+        assert get_many_patch.call_count == 2
+
+        # the container stops, a new one reads the last written value
+        set_state(cache, 1234, key="last_exported_measured_depth", value=11)
+        state.STATES.clear()
+        assert get_state(cache, 1234, key="last_exported_measured_depth") == "11"
@@ -1,6 +1,10 @@
 from corva import Api, Cache, Logger, StreamTimeEvent
 
+from src.buffer import OutputBuffer
 from src.configuration import SETTINGS
+from src.rolling import load_window, window_states
+from src.state import get_state, set_states
+from src.watermark import skip_exported
 
 
 def example_stream_time_app(event: StreamTimeEvent, api: Api, cache: Cache) -> list:
@@ -24,19 +28,28 @@ def example_stream_time_app(event: StreamTimeEvent, api: Api, cache: Cache) -> l
     Logger.info(f"{start_timestamp=} {end_timestamp=} {record_count=}")
 
     # Utililize the Cache functionality to get a set key value. The Cache functionality is built on Redis Cache. See the Cache documentation for more information.
-    # Getting last exported timestamp from Cache 
-    last_exported_timestamp = int(cache.get(key='last_exported_timestamp') or 0)
+    # Getting last exported timestamp from Cache. get_state reads it with cache.get, or from memory of a warm container if STATE_IN_MEMORY is set, see src/state.py
+    last_exported_timestamp = int(get_state(cache, asset_id, key='last_exported_timestamp') or 0)
+
+    # Outputs of previous invocations that wait in the Cache to be posted together with the outputs of this one. The buffer is always empty, unless BUFFER_OUTPUTS is set, see src/buffer.py
+    buffer = OutputBuffer(cache)
+
+    # Buffered outputs are not exported yet, but their records are processed already
+    if buffer.outputs:
+        last_exported_timestamp = max(last_exported_timestamp, buffer.outputs[-1]["timestamp"])
 
     # Here is where you can add your app logic.
     
+    # Making sure we are not processing duplicate data. Records that are not after last_exported_timestamp are skipped, see src/watermark.py
+    records = skip_exported(records, last_exported_timestamp)
+
+    # Rolling window of the records of previous invocations, see src/rolling.py. None, unless ROLLING_WINDOW_SECONDS is set
+    window = load_window(cache, asset_id)
+
     # Setting state to append data to an arrray 
     outputs = []
     for record in records:
 
-        # Making sure we are not processing duplicate data
-        if record.timestamp <= last_exported_timestamp:
-            continue
-
         # Each element of records has data. This is how to get specific key values from an embedded object
         weight_on_bit = record.data.get("weight_on_bit", 0)
         hook_load = record.data.get("hook_load", 0)
@@ -56,22 +69,40 @@ def example_stream_time_app(event: StreamTimeEvent, api: Api, cache: Cache) -> l
             "version": SETTINGS.version
         }
 
+        # Adding the statistics of the channels over the rolling window that ends with this record
+        if window is not None:
+            output["data"]["rolling_window"] = window.add(record.timestamp, output["data"])
+
         # Appending the new data to the empty array
         outputs.append(output)
 
     # Save the newly calculated data in a custom dataset
 
     # Set up an if statement so that if request fails, lambda will be reinvoked. So no exception handling
-    if outputs:
-        # Utilize Logger functionality to confirm data in log files
-        Logger.debug(f"{outputs=}")
+    # The outputs are posted once the buffer is full, that is on every invocation with outputs, unless BUFFER_OUTPUTS is set
+    buffer.add(outputs)
+
+    # The rolling window is saved after the outputs are posted or buffered, so that the records of a failed invocation are not added to it twice when the lambda is reinvoked
+    states = window_states(window) if outputs else {}
+
+    if buffer.is_full():
+        # Utilize Logger functionality to confirm data in log files. The arguments are formatted only if debug logging is enabled: an f-string would format all outputs on every invocation, which takes longer than computing them for large batches of records
+        Logger.debug("outputs=%r", buffer.outputs)
 
-        # Utilize the Api functionality. The data=outputs needs to be an an array because Corva's data is saved as an array of objects. Objects being records. See the Api documentation for more information.
+        # Utilize the Api functionality. The data=buffer.outputs needs to be an an array because Corva's data is saved as an array of objects. Objects being records. See the Api documentation for more information.
         api.post(
-            f"api/v1/data/{SETTINGS.provider}/{SETTINGS.output_collection}/", data=outputs,
+            f"api/v1/data/{SETTINGS.provider}/{SETTINGS.output_collection}/", data=buffer.outputs,
         ).raise_for_status()
 
         # Utililize the Cache functionality to set a key value. The Cache functionality is built on Redis Cache. See the Cache documentation for more information. This example is setting the last timestamp of the output to Cache
-        cache.set(key='last_exported_timestamp', value=outputs[-1].get("timestamp"))
+        # set_states writes it together with the rolling window with cache.set_many, and keeps them in memory if STATE_IN_MEMORY is set
+        set_states(cache, asset_id, {**states, "last_exported_timestamp": buffer.outputs[-1].get("timestamp")})
+
+        # The buffered outputs are exported now
+        buffer.clear()
+    else:
+        # Keeping the outputs in the Cache until the buffer is full. The last exported timestamp does not change until they are posted
+        buffer.save()
+        set_states(cache, asset_id, states)
 
     return outputs
@@ -5,6 +5,15 @@ class Settings(BaseSettings):
     provider: str = "big-data-energy"
     output_collection: str = "example-stream-time-app"
     version: int = 1
+    # Keep the last exported timestamp and the rolling window in memory of a warm container. Every read then fetches only a short version stamp from the Cache and reads the value again only if another container has written it since. Writes always go to the Cache. See src/state.py
+    state_in_memory: bool = False
+    # Post outputs of several invocations together once the buffer holds buffer_max_rows outputs or buffer_max_bytes of JSON, or has waited buffer_max_seconds. The buffer is only checked when the next event of the asset arrives, so outputs are not posted if the stream stops. Every invocation re-encodes the whole buffer and writes up to buffer_max_bytes to the Cache. See src/buffer.py
+    buffer_outputs: bool = False
+    buffer_max_rows: int = 1000
+    buffer_max_bytes: int = 1_000_000
+    buffer_max_seconds: int = 60
+    # Add the mean, min, max and standard deviation of the channels over the last this many seconds to every output. 0 adds none. See src/rolling.py
+    rolling_window_seconds: int = 0
 
 
 SETTINGS = Settings()
\ No newline at end of file
@@ -0,0 +1,144 @@
+import collections
+import json
+import math
+from typing import Dict, Optional
+
+from corva import Cache
+
+from src.configuration import SETTINGS
+from src.state import get_state
+
+# With ROLLING_WINDOW_SECONDS set, every output has the mean, min, max and standard deviation of its channels over the records of the last ROLLING_WINDOW_SECONDS seconds, so consumers don't query the output collection to compute them.
+# The window is updated in O(1) per record and kept in the Cache between invocations.
+CHANNELS = ("weight_on_bit", "hook_load", "wob_plus_hkld")
+WINDOW_KEY = "rolling_window"
+
+
+class RollingStats:
+    """Statistics of one channel over the window.
+
+    The mean and the sum of squared differences from it (m2) are updated with Welford's method when a value enters or leaves the window.
+    Min and max are the heads of monotonic deques of [seq, value], where seq is the sequence number of the record in the window: a new value drops the values that can't be the min (max) anymore from the tail, and values that leave the window are dropped from the head.
+    Entries are matched by seq rather than by timestamp, as records may share a timestamp.
+    """
+
+    def __init__(self, mean: float = 0.0, m2: float = 0.0, mins: list = (), maxs: list = ()):
+        self.mean = mean
+        self.m2 = m2
+        self.mins = collections.deque(mins)
+        self.maxs = collections.deque(maxs)
+
+    def add(self, seq: int, value: float, count: int) -> None:
+        """Adds the value, count includes it."""
+
+        delta = value - self.mean
+        self.mean += delta / count
+        self.m2 += delta * (value - self.mean)
+
+        while self.mins and self.mins[-1][1] >= value:
+            self.mins.pop()
+        self.mins.append([seq, value])
+
+        while self.maxs and self.maxs[-1][1] <= value:
+            self.maxs.pop()
+        self.maxs.append([seq, value])
+
+    def remove(self, seq: int, value: float, count: int) -> None:
+        """Removes the value, count excludes it."""
+
+        if count:
+            delta = value - self.mean
+            self.mean -= delta / count
+            self.m2 -= delta * (value - self.mean)
+        else:
+            self.mean = self.m2 = 0.0
+
+        if self.mins[0][0] == seq:
+            self.mins.popleft()
+
+        if self.maxs[0][0] == seq:
+            self.maxs.popleft()
+
+    def to_dict(self, count: int) -> dict:
+        return {
+            "mean": self.mean,
+            "min": self.mins[0][1],
+            "max": self.maxs[0][1],
+            # population standard deviation, m2 may drift slightly below 0 for equal values
+            "std": math.sqrt(max(self.m2, 0.0) / count),
+        }
+
+
+class RollingWindow:
+    """Records of the last `seconds` seconds and statistics of their channels."""
+
+    def __init__(self, seconds: int, seq: int = 0, rows: list = (), stats: Optional[Dict[str, dict]] = None):
+        self.seconds = seconds
+        # sequence number of the next record
+        self.seq = seq
+        # [seq, timestamp, *channel values]
+        self.rows = collections.deque(rows)
+        self.stats = {channel: RollingStats(**(stats or {}).get(channel, {})) for channel in CHANNELS}
+
+    def add(self, timestamp: int, data: dict) -> dict:
+        """Adds channel values of the record and returns the statistics of the window that ends with it."""
+
+        # records at or before this timestamp leave the window
+        while self.rows and self.rows[0][1] <= timestamp - self.seconds:
+            row = self.rows.popleft()
+
+            for channel, value in zip(CHANNELS, row[2:]):
+                self.stats[channel].remove(row[0], value, len(self.rows))
+
+        seq = self.seq
+        self.seq += 1
+        self.rows.append([seq, timestamp, *(data[channel] for channel in CHANNELS)])
+
+        for channel in CHANNELS:
+            self.stats[channel].add(seq, data[channel], len(self.rows))
+
+        return {
+            "window_seconds": self.seconds,
+            **{channel: stats.to_dict(len(self.rows)) for channel, stats in self.stats.items()},
+        }
+
+    def to_dict(self) -> dict:
+        return {
+            "seconds": self.seconds,
+            "seq": self.seq,
+            "rows": list(self.rows),
+            "stats": {
+                channel: {"mean": stats.mean, "m2": stats.m2, "mins": list(stats.mins), "maxs": list(stats.maxs)}
+                for channel, stats in self.stats.items()
+            },
+        }
+
+
+def load_window(cache: Cache, asset_id: int) -> Optional[RollingWindow]:
+    """The window of previous invocations, or None unless ROLLING_WINDOW_SECONDS is set."""
+
+    if not SETTINGS.rolling_window_seconds:
+        return None
+
+    cached = get_state(cache, asset_id, key=WINDOW_KEY)
+
+    if cached:
+        window = json.loads(cached)
+
+        # the window of a different length, or of an older version without sequence numbers, is started over
+        if window["seconds"] == SETTINGS.rolling_window_seconds and "seq" in window:
+            return RollingWindow(**window)
+
+    return RollingWindow(seconds=SETTINGS.rolling_window_seconds)
+
+
+def window_states(window: Optional[RollingWindow]) -> dict:
+    """Values of set_states that save the window, none unless ROLLING_WINDOW_SECONDS is set.
+
+    The window is saved with the last exported timestamp in one set_states call, so they are written to the Cache together and a cold start doesn't read a window with records that are processed again.
+    """
+
+    if window is None:
+        return {}
+
+    return {WINDOW_KEY: json.dumps(window.to_dict())}
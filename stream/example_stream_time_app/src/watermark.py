@@ -0,0 +1,22 @@
+import bisect
+import operator
+
+from corva import Logger
+
+
+def skip_exported(records: list, last_exported_timestamp: int) -> list:
+    """Returns the records after the last exported timestamp and logs one summary line for the skipped ones.
+
+    Records arrive sorted by timestamp, so the first record to process is found with a binary search and the records are sliced once.
+    """
+
+    start = bisect.bisect_right(records, last_exported_timestamp, key=operator.attrgetter("timestamp"))
+
+    if start:
+        # One line per batch instead of one per record, e.g. for a replayed batch of thousands of records
+        Logger.info(
+            "Skipped %d records with timestamp from %s to %s, less than or equal to last_exported_timestamp=%s",
+            start, records[0].timestamp, records[start - 1].timestamp, last_exported_timestamp,
+        )
+
+    return records[start:]
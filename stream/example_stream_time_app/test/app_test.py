@@ -1,8 +1,16 @@
+import random
+import statistics
 import unittest.mock
 
-from corva import Api, StreamTimeEvent
+import pytest
+from corva import Api, Logger, StreamTimeEvent
+from corva.configuration import SETTINGS
+from corva.service.cache_sdk import UserRedisSdk
 
 from lambda_function import lambda_handler
+from src import state
+from src.configuration import SETTINGS as APP_SETTINGS
+from src.rolling import RollingWindow
 
 # Since we do not have a localhost API running we will mock our API requests with the help of unittest.mock built-in python library. 
 
@@ -33,3 +41,150 @@ def test_app(app_runner):
             "version": 1,
         }
     ]
+
+
+# Records that are not after the last exported timestamp in the Cache are skipped with one summary log line.
+def test_skip_exported_records(app_runner):
+    event = StreamTimeEvent(
+        company_id=1,
+        asset_id=1234,
+        records=[{"timestamp": timestamp, "data": {"weight_on_bit": 25, "hook_load": 30}} for timestamp in range(1578291300, 1578291305)],
+    )
+    cache = UserRedisSdk(hash_name="hash_name", redis_dsn=SETTINGS.CACHE_URL, use_fakes=True)
+    cache.set(key="last_exported_timestamp", value="1578291302")
+
+    with unittest.mock.patch.object(Api, 'post') as post_patch, unittest.mock.patch.object(Logger, 'info') as info_patch:
+        app_runner(lambda_handler, event=event, cache=cache)
+
+    assert [output["timestamp"] for output in post_patch.call_args.kwargs['data']] == [1578291303, 1578291304]
+    assert [call.args[1:4] for call in info_patch.call_args_list if call.args[0].startswith("Skipped")] == [(3, 1578291300, 1578291302)]
+
+
+# With BUFFER_OUTPUTS set, outputs wait in the Cache and are posted together once the buffer holds buffer_max_rows outputs. The last exported timestamp advances only then, and a replayed record that is buffered already is skipped.
+def test_buffer_outputs(app_runner):
+    cache = UserRedisSdk(hash_name="buffer_test", redis_dsn=SETTINGS.CACHE_URL, use_fakes=True)
+
+    with (
+        unittest.mock.patch.object(APP_SETTINGS, "buffer_outputs", True),
+        unittest.mock.patch.object(APP_SETTINGS, "buffer_max_rows", 3),
+        unittest.mock.patch.object(Api, 'post') as post_patch,
+    ):
+        for timestamps in ([1578291300], [1578291300, 1578291301], [1578291302]):
+            assert not post_patch.called
+            assert cache.get(key="last_exported_timestamp") is None
+
+            event = StreamTimeEvent(
+                company_id=1,
+                asset_id=1234,
+                records=[{"timestamp": timestamp, "data": {"weight_on_bit": 25, "hook_load": 30}} for timestamp in timestamps],
+            )
+            app_runner(lambda_handler, event=event, cache=cache)
+
+    assert post_patch.call_count == 1
+    assert [output["timestamp"] for output in post_patch.call_args.kwargs['data']] == [1578291300, 1578291301, 1578291302]
+    assert cache.get(key="last_exported_timestamp") == "1578291302"
+    assert cache.get(key="buffered_outputs") is None
+
+
+# With ROLLING_WINDOW_SECONDS set, every output has statistics of its channels over the records of the last ROLLING_WINDOW_SECONDS, including the records of previous invocations. They are compared with statistics computed from all records of the window.
+def test_rolling_window(app_runner):
+    rng = random.Random(0)
+    # records with a gap that empties the window
+    timestamps = [*range(1578291300, 1578291320), *range(1578291330, 1578291340)]
+    data = [{"weight_on_bit": rng.randint(0, 50), "hook_load": rng.uniform(100, 300)} for _ in timestamps]
+    cache = UserRedisSdk(hash_name="rolling_window_test", redis_dsn=SETTINGS.CACHE_URL, use_fakes=True)
+    outputs = []
+
+    with (
+        unittest.mock.patch.object(APP_SETTINGS, "rolling_window_seconds", 5),
+        unittest.mock.patch.object(Api, 'post') as post_patch,
+    ):
+        for start, end in ((0, 7), (7, 8), (8, 30)):
+            event = StreamTimeEvent(
+                company_id=1,
+                asset_id=1234,
+                records=[{"timestamp": timestamp, "data": record_data} for timestamp, record_data in zip(timestamps[start:end], data[start:end])],
+            )
+            app_runner(lambda_handler, event=event, cache=cache)
+            outputs.extend(post_patch.call_args.kwargs['data'])
+
+    assert [output["timestamp"] for output in outputs] == timestamps
+
+    for output in outputs:
+        window = [other["data"] for other in outputs if output["timestamp"] - 5 < other["timestamp"] <= output["timestamp"]]
+        rolling_window = output["data"]["rolling_window"]
+
+        assert rolling_window["window_seconds"] == 5
+
+        for channel in ("weight_on_bit", "hook_load", "wob_plus_hkld"):
+            values = [data[channel] for data in window]
+
+            assert rolling_window[channel] == pytest.approx(
+                {"mean": statistics.fmean(values), "min": min(values), "max": max(values), "std": statistics.pstdev(values)},
+                abs=1e-9,
+            )
+
+
+# With STATE_IN_MEMORY set, the rolling window is written to the Cache together with the last exported timestamp. If the container stops, the next container continues after the last exported timestamp in the Cache, and the records before it are not counted twice in the window.
+def test_rolling_window_after_container_loss(app_runner):
+    timestamps = list(range(1578291300, 1578291320))
+    data = [{"weight_on_bit": index % 7, "hook_load": index % 11} for index in range(len(timestamps))]
+    cache = UserRedisSdk(hash_name="container_loss_test", redis_dsn=SETTINGS.CACHE_URL, use_fakes=True)
+
+    with (
+        unittest.mock.patch.object(APP_SETTINGS, "rolling_window_seconds", 5),
+        unittest.mock.patch.object(APP_SETTINGS, "state_in_memory", True),
+        unittest.mock.patch.object(state, "STATES", {}),
+        unittest.mock.patch.object(Api, 'post') as post_patch,
+    ):
+        for index in range(12):
+            event = StreamTimeEvent(company_id=1, asset_id=1234, records=[{"timestamp": timestamps[index], "data": data[index]}])
+            app_runner(lambda_handler, event=event, cache=cache)
+
+        # the container stops and all records are sent again
+        state.STATES.clear()
+        event = StreamTimeEvent(
+            company_id=1,
+            asset_id=1234,
+            records=[{"timestamp": timestamp, "data": record_data} for timestamp, record_data in zip(timestamps, data)],
+        )
+        app_runner(lambda_handler, event=event, cache=cache)
+
+    outputs = post_patch.call_args.kwargs['data']
+
+    # the records exported by the lost container are not exported again
+    assert outputs[0]["timestamp"] == timestamps[12]
+    assert outputs[-1]["timestamp"] == timestamps[-1]
+
+    for output in outputs:
+        window = [record_data for timestamp, record_data in zip(timestamps, data) if output["timestamp"] - 5 < timestamp <= output["timestamp"]]
+        rolling_window = output["data"]["rolling_window"]
+
+        for channel in ("weight_on_bit", "hook_load"):
+            values = [record_data[channel] for record_data in window]
+
+            assert rolling_window[channel] == pytest.approx(
+                {"mean": statistics.fmean(values), "min": min(values), "max": max(values), "std": statistics.pstdev(values)},
+                abs=1e-9,
+            )
+
+
+# Records that share a timestamp are separate entries of the window, and leave it together.
+def test_rolling_window_duplicate_timestamps():
+    window = RollingWindow(seconds=5)
+
+    window.add(100, {"weight_on_bit": 5, "hook_load": 5, "wob_plus_hkld": 10})
+    stats = window.add(100, {"weight_on_bit": 3, "hook_load": 7, "wob_plus_hkld": 10})
+
+    assert stats["weight_on_bit"] == pytest.approx({"mean": 4, "min": 3, "max": 5, "std": 1})
+    assert stats["hook_load"] == pytest.approx({"mean": 6, "min": 5, "max": 7, "std": 1})
+
+    stats = window.add(106, {"weight_on_bit": 4, "hook_load": 4, "wob_plus_hkld": 8})
+
+    assert stats["weight_on_bit"] == pytest.approx({"mean": 4, "min": 4, "max": 4, "std": 0})
+    assert stats["hook_load"] == pytest.approx({"mean": 4, "min": 4, "max": 4, "std": 0})
+
+    stats = RollingWindow(**window.to_dict()).add(106, {"weight_on_bit": 6, "hook_load": 2, "wob_plus_hkld": 8})
+
+    assert stats["weight_on_bit"] == pytest.approx({"mean": 5, "min": 4, "max": 6, "std": 1})
+    assert stats["hook_load"] == pytest.approx({"mean": 3, "min": 2, "max": 4, "std": 1})
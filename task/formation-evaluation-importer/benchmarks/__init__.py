@@ -0,0 +1,12 @@
+import os
+
+# corva reads its settings on import. Benchmarks run against local servers,
+# so placeholders are enough.
+for name, value in {
+    'API_ROOT_URL': 'http://127.0.0.1',
+    'DATA_API_ROOT_URL': 'http://127.0.0.1',
+    'CACHE_URL': 'redis://127.0.0.1:6379',
+    'APP_KEY': 'big-data-energy.formation-evaluation-importer',
+    'PROVIDER': 'big-data-energy',
+}.items():
+    os.environ.setdefault(name, value)
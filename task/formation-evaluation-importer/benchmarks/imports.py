@@ -0,0 +1,258 @@
+"""Times and memory-profiles stages of the import of synthetic LAS files.
+
+Files are served by a local HTTP server and log data is uploaded to a local
+mock of the data API. Results are written as JSON, so they can be compared
+between commits.
+
+Usage: python -m benchmarks.imports [--rows 1000 10000] [--curves 5 50]
+         [--output results.json]
+"""
+
+import argparse
+import http
+import http.server
+import io
+import json
+import platform
+import subprocess
+import sys
+import threading
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List, Tuple
+
+import lasio
+import numpy as np
+from corva import Api
+
+from benchmarks.payloads import ENVELOPE, build_with_models
+from src import parser
+from src.api import get_file
+from src.batching import RequestLimits, batch_encoded
+from src.configuration import SETTINGS
+from src.payloads import DataPayloadBuilder
+from src.upload import upload_chunks
+
+ROWS = [1_000, 10_000, 100_000, 1_000_000]
+CURVES = [5, 50, 300]
+# sizes above are skipped by default, as they take minutes per stage
+MAX_VALUES = 10_000_000
+
+
+def synthetic_las_file(n_rows: int, n_curves: int) -> bytes:
+    """LAS 2.0 file with the depth index and random curves with 10% nulls."""
+
+    rng = np.random.default_rng(0)
+    log_data = rng.normal(scale=100, size=(n_rows, n_curves)).round(4)
+    log_data[:, 1:][rng.random(size=(n_rows, n_curves - 1)) < 0.1] = -999.25
+    log_data[:, 0] = np.arange(n_rows) * 0.5
+
+    header = '\n'.join(
+        [
+            '~Version ---------------------------------------------------',
+            'VERS.   2.0 : CWLS log ASCII Standard -VERSION 2.0',
+            'WRAP.    NO : One line per depth step',
+            'DLM . SPACE : Column Data Section Delimiter',
+            '~Well ------------------------------------------------------',
+            'NULL.  -999.25 : NULL VALUE',
+            '~Curve Information -----------------------------------------',
+            'DEPT .F :',
+            *(f'C{idx:03} .U :' for idx in range(1, n_curves)),
+            '~ASCII -----------------------------------------------------',
+        ]
+    )
+
+    out = io.StringIO()
+    out.write(header + '\n')
+    np.savetxt(out, log_data, fmt='%.4f')
+
+    return out.getvalue().encode()
+
+
+class Server:
+    """Serves files on GET and accepts data API save requests on POST."""
+
+    def __init__(self):
+        self.files: Dict[str, bytes] = {}
+
+        server = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                content = server.files[self.path]
+
+                self.send_response(http.HTTPStatus.OK)
+                self.send_header('Content-Length', str(len(content)))
+                self.end_headers()
+                self.wfile.write(content)
+
+            def do_POST(self):
+                self.rfile.read(int(self.headers['Content-Length']))
+                body = b'{"inserted_ids": []}'
+
+                self.send_response(http.HTTPStatus.OK)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.httpd = http.server.ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.httpd.daemon_threads = True
+        self.url = f'http://127.0.0.1:{self.httpd.server_port}'
+
+    def __enter__(self) -> 'Server':
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def measure(func: Callable[[], Any], memory: bool) -> Tuple[Any, Dict[str, Any]]:
+    """Calls the function and returns its result, time and peak traced memory.
+
+    Memory is traced in a separate call, as tracing slows the function down.
+    """
+
+    start = time.perf_counter()
+    result = func()
+    stats = {'seconds': time.perf_counter() - start}
+
+    if memory:
+        tracemalloc.start()
+        try:
+            func()
+            stats['peak_bytes'] = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+    return result, stats
+
+
+def run(
+    server: Server, api: Api, n_rows: int, n_curves: int, memory: bool
+) -> List[Dict[str, Any]]:
+    path = f'/{n_rows}x{n_curves}.las'
+    server.files[path] = synthetic_las_file(n_rows=n_rows, n_curves=n_curves)
+    builder = DataPayloadBuilder(
+        **ENVELOPE, formation_evaluation_id='id', file_name=path
+    )
+    limits = RequestLimits(
+        max_bytes=SETTINGS.max_request_bytes, max_rows=SETTINGS.chunk_size
+    )
+    results = []
+
+    def stage(name: str, func: Callable[[], Any]) -> Any:
+        result, stats = measure(func=func, memory=memory)
+        results.append({'rows': n_rows, 'curves': n_curves, 'stage': name, **stats})
+        print(f'{n_rows} x {n_curves} {name}: {stats["seconds"]:.3f}s', file=sys.stderr)
+        return result
+
+    text = stage('download', lambda: get_file(url=server.url + path))
+    stage(
+        'lasio_read',
+        lambda: lasio.read(text, null_policy='none', mnemonic_case='lower'),
+    )
+    parse_result = stage('parse', lambda: parser.parse(file=text))
+    rows = stage(
+        'map_log_data',
+        lambda: parser.map_log_data(
+            log_data=parse_result.log_data,
+            curve_mnemonics=parse_result.curve_mnemonics,
+        ),
+    )
+    stage('model_dump', lambda: build_with_models(rows))
+    stage('payload_build', lambda: builder.build(rows=rows))
+    batches = stage(
+        'json_encode',
+        lambda: list(batch_encoded(encoded=builder.encode(rows=rows), limits=limits)),
+    )
+    stage(
+        'upload',
+        lambda: upload_chunks(
+            api=api,
+            chunks=batches,
+            collection=SETTINGS.data_collection,
+            provider=SETTINGS.provider,
+            max_in_flight=SETTINGS.max_in_flight_requests,
+            limits=limits,
+        ),
+    )
+
+    del server.files[path]
+
+    return results
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ''
+
+
+def main() -> None:
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument('--rows', type=int, nargs='+', default=ROWS)
+    arg_parser.add_argument('--curves', type=int, nargs='+', default=CURVES)
+    arg_parser.add_argument(
+        '--max-values',
+        type=int,
+        default=MAX_VALUES,
+        help='skip files with more rows x curves values',
+    )
+    arg_parser.add_argument(
+        '--no-memory', action='store_true', help='skip memory profiling'
+    )
+    arg_parser.add_argument('--output', help='JSON output file, stdout by default')
+    args = arg_parser.parse_args()
+
+    results = []
+
+    with Server() as server:
+        api = Api(api_url=server.url, data_api_url=server.url, api_key='', app_key='')
+
+        for n_rows in args.rows:
+            for n_curves in args.curves:
+                if n_rows * n_curves > args.max_values:
+                    print(f'{n_rows} x {n_curves}: skipped', file=sys.stderr)
+                    continue
+
+                results.extend(
+                    run(
+                        server=server,
+                        api=api,
+                        n_rows=n_rows,
+                        n_curves=n_curves,
+                        memory=not args.no_memory,
+                    )
+                )
+
+    report = json.dumps(
+        {
+            'commit': git_commit(),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'lasio': lasio.__version__,
+            'results': results,
+        },
+        indent=2,
+    )
+
+    if args.output:
+        with open(args.output, 'w') as file:
+            file.write(report)
+    else:
+        print(report)
+
+
+if __name__ == '__main__':
+    main()
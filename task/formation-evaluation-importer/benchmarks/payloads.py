@@ -0,0 +1,61 @@
+"""Compares per row model dump with DataPayloadBuilder.
+
+Usage: python -m benchmarks.payloads
+"""
+
+import timeit
+
+from src.models import FormationEvaluationData, FormationEvaluationDataMetadata
+from src.payloads import DataPayloadBuilder
+
+N_ROWS = 10_000
+N_CURVES = 20
+ENVELOPE = dict(
+    asset_id=1,
+    timestamp=2,
+    company_id=3,
+    collection='formation-evaluation.data',
+    app='formation-evaluation-importer',
+    provider='big-data-energy',
+    version=1,
+)
+
+
+def build_with_models(rows: list) -> list:
+    return [
+        FormationEvaluationData(
+            **ENVELOPE,
+            metadata=FormationEvaluationDataMetadata(
+                formation_evaluation_id='id', file_name='file'
+            ),
+            data=row,
+        ).model_dump()
+        for row in rows
+    ]
+
+
+def build_with_builder(rows: list) -> list:
+    return DataPayloadBuilder(
+        **ENVELOPE, formation_evaluation_id='id', file_name='file'
+    ).build(rows=rows)
+
+
+def main() -> None:
+    rows = [
+        {'md': float(idx), **{f'curve{jdx}': idx * 0.5 for jdx in range(N_CURVES)}}
+        for idx in range(N_ROWS)
+    ]
+
+    assert build_with_models(rows) == build_with_builder(rows)
+
+    models_time = min(timeit.repeat(lambda: build_with_models(rows), number=1, repeat=5))
+    builder_time = min(timeit.repeat(lambda: build_with_builder(rows), number=1, repeat=5))
+
+    print(f'{N_ROWS} rows x {N_CURVES + 1} curves')
+    print(f'models:  {models_time:.4f}s')
+    print(f'builder: {builder_time:.4f}s')
+    print(f'speedup: {models_time / builder_time:.1f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -4,5 +4,5 @@ from src.app import formation_evaluation_importer
 
 
 @task
-def lambda_handler(event: TaskEvent, api: Api) -> None:
+def lambda_handler(event: TaskEvent, api: Api):
     formation_evaluation_importer(event=event, api=api)
@@ -1,10 +1,42 @@
+import concurrent.futures
+import contextlib
+import gzip
+import hashlib
+import http
+import io
 import json
+import mmap
+import shutil
+import tempfile
+import threading
+import urllib.error
+import urllib.parse
 import urllib.request
-from typing import List
+import weakref
+import zlib
+from typing import BinaryIO, Iterator, List, NamedTuple, Optional, Union
 
+import requests
 from corva import Api
+from requests.adapters import HTTPAdapter, Retry
 
+from src import metrics
 from src.models import SaveDataReponse
+from src.serialization import dumps
+
+# fast levels give most of the size reduction of repetitive JSON
+GZIP_COMPRESS_LEVEL = 1
+# buffer size of copying downloaded files to temporary files
+SPOOL_COPY_SIZE = 1 << 20
+# URL-encoded query filters are kept well below common URL length limits (8 KiB)
+MAX_QUERY_BYTES = 4096
+# throttled requests (429) are retried by `save_batch`, that respects Retry-After
+RETRY_STATUS_CODES = (500, 502, 503, 504)
+# sessions of `post_data` by Api, dropped with the Api
+SESSIONS: 'weakref.WeakKeyDictionary[Api, requests.Session]' = (
+    weakref.WeakKeyDictionary()
+)
+SESSIONS_LOCK = threading.Lock()
 
 
 def delete_data_by_file_name(
@@ -16,32 +48,444 @@ def delete_data_by_file_name(
         requests.HTTPError: if delete was unsuccessful.
     """
 
-    data_response = api.delete(
-        f'v1/data/{provider}/{collection}.data/',
+    # both deletes are independent, so they are sent concurrently
+    with concurrent.futures.ThreadPoolExecutor(max_workers=2) as executor:
+        data_response = executor.submit(
+            api.delete,
+            f'v1/data/{provider}/{collection}.data/',
+            params={
+                'query': json.dumps(
+                    {
+                        'asset_id': asset_id,
+                        'metadata.file': file_name,
+                    }
+                )
+            },
+        )
+
+        metadata_response = executor.submit(
+            api.delete,
+            f'v1/data/{provider}/{collection}.metadata/',
+            params={'query': json.dumps({'asset_id': asset_id, 'file': file_name})},
+        )
+
+    data_response = data_response.result()
+    metadata_response = metadata_response.result()
+
+    data_response.raise_for_status()
+    metadata_response.raise_for_status()
+
+
+def delete_log_data_by_file_name(
+    api: Api, file_name: str, asset_id: int, collection: str, provider: str
+) -> None:
+    """Deletes log data of the collection for asset id by file name.
+
+    Raises:
+        requests.HTTPError: if delete was unsuccessful.
+    """
+
+    response = api.delete(
+        f'v1/data/{provider}/{collection}/',
         params={
-            'query': json.dumps(
-                {
-                    'asset_id': asset_id,
-                    'metadata.file': file_name,
-                }
-            )
+            'query': json.dumps({'asset_id': asset_id, 'metadata.file': file_name})
         },
     )
 
-    metadata_response = api.delete(
-        f'v1/data/{provider}/{collection}.metadata/',
-        params={'query': json.dumps({'asset_id': asset_id, 'file': file_name})},
+    response.raise_for_status()
+
+
+def delete_data_by_depths(
+    api: Api,
+    file_name: str,
+    asset_id: int,
+    depths: List[float],
+    collection: str,
+    provider: str,
+) -> None:
+    """Deletes data for asset id by file name and measured depths.
+
+    The depths are split over as many requests as needed to keep the URL-encoded
+    query filter of each under MAX_QUERY_BYTES.
+
+    Raises:
+        requests.HTTPError: if delete was unsuccessful.
+    """
+
+    query = {'asset_id': asset_id, 'metadata.file': file_name}
+    query_bytes = len(
+        urllib.parse.quote_plus(json.dumps({**query, 'data.md': {'$in': []}}))
     )
 
-    data_response.raise_for_status()
-    metadata_response.raise_for_status()
+    for batch in batch_depths(depths=depths, max_bytes=MAX_QUERY_BYTES - query_bytes):
+        response = api.delete(
+            f'v1/data/{provider}/{collection}/',
+            params={'query': json.dumps({**query, 'data.md': {'$in': batch}})},
+        )
+
+        response.raise_for_status()
+
+
+def delete_data_past_depth(
+    api: Api,
+    file_name: str,
+    asset_id: int,
+    md: Optional[float],
+    descending: bool,
+    collection: str,
+    provider: str,
+) -> None:
+    """Deletes data for asset id by file name past the measured depth.
+
+    Depths past `md` are greater ones, or lower ones if `descending`. All data of
+    the file is deleted, if `md` is None.
+
+    Raises:
+        requests.HTTPError: if delete was unsuccessful.
+    """
+
+    query: dict = {'asset_id': asset_id, 'metadata.file': file_name}
+
+    if md is not None:
+        query['data.md'] = {'$lt' if descending else '$gt': md}
+
+    response = api.delete(
+        f'v1/data/{provider}/{collection}/', params={'query': json.dumps(query)}
+    )
+
+    response.raise_for_status()
+
+
+def batch_depths(depths: List[float], max_bytes: int) -> Iterator[List[float]]:
+    """Yields batches of depths, whose URL-encoded JSON lists take at most
+    `max_bytes`. A batch has at least one depth."""
+
+    batch: List[float] = []
+    size = 0
+
+    for depth in depths:
+        # json.dumps separates list items with ', ', which is URL-encoded as '%2C+'
+        depth_size = len(urllib.parse.quote_plus(json.dumps(depth))) + 4
+
+        if batch and size + depth_size > max_bytes:
+            yield batch
+            batch, size = [], 0
+
+        batch.append(depth)
+        size += depth_size
+
+    if batch:
+        yield batch
+
+
+def iter_data_by_file_name(
+    api: Api,
+    file_name: str,
+    asset_id: int,
+    collection: str,
+    provider: str,
+    page_size: int,
+) -> Iterator[dict]:
+    """Yields data for asset id by file name in measured depth order.
+
+    Pages are requested by measured depth cursor, so every page is an index range
+    scan. Records of equal depths are ordered by id, and those of the last depth
+    of a page that were already yielded are skipped on the next page, so a page
+    ending inside a run of equal depths doesn't drop the rest of the run.
+
+    Raises:
+        requests.HTTPError: if get was unsuccessful.
+    """
+
+    query: dict = {'asset_id': asset_id, 'metadata.file': file_name}
+    cursor: dict = {}
+    # yielded records of depth cursor['data.md']['$gte']
+    skip = 0
+
+    while True:
+        response = api.get(
+            f'v1/data/{provider}/{collection}/',
+            params={
+                'query': json.dumps({**query, **cursor}),
+                'sort': json.dumps({'data.md': 1, '_id': 1}),
+                'limit': page_size,
+                'skip': skip,
+                'fields': 'data',
+            },
+        )
+
+        response.raise_for_status()
+
+        records = response.json()
+
+        yield from records
+
+        if len(records) < page_size:
+            return
+
+        last_md = records[-1]['data']['md']
+
+        if not cursor or cursor['data.md']['$gte'] != last_md:
+            cursor, skip = {'data.md': {'$gte': last_md}}, 0
+
+        skip += sum(1 for record in records if record['data']['md'] == last_md)
+
+
+def update_task_payload(api: Api, task_id: str, payload: dict) -> None:
+    """Stores the payload in the task.
+
+    Raises:
+        requests.HTTPError: if update was unsuccessful.
+    """
+
+    response = api.put(f'v2/tasks/{task_id}', data={'payload': payload})
+
+    response.raise_for_status()
+
+
+def get_file(
+    url: str, spool_min_bytes: Optional[int] = None, spool_dir: Optional[str] = None
+) -> Union[str, mmap.mmap]:
+    """Downloads file and returns its contents.
+
+    See `read_content` for files of at least `spool_min_bytes`.
+    """
+
+    with urlopen(url=url) as response:
+        return read_content(
+            raw=decode_content(response),
+            spool_min_bytes=spool_min_bytes,
+            spool_dir=spool_dir,
+        )
+
+
+def read_content(
+    raw: BinaryIO, spool_min_bytes: Optional[int], spool_dir: Optional[str]
+) -> Union[str, mmap.mmap]:
+    """Reads the file as text or memory-maps it, if it's large.
+
+    Files of at least `spool_min_bytes` are written to a temporary file in
+    `spool_dir` and returned as a read-only memory map, so neither the bytes nor
+    the text of the file are held in memory. The temporary file is deleted when
+    the map is closed or garbage collected.
+    """
+
+    if spool_min_bytes is None:
+        return raw.read().decode()
+
+    with tempfile.SpooledTemporaryFile(max_size=spool_min_bytes, dir=spool_dir) as file:
+        shutil.copyfileobj(raw, file, SPOOL_COPY_SIZE)
+
+        if file.tell() < spool_min_bytes:
+            file.seek(0)
+            return file.read().decode()
+
+        # the map stays valid after the file is closed
+        return mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+class NotModified(Exception):
+    """The file was not modified since it was downloaded with the given ETag."""
+
+
+class DownloadedFile(NamedTuple):
+    content: Union[str, mmap.mmap]
+    sha256: str
+    etag: Optional[str]
+
+
+class DecompressingReader(io.RawIOBase):
+    """Decompresses gzip or zlib (deflate) stream, as it is read.
+
+    At most `len(buffer)` bytes are decompressed per read, so the memory doesn't
+    grow with the compression ratio.
+    """
+
+    CHUNK_SIZE = 1 << 16
+
+    def __init__(self, raw: BinaryIO):
+        self.raw = raw
+        # detects gzip or zlib header automatically
+        self._decompressor = zlib.decompressobj(wbits=zlib.MAX_WBITS | 32)
+        self._pending = b''
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        while not self._pending:
+            if self._decompressor.eof:
+                return 0
+
+            data = self._decompressor.unconsumed_tail or self.raw.read(self.CHUNK_SIZE)
+
+            if not data:
+                self._pending = self._decompressor.flush()
+
+                if not self._pending:
+                    return 0
+                break
 
+            self._pending = self._decompressor.decompress(data, len(buffer))
 
-def get_file(url: str) -> str:
-    """Downloads file and returns its contents."""
+        n = min(len(buffer), len(self._pending))
+        buffer[:n] = self._pending[:n]
+        self._pending = self._pending[n:]
 
-    with urllib.request.urlopen(url) as file:
-        return file.read().decode()
+        return n
+
+
+class CountingReader(io.RawIOBase):
+    """Counts bytes downloaded by the import, as they are read."""
+
+    def __init__(self, raw: BinaryIO):
+        self.raw = raw
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        n = self.raw.readinto(buffer)
+        metrics.current().add(bytes_downloaded=n)
+        return n
+
+
+def decode_content(response) -> BinaryIO:
+    """Returns the response body stream with `Content-Encoding` removed."""
+
+    raw = io.BufferedReader(CountingReader(raw=response))
+
+    if response.headers.get('Content-Encoding', '').lower() in ('gzip', 'deflate'):
+        return io.BufferedReader(DecompressingReader(raw=raw))
+
+    return raw
+
+
+class HashingReader(io.RawIOBase):
+    """Computes SHA-256 of the bytes, as they are read from the wrapped stream."""
+
+    def __init__(self, raw: BinaryIO):
+        self.raw = raw
+        self.hash = hashlib.sha256()
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        n = self.raw.readinto(buffer)
+        self.hash.update(memoryview(buffer)[:n])
+        return n
+
+
+class FileStream:
+    """Downloading file, that is read line by line and hashed on the fly.
+
+    Attributes:
+      text: text stream of the file.
+      etag: ETag of the file, if the server sent one.
+    """
+
+    def __init__(self, raw: BinaryIO, etag: Optional[str] = None):
+        self._reader = HashingReader(raw=raw)
+        self.text = io.TextIOWrapper(io.BufferedReader(self._reader), encoding='utf-8')
+        self.etag = etag
+
+    def sha256(self) -> str:
+        """Reads the rest of the file and returns SHA-256 of its content."""
+
+        while self.text.read(1 << 16):
+            pass
+
+        return self._reader.hash.hexdigest()
+
+
+def urlopen(url: str, etag: Optional[str] = None):
+    """Opens the url, asking to respond with 304 if the file matches the ETag.
+
+    The response may be compressed, its body should be read with `decode_content`.
+
+    Raises:
+        NotModified: if the file matches the ETag.
+    """
+
+    headers = {'Accept-Encoding': 'gzip, deflate'}
+
+    if etag:
+        headers['If-None-Match'] = etag
+
+    request = urllib.request.Request(str(url), headers=headers)
+
+    try:
+        return urllib.request.urlopen(request)
+    except urllib.error.HTTPError as exc:
+        if exc.code == http.HTTPStatus.NOT_MODIFIED:
+            raise NotModified(url) from exc
+        raise
+
+
+def download_file(
+    url: str,
+    etag: Optional[str] = None,
+    spool_min_bytes: Optional[int] = None,
+    spool_dir: Optional[str] = None,
+) -> DownloadedFile:
+    """Downloads file and returns its contents, SHA-256 and ETag.
+
+    See `read_content` for files of at least `spool_min_bytes`.
+
+    Raises:
+        NotModified: if the file matches the ETag.
+    """
+
+    with urlopen(url=url, etag=etag) as response:
+        reader = HashingReader(raw=decode_content(response))
+        content = read_content(
+            raw=io.BufferedReader(reader),
+            spool_min_bytes=spool_min_bytes,
+            spool_dir=spool_dir,
+        )
+
+        return DownloadedFile(
+            content=content,
+            sha256=reader.hash.hexdigest(),
+            etag=response.headers.get('ETag'),
+        )
+
+
+@contextlib.contextmanager
+def open_file(url: str, etag: Optional[str] = None) -> Iterator[FileStream]:
+    """Opens file for line by line reading, without downloading it as a whole.
+
+    Raises:
+        NotModified: if the file matches the ETag.
+    """
+
+    with urlopen(url=url, etag=etag) as response:
+        yield FileStream(
+            raw=decode_content(response), etag=response.headers.get('ETag')
+        )
+
+
+def get_metadata(
+    api: Api, file_name: str, asset_id: int, collection: str, provider: str
+) -> Optional[dict]:
+    """Returns the metadata record of the file, if there is one.
+
+    Raises:
+        requests.HTTPError: if get was unsuccessful.
+    """
+
+    response = api.get(
+        f'v1/data/{provider}/{collection}/',
+        params={
+            'query': json.dumps({'asset_id': asset_id, 'file': file_name}),
+            'limit': 1,
+        },
+    )
+
+    response.raise_for_status()
+
+    return next(iter(response.json()), None)
 
 
 def save_data(
@@ -53,8 +497,105 @@ def save_data(
         requests.HTTPError: if save was unsuccessful.
     """
 
-    response = api.post(f'v1/data/{provider}/{collection}/', data=data)
+    return post_data(
+        api=api,
+        body=dumps(data),
+        headers={},
+        collection=collection,
+        provider=provider,
+    )
+
+
+def save_raw_data(
+    api: Api,
+    body: bytes,
+    collection: str,
+    provider: str,
+    gzip_min_bytes: Optional[int] = None,
+) -> SaveDataReponse:
+    """Saves the log data, that is already encoded to a JSON array.
+
+    Bodies of at least `gzip_min_bytes` are sent gzip compressed.
+
+    Raises:
+        requests.HTTPError: if save was unsuccessful.
+    """
+
+    headers = {}
+
+    if gzip_min_bytes is not None and len(body) >= gzip_min_bytes:
+        body = gzip.compress(body, compresslevel=GZIP_COMPRESS_LEVEL)
+        headers['Content-Encoding'] = 'gzip'
+
+    metrics.current().add(requests_sent=1, payload_bytes=len(body))
+
+    return post_data(
+        api=api, body=body, headers=headers, collection=collection, provider=provider
+    )
+
+
+def get_session(api: Api) -> requests.Session:
+    """Session of `post_data` for the Api.
+
+    The session is created once per Api, so requests reuse connections, and
+    retries server errors as many times as the Api does.
+    """
+
+    with SESSIONS_LOCK:
+        session = SESSIONS.get(api)
+
+        if session is None:
+            session = SESSIONS[api] = requests.Session()
+            session.mount(
+                'https://',
+                HTTPAdapter(
+                    max_retries=Retry(
+                        total=api.max_retries,
+                        backoff_factor=1,
+                        status_forcelist=RETRY_STATUS_CODES,
+                        allowed_methods=None,
+                        raise_on_status=False,
+                    )
+                ),
+            )
+
+        return session
+
+
+def post_data(
+    api: Api, body: bytes, headers: dict, collection: str, provider: str
+) -> SaveDataReponse:
+    """Posts the JSON encoded body to the data API.
+
+    `Api.post` always encodes `data` with `json`, that is slow and doesn't
+    support NumPy values, so the encoded body is posted with a session of the
+    Api, see `get_session`, to the API URL with the Api headers and timeout.
+
+    Raises:
+        requests.HTTPError: if save was unsuccessful.
+    """
+
+    response = get_session(api=api).post(
+        f"{api.api_url.rstrip('/')}/v1/data/{provider}/{collection}/",
+        data=body,
+        headers={**api.default_headers, 'Content-Type': 'application/json', **headers},
+        timeout=api.timeout,
+    )
 
     response.raise_for_status()
 
     return SaveDataReponse(**response.json())
+
+
+def update_data(
+    api: Api, id_: str, data: dict, collection: str, provider: str
+) -> None:
+    """Replaces the record.
+
+    Raises:
+        requests.HTTPError: if update was unsuccessful.
+    """
+
+    response = api.put(f'v1/data/{provider}/{collection}/{id_}/', data=data)
+
+    response.raise_for_status()
@@ -1,86 +1,1077 @@
+import collections
+import concurrent.futures
 import datetime
+import json
+from typing import (
+    Callable,
+    Deque,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    TypeVar,
+)
 
+import numpy as np
 import requests
 from corva import Api, Logger, TaskEvent
 
-from src import models, parser, utils
-from src.api import delete_data_by_file_name, get_file, save_data
+from src import metrics, models, parser, processes, resampling, utils
+from src.api import (
+    NotModified,
+    delete_data_by_depths,
+    delete_data_by_file_name,
+    delete_data_past_depth,
+    delete_log_data_by_file_name,
+    download_file,
+    get_file,
+    get_metadata,
+    iter_data_by_file_name,
+    open_file,
+    save_data,
+    update_data,
+    update_task_payload,
+)
+from src.batching import RequestLimits, batch_encoded
+from src.checkpoints import Checkpointer, CheckpointStore, get_checkpoint_store
 from src.configuration import SETTINGS
+from src.diff import diff_log_data
+from src.normalization import Normalizer, get_normalizer
+from src.payloads import DataPayloadBuilder
+from src.upload import upload_chunks
 
+HeaderT = TypeVar('HeaderT', bound=models.ParsedLasHeader)
 
-def formation_evaluation_importer(event: TaskEvent, api: Api) -> None:
-    properties = models.EventProperties.model_validate(event.properties)
 
-    try:
-        # Delete old data. New data will be written to the db as a result of this app.
-        delete_data_by_file_name(
+class BatchImportError(Exception):
+    """Some files of the batch were not imported."""
+
+
+def build_metadata(
+    event: TaskEvent,
+    properties: models.EventProperties,
+    header: models.ParsedLasHeader,
+    records_count: int,
+    timestamp: int,
+    curve_depth_ranges: Optional[parser.CurveDepthRanges] = None,
+) -> models.FormationEvaluationMetadata:
+    return models.FormationEvaluationMetadata(
+        asset_id=event.asset_id,
+        timestamp=timestamp,
+        company_id=event.company_id,
+        collection=SETTINGS.metadata_collection,
+        app=SETTINGS.app_name,
+        provider=SETTINGS.provider,
+        data=models.FormationEvaluationMetadataData(
+            params=header.params,
+            well=header.well,
+            curve=header.curves,
+            other=header.other,
+            curve_depth_ranges=curve_depth_ranges.ranges if curve_depth_ranges else None,
+        ),
+        file_name=properties.file_name,
+        records_count=records_count,
+        version=SETTINGS.version,
+        depth_step=SETTINGS.depth_step,
+        resample_method=SETTINGS.resample_method if SETTINGS.depth_step else None,
+        curves=properties.curves,
+    )
+
+
+def parse(
+    file: parser.LasContent, event: TaskEvent, properties: models.EventProperties
+) -> models.ParsedLasFile:
+    normalizer = get_normalizer(company_id=event.company_id)
+
+    with metrics.current().stage('parse'):
+        parse_result = parser.parse(
+            file=file, curves=properties.curves, normalizer=normalizer
+        )
+
+    log_missing_curves(
+        header=parse_result, properties=properties, normalizer=normalizer
+    )
+
+    metrics.current().add(rows_parsed=parse_result.n_log_data_rows)
+
+    return parse_result
+
+
+def log_missing_curves(
+    header: models.ParsedLasHeader,
+    properties: models.EventProperties,
+    normalizer: Normalizer,
+) -> None:
+    if properties.curves is None:
+        return
+
+    missing = [
+        curve
+        for curve in properties.curves
+        if normalizer.mnemonic(curve.lower()) not in header.curve_mnemonics
+    ]
+
+    if missing:
+        Logger.warning(f'Curves not found in file_name={properties.file_name}: {missing}.')
+
+
+def count_parsed_rows(chunks: Iterable[np.ndarray]) -> Iterator[np.ndarray]:
+    for chunk in chunks:
+        metrics.current().add(rows_parsed=len(chunk))
+        yield chunk
+
+
+def map_log_data(
+    header: models.ParsedLasHeader, log_data: np.ndarray
+) -> List[Dict[str, Optional[float]]]:
+    return parser.map_log_data(
+        log_data=log_data,
+        curve_mnemonics=header.curve_mnemonics,
+        drop_nulls=SETTINGS.drop_nulls,
+        null_value=header.null_value,
+    )
+
+
+def get_curve_depth_ranges(
+    header: models.ParsedLasHeader,
+) -> Optional[parser.CurveDepthRanges]:
+    """Depth ranges of curves are collected, when null values are dropped."""
+
+    if not SETTINGS.drop_nulls:
+        return None
+
+    return parser.CurveDepthRanges(
+        curve_mnemonics=header.curve_mnemonics, null_value=header.null_value
+    )
+
+
+def resample_header(header: HeaderT) -> HeaderT:
+    """Header of log data resampled to `SETTINGS.depth_step`.
+
+    Resampling replaces null values with NaN.
+    """
+
+    return header.model_copy(
+        update={
+            'curve_mnemonics': resampling.resampled_curve_mnemonics(
+                curve_mnemonics=header.curve_mnemonics,
+                method=SETTINGS.resample_method,
+            ),
+            'null_value': None,
+        }
+    )
+
+
+def resample_parse_result(parse_result: models.ParsedLasFile) -> models.ParsedLasFile:
+    log_data = resampling.resample(
+        log_data=parse_result.log_data,
+        step=SETTINGS.depth_step,
+        method=SETTINGS.resample_method,
+        null_value=parse_result.null_value,
+    )
+
+    return resample_header(header=parse_result).model_copy(
+        update={'log_data': log_data, 'n_log_data_rows': len(log_data)}
+    )
+
+
+def delete_full_resolution_data(
+    api: Api, event: TaskEvent, properties: models.EventProperties
+) -> None:
+    # full resolution data is saved again in full, even when the import resumes
+    delete_log_data_by_file_name(
+        api=api,
+        file_name=properties.file_name,
+        asset_id=event.asset_id,
+        collection=SETTINGS.full_resolution_data_collection,
+        provider=SETTINGS.provider,
+    )
+
+
+def save_full_resolution_chunks(
+    api: Api,
+    event: TaskEvent,
+    properties: models.EventProperties,
+    header: models.ParsedLasHeader,
+    chunks: Iterable[np.ndarray],
+    formation_evaluation_metadata_id: str,
+    timestamp: int,
+) -> Iterator[np.ndarray]:
+    """Saves every chunk to the full resolution data collection and passes it on."""
+
+    for chunk in chunks:
+        save_log_data(
             api=api,
-            file_name=properties.file_name,
-            asset_id=event.asset_id,
-            collection=SETTINGS.collection,
-            provider=SETTINGS.provider,
+            event=event,
+            properties=properties,
+            chunks=[map_log_data(header=header, log_data=chunk)],
+            formation_evaluation_metadata_id=formation_evaluation_metadata_id,
+            timestamp=timestamp,
+            collection=SETTINGS.full_resolution_data_collection,
         )
-    except requests.HTTPError:
-        Logger.error(f'Could not delete file_name={properties.file_name}.')
 
-    file = get_file(url=properties.file_url)
+        yield chunk
 
-    parse_result = parser.parse(file=file)
 
-    timestamp = int(datetime.datetime.now(tz=datetime.timezone.utc).timestamp())
+def save_log_data(
+    api: Api,
+    event: TaskEvent,
+    properties: models.EventProperties,
+    chunks: Iterable[List[dict]],
+    formation_evaluation_metadata_id: str,
+    timestamp: int,
+    on_committed: Optional[Callable[[int, float], None]] = None,
+    collection: Optional[str] = None,
+) -> int:
+    """Saves chunks of mapped log data and returns the number of saved rows.
 
-    formation_evaluation_metadata = models.FormationEvaluationMetadata(
+    Records are encoded one by one and batched into requests by their encoded
+    size, see `SETTINGS.max_request_bytes` and `SETTINGS.chunk_size`. Batches are
+    uploaded concurrently, see `SETTINGS.max_in_flight_requests`.
+
+    `on_committed` is called with the number of committed rows and the depth of
+    the last one, see `upload_chunks`.
+    """
+
+    records_count = 0
+    # depths of encoded rows, that are not committed yet
+    depths: Deque[float] = collections.deque()
+    collection = collection or SETTINGS.data_collection
+    payload_builder = DataPayloadBuilder(
         asset_id=event.asset_id,
         timestamp=timestamp,
         company_id=event.company_id,
-        collection=SETTINGS.metadata_collection,
+        collection=collection,
         app=SETTINGS.app_name,
         provider=SETTINGS.provider,
-        data=models.FormationEvaluationMetadataData(
-            params=parse_result.params,
-            well=parse_result.well,
-            curve=parse_result.curves,
-            other=parse_result.other,
-        ),
+        formation_evaluation_id=formation_evaluation_metadata_id,
         file_name=properties.file_name,
-        records_count=parse_result.n_log_data_rows,
         version=SETTINGS.version,
     )
+    limits = RequestLimits(
+        max_bytes=SETTINGS.max_request_bytes,
+        max_rows=SETTINGS.chunk_size,
+        gzip_min_bytes=SETTINGS.gzip_min_bytes,
+    )
+
+    def encode() -> Iterator[bytes]:
+        nonlocal records_count
+
+        for mapped_log_data_chunk in chunks:
+            records_count += len(mapped_log_data_chunk)
+
+            if on_committed is not None:
+                depths.extend(row['md'] for row in mapped_log_data_chunk)
+
+            yield from payload_builder.encode(rows=mapped_log_data_chunk)
+
+    def committed(n_rows: int) -> None:
+        for _ in range(n_rows - 1):
+            depths.popleft()
+
+        on_committed(n_rows, depths.popleft())
+
+    with (
+        metrics.current().stage('upload'),
+        # log data is parsed and encoded ahead, while requests are in flight
+        utils.prefetch(
+            iterable=batch_encoded(encoded=encode(), limits=limits),
+            size=SETTINGS.prefetch_chunks,
+        ) as batches,
+    ):
+        upload_chunks(
+            api=api,
+            chunks=batches,
+            collection=collection,
+            provider=SETTINGS.provider,
+            max_in_flight=SETTINGS.max_in_flight_requests,
+            limits=limits,
+            throttle_retries=SETTINGS.throttle_retries,
+            throttle_backoff=SETTINGS.throttle_backoff,
+            on_committed=committed if on_committed is not None else None,
+        )
+
+    return records_count
+
+
+def save_metadata(
+    api: Api, formation_evaluation_metadata: models.FormationEvaluationMetadata
+) -> str:
+    """Saves metadata and returns its id. Fails in case of exception."""
+
+    with metrics.current().stage('save_metadata'):
+        return save_data(
+            api=api,
+            data=[formation_evaluation_metadata.model_dump()],
+            collection=SETTINGS.metadata_collection,
+            provider=SETTINGS.provider,
+        ).inserted_ids[0]
+
+
+def start_checkpoint(
+    event: TaskEvent,
+    properties: models.EventProperties,
+    formation_evaluation_metadata_id: str,
+    timestamp: int,
+) -> models.Checkpoint:
+    return models.Checkpoint(
+        asset_id=event.asset_id,
+        company_id=event.company_id,
+        file_name=properties.file_name,
+        file_url=str(properties.file_url),
+        formation_evaluation_id=formation_evaluation_metadata_id,
+        timestamp=timestamp,
+    )
+
 
-    # fail in case of exception
-    formation_evaluation_metadata_id = save_data(
+def delete_uncommitted_data(
+    api: Api,
+    event: TaskEvent,
+    properties: models.EventProperties,
+    checkpoint: models.Checkpoint,
+    chunks: Iterable[np.ndarray],
+) -> Iterator[np.ndarray]:
+    """Yields chunks of log data rows after the checkpoint of the resumed import.
+
+    The failed import may have saved rows after its checkpoint: rows committed
+    since the last checkpoint save (e.g. before a timeout) and rows of chunks
+    uploaded concurrently with the failed one. They are deleted before the first
+    chunk is yielded, so they are not saved twice. Rows past the committed depth
+    are deleted in the direction of the file depths, that is given by the depth of
+    the first row after the checkpoint.
+    """
+
+    chunks = iter(chunks)
+
+    if (chunk := next(chunks, None)) is None:
+        return
+
+    if checkpoint.committed_rows and checkpoint.committed_md is None:
+        # checkpoints of older versions don't store the committed depth
+        Logger.warning(
+            f'Could not delete uncommitted data of file_name={properties.file_name}.'
+        )
+    else:
+        with metrics.current().stage('delete'):
+            delete_data_past_depth(
+                api=api,
+                file_name=properties.file_name,
+                asset_id=event.asset_id,
+                md=checkpoint.committed_md,
+                descending=checkpoint.committed_md is not None
+                and chunk[0, 0] < checkpoint.committed_md,
+                collection=SETTINGS.data_collection,
+                provider=SETTINGS.provider,
+            )
+
+    yield chunk
+    yield from chunks
+
+
+def delete_old_data(api: Api, event: TaskEvent, properties: models.EventProperties):
+    try:
+        # Delete old data. New data will be written to the db as a result of this app.
+        with metrics.current().stage('delete'):
+            delete_data_by_file_name(
+                api=api,
+                file_name=properties.file_name,
+                asset_id=event.asset_id,
+                collection=SETTINGS.collection,
+                provider=SETTINGS.provider,
+            )
+    except requests.HTTPError:
+        Logger.error(f'Could not delete file_name={properties.file_name}.')
+
+
+def get_stored_metadata(
+    api: Api,
+    event: TaskEvent,
+    properties: models.EventProperties,
+    checkpoint: Optional[models.Checkpoint],
+) -> Optional[dict]:
+    """Returns metadata of the previous import, if unchanged files are skipped."""
+
+    if not SETTINGS.skip_unchanged or checkpoint is not None:
+        return None
+
+    stored_metadata = get_metadata(
         api=api,
-        data=[formation_evaluation_metadata.model_dump()],
+        file_name=properties.file_name,
+        asset_id=event.asset_id,
         collection=SETTINGS.metadata_collection,
         provider=SETTINGS.provider,
-    ).inserted_ids[0]
+    ) or {}
 
-    for mapped_log_data_chunk in utils.chunker(
-        seq=parse_result.mapped_log_data, size=SETTINGS.chunk_size
-    ):
-        formation_evaluation_data = []
+    # the unchanged file is imported again with other curves
+    if stored_metadata.get('curves') != properties.curves:
+        return {}
 
-        for mapped_log_data in mapped_log_data_chunk:
-            formation_evaluation_data.append(
-                models.FormationEvaluationData(
-                    asset_id=event.asset_id,
-                    timestamp=timestamp,
-                    company_id=event.company_id,
-                    collection=SETTINGS.data_collection,
-                    app=SETTINGS.app_name,
-                    provider=SETTINGS.provider,
-                    metadata=models.FormationEvaluationDataMetadata(
-                        formation_evaluation_id=formation_evaluation_metadata_id,
-                        file_name=properties.file_name,
+    return stored_metadata
+
+
+def import_file(
+    event: TaskEvent,
+    api: Api,
+    properties: models.EventProperties,
+    timestamp: int,
+    checkpoint: Optional[models.Checkpoint],
+    checkpoint_store: Optional[CheckpointStore],
+) -> None:
+    stored_metadata = get_stored_metadata(
+        api=api, event=event, properties=properties, checkpoint=checkpoint
+    )
+    resumed = checkpoint is not None
+
+    # old data is deleted, while the file is downloaded and parsed
+    with concurrent.futures.ThreadPoolExecutor(max_workers=1) as executor:
+        deleting = None
+
+        if stored_metadata is None:
+            if checkpoint is None:
+                deleting = executor.submit(
+                    delete_old_data, api=api, event=event, properties=properties
+                )
+
+            with metrics.current().stage('download'):
+                file = get_file(
+                    url=properties.file_url,
+                    spool_min_bytes=SETTINGS.spool_min_bytes,
+                    spool_dir=SETTINGS.spool_dir,
+                )
+
+            downloaded = None
+        else:
+            try:
+                with metrics.current().stage('download'):
+                    downloaded = download_file(
+                        url=properties.file_url,
+                        etag=stored_metadata.get('file_etag'),
+                        spool_min_bytes=SETTINGS.spool_min_bytes,
+                        spool_dir=SETTINGS.spool_dir,
+                    )
+            except NotModified:
+                Logger.info(f'Skipping not modified file_name={properties.file_name}.')
+                return
+
+            if downloaded.sha256 == stored_metadata.get('file_hash'):
+                Logger.info(f'Skipping unchanged file_name={properties.file_name}.')
+                return
+
+            deleting = executor.submit(
+                delete_old_data, api=api, event=event, properties=properties
+            )
+
+            file = downloaded.content
+
+        parse_result = parse(file=file, event=event, properties=properties)
+
+        # new data must not be saved until old data is deleted
+        if deleting is not None:
+            deleting.result()
+
+    full_resolution = parse_result
+
+    if SETTINGS.depth_step:
+        parse_result = resample_parse_result(parse_result=parse_result)
+
+    if curve_depth_ranges := get_curve_depth_ranges(header=parse_result):
+        curve_depth_ranges.update(log_data=parse_result.log_data)
+
+    formation_evaluation_metadata = build_metadata(
+        event=event,
+        properties=properties,
+        header=parse_result,
+        records_count=parse_result.n_log_data_rows,
+        timestamp=checkpoint.timestamp if checkpoint else timestamp,
+        curve_depth_ranges=curve_depth_ranges,
+    )
+
+    if checkpoint is None:
+        checkpoint = start_checkpoint(
+            event=event,
+            properties=properties,
+            formation_evaluation_metadata_id=save_metadata(
+                api=api, formation_evaluation_metadata=formation_evaluation_metadata
+            ),
+            timestamp=timestamp,
+        )
+
+    checkpointer = Checkpointer(
+        store=checkpoint_store,
+        checkpoint=checkpoint,
+        interval_rows=SETTINGS.checkpoint_interval_rows,
+    )
+    checkpointer.save()
+
+    if SETTINGS.depth_step and SETTINGS.keep_full_resolution:
+        delete_full_resolution_data(api=api, event=event, properties=properties)
+        save_log_data(
+            api=api,
+            event=event,
+            properties=properties,
+            chunks=(
+                map_log_data(header=full_resolution, log_data=chunk)
+                for chunk in utils.chunker(
+                    seq=full_resolution.log_data, size=SETTINGS.chunk_size
+                )
+            ),
+            formation_evaluation_metadata_id=checkpoint.formation_evaluation_id,
+            timestamp=checkpoint.timestamp,
+            collection=SETTINGS.full_resolution_data_collection,
+        )
+
+    log_data_chunks: Iterable[np.ndarray] = utils.chunker(
+        seq=parse_result.log_data[checkpoint.committed_rows :],
+        size=SETTINGS.chunk_size,
+    )
+
+    if resumed:
+        log_data_chunks = delete_uncommitted_data(
+            api=api,
+            event=event,
+            properties=properties,
+            checkpoint=checkpoint,
+            chunks=log_data_chunks,
+        )
+
+    try:
+        save_log_data(
+            api=api,
+            event=event,
+            properties=properties,
+            chunks=(
+                map_log_data(header=parse_result, log_data=chunk)
+                for chunk in log_data_chunks
+            ),
+            formation_evaluation_metadata_id=checkpoint.formation_evaluation_id,
+            timestamp=checkpoint.timestamp,
+            on_committed=checkpointer.on_committed,
+        )
+    finally:
+        # rows committed before the upload failed are not saved again on resume
+        checkpointer.flush()
+
+    if downloaded is not None:
+        # the hash marks the import as complete
+        formation_evaluation_metadata.file_hash = downloaded.sha256
+        formation_evaluation_metadata.file_etag = downloaded.etag
+
+        update_data(
+            api=api,
+            id_=checkpoint.formation_evaluation_id,
+            data=formation_evaluation_metadata.model_dump(),
+            collection=SETTINGS.metadata_collection,
+            provider=SETTINGS.provider,
+        )
+
+    checkpointer.complete()
+
+
+def import_file_streaming(
+    event: TaskEvent,
+    api: Api,
+    properties: models.EventProperties,
+    timestamp: int,
+    checkpoint: Optional[models.Checkpoint],
+    checkpoint_store: Optional[CheckpointStore],
+) -> None:
+    """Imports the file without holding it in memory.
+
+    Header sections are parsed first. Then ~A (ASCII Log Data) section is read from
+    the HTTP response chunk by chunk, so peak memory is bounded by the chunk size.
+    As the number of rows is unknown upfront, metadata is saved with zero
+    records count and updated after all log data was saved.
+
+    The file is hashed while it is read, so unchanged files can be detected only
+    by ETag before the import.
+    """
+
+    stored_metadata = get_stored_metadata(
+        api=api, event=event, properties=properties, checkpoint=checkpoint
+    )
+    resumed = checkpoint is not None
+    normalizer = get_normalizer(company_id=event.company_id)
+
+    try:
+        with open_file(
+            url=str(properties.file_url),
+            etag=stored_metadata.get('file_etag') if stored_metadata else None,
+        ) as file:
+            # old data is deleted, while header sections are downloaded and parsed
+            with concurrent.futures.ThreadPoolExecutor(max_workers=1) as executor:
+                deleting = (
+                    executor.submit(
+                        delete_old_data, api=api, event=event, properties=properties
+                    )
+                    if checkpoint is None
+                    else None
+                )
+
+                with metrics.current().stage('parse_header'):
+                    header = parser.parse_header(
+                        file=file.text,
+                        curves=properties.curves,
+                        normalizer=normalizer,
+                    )
+
+                log_missing_curves(
+                    header=header, properties=properties, normalizer=normalizer
+                )
+
+                # new data must not be saved until old data is deleted
+                if deleting is not None:
+                    deleting.result()
+
+            formation_evaluation_metadata = build_metadata(
+                event=event,
+                properties=properties,
+                header=header,
+                records_count=0,
+                timestamp=checkpoint.timestamp if checkpoint else timestamp,
+            )
+
+            if checkpoint is None:
+                checkpoint = start_checkpoint(
+                    event=event,
+                    properties=properties,
+                    formation_evaluation_metadata_id=save_metadata(
+                        api=api,
+                        formation_evaluation_metadata=formation_evaluation_metadata,
                     ),
-                    data=mapped_log_data,
-                    version=SETTINGS.version,
-                ).model_dump()
+                    timestamp=timestamp,
+                )
+
+            checkpointer = Checkpointer(
+                store=checkpoint_store,
+                checkpoint=checkpoint,
+                interval_rows=SETTINGS.checkpoint_interval_rows,
+            )
+            checkpointer.save()
+            committed_rows = checkpoint.committed_rows
+            log_data_chunks = count_parsed_rows(
+                chunks=parser.iter_log_data(
+                    file=file.text, header=header, size=SETTINGS.chunk_size
+                )
             )
 
+            if SETTINGS.depth_step:
+                if SETTINGS.keep_full_resolution:
+                    delete_full_resolution_data(
+                        api=api, event=event, properties=properties
+                    )
+                    log_data_chunks = save_full_resolution_chunks(
+                        api=api,
+                        event=event,
+                        properties=properties,
+                        header=header,
+                        chunks=log_data_chunks,
+                        formation_evaluation_metadata_id=checkpoint.formation_evaluation_id,
+                        timestamp=checkpoint.timestamp,
+                    )
+
+                log_data_chunks = resampling.iter_resampled(
+                    chunks=log_data_chunks,
+                    step=SETTINGS.depth_step,
+                    method=SETTINGS.resample_method,
+                    null_value=header.null_value,
+                )
+                header = resample_header(header=header)
+
+            curve_depth_ranges = get_curve_depth_ranges(header=header)
+
+            def iter_log_data() -> Iterator[np.ndarray]:
+                for chunk in log_data_chunks:
+                    # committed rows are read again to collect depth ranges
+                    if curve_depth_ranges is not None:
+                        curve_depth_ranges.update(log_data=chunk)
+
+                    yield chunk
+
+            uncommitted_chunks = utils.skip_rows(
+                chunks=iter_log_data(), n_rows=committed_rows
+            )
+
+            if resumed:
+                uncommitted_chunks = delete_uncommitted_data(
+                    api=api,
+                    event=event,
+                    properties=properties,
+                    checkpoint=checkpoint,
+                    chunks=uncommitted_chunks,
+                )
+
+            try:
+                formation_evaluation_metadata.records_count = (
+                    committed_rows
+                    + save_log_data(
+                        api=api,
+                        event=event,
+                        properties=properties,
+                        chunks=(
+                            map_log_data(header=header, log_data=chunk)
+                            for chunk in uncommitted_chunks
+                        ),
+                        formation_evaluation_metadata_id=checkpoint.formation_evaluation_id,
+                        timestamp=checkpoint.timestamp,
+                        on_committed=checkpointer.on_committed,
+                    )
+                )
+            finally:
+                # rows committed before the upload failed are not saved again
+                checkpointer.flush()
+
+            if curve_depth_ranges is not None:
+                formation_evaluation_metadata.data.curve_depth_ranges = (
+                    curve_depth_ranges.ranges
+                )
+
+            if stored_metadata is not None:
+                # the hash marks the import as complete
+                formation_evaluation_metadata.file_hash = file.sha256()
+                formation_evaluation_metadata.file_etag = file.etag
+
+            update_data(
+                api=api,
+                id_=checkpoint.formation_evaluation_id,
+                data=formation_evaluation_metadata.model_dump(),
+                collection=SETTINGS.metadata_collection,
+                provider=SETTINGS.provider,
+            )
+
+            checkpointer.complete()
+    except NotModified:
+        Logger.info(f'Skipping not modified file_name={properties.file_name}.')
+
+
+def import_file_diff(
+    event: TaskEvent, api: Api, properties: models.EventProperties, timestamp: int
+) -> None:
+    """Imports only the difference between the file and its stored log data.
+
+    Rows are matched by measured depth (md). Only inserted or changed rows are
+    saved and only removed or changed depths are deleted, while unchanged rows
+    are kept. The metadata record is updated in place. Files, that were not
+    imported yet, are imported in full.
+    """
+
+    stored_metadata = get_metadata(
+        api=api,
+        file_name=properties.file_name,
+        asset_id=event.asset_id,
+        collection=SETTINGS.metadata_collection,
+        provider=SETTINGS.provider,
+    )
+
+    if stored_metadata is None:
+        import_file(
+            event=event,
+            api=api,
+            properties=properties,
+            timestamp=timestamp,
+            checkpoint=None,
+            checkpoint_store=None,
+        )
+        return
+
+    with metrics.current().stage('download'):
+        file = get_file(
+            url=properties.file_url,
+            spool_min_bytes=SETTINGS.spool_min_bytes,
+            spool_dir=SETTINGS.spool_dir,
+        )
+
+    parse_result = parse(file=file, event=event, properties=properties)
+
+    if SETTINGS.depth_step:
+        parse_result = resample_parse_result(parse_result=parse_result)
+
+    stored_rows = {}
+    # e.g. rows saved twice by a retried request
+    stored_counts = collections.Counter()
+
+    for record in iter_data_by_file_name(
+        api=api,
+        file_name=properties.file_name,
+        asset_id=event.asset_id,
+        collection=SETTINGS.data_collection,
+        provider=SETTINGS.provider,
+        page_size=SETTINGS.diff_page_size,
+    ):
+        stored_rows[record['data']['md']] = record['data']
+        stored_counts[record['data']['md']] += 1
+
+    log_data_diff = diff_log_data(
+        stored=stored_rows,
+        rows=map_log_data(header=parse_result, log_data=parse_result.log_data),
+        stored_counts=stored_counts,
+    )
+
+    Logger.info(
+        f'file_name={properties.file_name} diff: '
+        f'inserted={len(log_data_diff.inserted)} '
+        f'changed={len(log_data_diff.changed)} '
+        f'deleted={len(log_data_diff.deleted_depths)}.'
+    )
+
+    # changed rows are deleted and inserted again
+    delete_data_by_depths(
+        api=api,
+        file_name=properties.file_name,
+        asset_id=event.asset_id,
+        depths=log_data_diff.deleted_depths
+        + [row['md'] for row in log_data_diff.changed],
+        collection=SETTINGS.data_collection,
+        provider=SETTINGS.provider,
+    )
+
+    save_log_data(
+        api=api,
+        event=event,
+        properties=properties,
+        chunks=utils.chunker(seq=log_data_diff.upserted, size=SETTINGS.chunk_size),
+        formation_evaluation_metadata_id=stored_metadata['_id'],
+        timestamp=timestamp,
+    )
+
+    if curve_depth_ranges := get_curve_depth_ranges(header=parse_result):
+        curve_depth_ranges.update(log_data=parse_result.log_data)
+
+    update_data(
+        api=api,
+        id_=stored_metadata['_id'],
+        data=build_metadata(
+            event=event,
+            properties=properties,
+            header=parse_result,
+            records_count=parse_result.n_log_data_rows,
+            timestamp=timestamp,
+            curve_depth_ranges=curve_depth_ranges,
+        ).model_dump(),
+        collection=SETTINGS.metadata_collection,
+        provider=SETTINGS.provider,
+    )
+
+
+def report_metrics(
+    api: Api,
+    event: TaskEvent,
+    properties: models.EventProperties,
+    import_metrics: metrics.ImportMetrics,
+    status: str,
+) -> None:
+    """Logs metrics of the import as one JSON line and optionally saves them."""
+
+    data = {
+        'file_name': properties.file_name,
+        'status': status,
+        **import_metrics.to_dict(),
+    }
+
+    Logger.info(f'Import metrics: {json.dumps(data)}')
+
+    if not SETTINGS.save_metrics:
+        return
+
+    try:
         save_data(
             api=api,
-            data=formation_evaluation_data,
-            collection=SETTINGS.data_collection,
+            data=[
+                {
+                    'asset_id': event.asset_id,
+                    'company_id': event.company_id,
+                    'timestamp': int(
+                        datetime.datetime.now(tz=datetime.timezone.utc).timestamp()
+                    ),
+                    'collection': SETTINGS.metrics_collection,
+                    'app': SETTINGS.app_name,
+                    'provider': SETTINGS.provider,
+                    'version': SETTINGS.version,
+                    'data': data,
+                }
+            ],
+            collection=SETTINGS.metrics_collection,
             provider=SETTINGS.provider,
         )
+    except requests.HTTPError:
+        Logger.error(f'Could not save metrics of file_name={properties.file_name}.')
+
+
+def import_properties(
+    event: TaskEvent, api: Api, properties: models.EventProperties
+) -> None:
+    """Imports the file and reports metrics of the import, even if it failed."""
+
+    with metrics.collect() as import_metrics:
+        status = 'failed'
+
+        try:
+            run_import(event=event, api=api, properties=properties)
+            status = 'imported'
+        finally:
+            report_metrics(
+                api=api,
+                event=event,
+                properties=properties,
+                import_metrics=import_metrics,
+                status=status,
+            )
+
+
+def run_import(
+    event: TaskEvent, api: Api, properties: models.EventProperties
+) -> None:
+    checkpoint_store = get_checkpoint_store(
+        api=api,
+        store=SETTINGS.checkpoint_store,
+        directory=SETTINGS.checkpoint_dir,
+        collection=SETTINGS.checkpoint_collection,
+        provider=SETTINGS.provider,
+    )
+    checkpoint = (
+        checkpoint_store.get(asset_id=event.asset_id, file_name=properties.file_name)
+        if checkpoint_store
+        else None
+    )
+
+    if checkpoint is not None and checkpoint.file_url != str(properties.file_url):
+        # the checkpoint was left by the import of another file
+        checkpoint = None
+
+    if checkpoint is not None:
+        Logger.info(
+            f'Resuming file_name={properties.file_name} '
+            f'from row {checkpoint.committed_rows}.'
+        )
+
+    timestamp = int(datetime.datetime.now(tz=datetime.timezone.utc).timestamp())
+
+    if SETTINGS.import_mode == 'diff':
+        # diff import is idempotent, so it doesn't need checkpoints
+        import_file_diff(
+            event=event, api=api, properties=properties, timestamp=timestamp
+        )
+        return
+
+    import_ = import_file_streaming if SETTINGS.streaming else import_file
+    import_(
+        event=event,
+        api=api,
+        properties=properties,
+        timestamp=timestamp,
+        checkpoint=checkpoint,
+        checkpoint_store=checkpoint_store,
+    )
+
+
+def copy_api(api: Api) -> Api:
+    """New Api with the same settings, that doesn't share connections with `api`."""
+
+    return Api(
+        api_url=api.api_url,
+        data_api_url=api.data_api_url,
+        api_key=api.api_key,
+        app_key=api.app_key,
+        app_connection_id=api.app_connection_id,
+        max_retries=api.max_retries,
+        timeout=api.timeout,
+    )
+
+
+def save_task_results(
+    event: TaskEvent, api: Api, results: List[models.FileImportResult]
+) -> None:
+    """Stores results of the batch in the task payload.
+
+    The task id comes with the task record, that the event is built of. Events,
+    that are built otherwise (e.g. in tests), have no task to store results in.
+    """
+
+    if (task_id := (event.model_extra or {}).get('id')) is None:
+        return
+
+    try:
+        update_task_payload(
+            api=api,
+            task_id=task_id,
+            payload={'files': [result.model_dump(mode='json') for result in results]},
+        )
+    except requests.HTTPError:
+        Logger.error('Could not store the batch results in the task payload.')
+
+
+def import_files(
+    event: TaskEvent, api: Api, properties: models.BatchEventProperties
+) -> List[models.FileImportResult]:
+    """Imports every file of the batch in a separate process.
+
+    Failure of one file doesn't stop imports of the others. Results of all files
+    are stored in the task payload as `{'files': [...]}`, also if some failed.
+
+    Raises:
+        BatchImportError: if any file failed to import.
+    """
+
+    n_processes = SETTINGS.max_processes
+
+    def import_(file_properties: models.EventProperties) -> None:
+        # connections of the forked pool belong to the parent process, so every
+        # child process opens its own
+        import_properties(
+            event=event,
+            api=copy_api(api=api) if n_processes > 1 else api,
+            properties=file_properties,
+        )
+
+    results = [
+        models.FileImportResult(
+            file_name=file_properties.file_name,
+            file_url=str(file_properties.file_url),
+            status='failed' if result.error else 'imported',
+            error=result.error,
+        )
+        for file_properties, result in zip(
+            properties.files,
+            processes.map_processes(
+                func=import_,
+                items=properties.files,
+                processes=n_processes,
+            ),
+        )
+    ]
+
+    for result in results:
+        if result.error:
+            Logger.error(
+                f'Could not import file_name={result.file_name}: {result.error}'
+            )
+        else:
+            Logger.info(f'Imported file_name={result.file_name}.')
+
+    save_task_results(event=event, api=api, results=results)
+
+    if failed := [result.file_name for result in results if result.error]:
+        raise BatchImportError(
+            f'Could not import {len(failed)} of {len(results)} files: '
+            f'{", ".join(failed)}.'
+        )
+
+    return results
+
+
+def formation_evaluation_importer(event: TaskEvent, api: Api) -> None:
+    """Imports the file, or the batch of files."""
+
+    if 'files' in event.properties:
+        import_files(
+            event=event,
+            api=api,
+            properties=models.BatchEventProperties.model_validate(event.properties),
+        )
+        return
+
+    import_properties(
+        event=event,
+        api=api,
+        properties=models.EventProperties.model_validate(event.properties),
+    )
@@ -0,0 +1,73 @@
+import threading
+from typing import Iterable, Iterator, List, Optional
+
+
+class RequestLimits:
+    """Max size of a save request, that adapts to the API responses.
+
+    The max bytes limit is shrunk when the API rejects a request as too large
+    and grows back to the configured value with every successful request.
+    Requests of at least `gzip_min_bytes` are compressed, until the API rejects
+    the encoding. Shared between upload threads.
+    """
+
+    MIN_BYTES = 1024
+    GROWTH_FACTOR = 1.25
+
+    def __init__(
+        self, max_bytes: int, max_rows: int, gzip_min_bytes: Optional[int] = None
+    ):
+        self.configured_max_bytes = max_bytes
+        self.max_bytes = max_bytes
+        self.max_rows = max_rows
+        self.gzip_min_bytes = gzip_min_bytes
+        self._lock = threading.Lock()
+
+    def on_unsupported_encoding(self) -> None:
+        with self._lock:
+            self.gzip_min_bytes = None
+
+    def on_too_large(self, size: int) -> None:
+        with self._lock:
+            self.max_bytes = max(self.MIN_BYTES, min(self.max_bytes, size) // 2)
+
+    def on_success(self) -> None:
+        with self._lock:
+            self.max_bytes = min(
+                self.configured_max_bytes, int(self.max_bytes * self.GROWTH_FACTOR)
+            )
+
+
+def batch_size(batch: List[bytes]) -> int:
+    """Size of the batch encoded as a JSON array."""
+
+    return sum(map(len, batch)) + len(batch) + 1
+
+
+def batch_encoded(
+    encoded: Iterable[bytes], limits: RequestLimits
+) -> Iterator[List[bytes]]:
+    """Groups encoded records into batches within request limits.
+
+    Limits are checked at the time every batch is formed, so shrunk limits apply to
+    the following batches. A record larger than max bytes forms its own batch.
+    """
+
+    batch: List[bytes] = []
+    size = 1  # closing bracket
+
+    for record in encoded:
+        record_size = len(record) + 1  # separator or opening bracket
+
+        if batch and (
+            size + record_size > limits.max_bytes or len(batch) >= limits.max_rows
+        ):
+            yield batch
+            batch = []
+            size = 1
+
+        batch.append(record)
+        size += record_size
+
+    if batch:
+        yield batch
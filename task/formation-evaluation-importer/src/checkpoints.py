@@ -0,0 +1,182 @@
+import abc
+import hashlib
+import json
+import pathlib
+from typing import Optional
+
+from corva import Api
+
+from src.api import save_data, update_data
+from src.models import Checkpoint
+
+
+class CheckpointStore(abc.ABC):
+    """Stores import progress, so failed imports could be resumed."""
+
+    @abc.abstractmethod
+    def get(self, asset_id: int, file_name: str) -> Optional[Checkpoint]: ...
+
+    @abc.abstractmethod
+    def save(self, checkpoint: Checkpoint) -> None: ...
+
+    @abc.abstractmethod
+    def delete(self, asset_id: int, file_name: str) -> None: ...
+
+
+class FileCheckpointStore(CheckpointStore):
+    """Stores checkpoints as JSON files in the local directory."""
+
+    def __init__(self, directory: str):
+        self.directory = pathlib.Path(directory)
+
+    def _path(self, asset_id: int, file_name: str) -> pathlib.Path:
+        digest = hashlib.sha1(file_name.encode()).hexdigest()
+        return self.directory / f'{asset_id}-{digest}.json'
+
+    def get(self, asset_id: int, file_name: str) -> Optional[Checkpoint]:
+        path = self._path(asset_id=asset_id, file_name=file_name)
+
+        if not path.exists():
+            return None
+
+        return Checkpoint.model_validate_json(path.read_text())
+
+    def save(self, checkpoint: Checkpoint) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+        path = self._path(asset_id=checkpoint.asset_id, file_name=checkpoint.file_name)
+        tmp_path = path.with_suffix('.tmp')
+
+        # write and rename, so the checkpoint is never half written
+        tmp_path.write_text(checkpoint.model_dump_json())
+        tmp_path.replace(path)
+
+    def delete(self, asset_id: int, file_name: str) -> None:
+        self._path(asset_id=asset_id, file_name=file_name).unlink(missing_ok=True)
+
+
+class DatasetCheckpointStore(CheckpointStore):
+    """Stores checkpoints as records of the dataset.
+
+    Unlike local files, records survive the retry in a new container.
+    """
+
+    def __init__(self, api: Api, collection: str, provider: str):
+        self.api = api
+        self.collection = collection
+        self.provider = provider
+        self._ids = {}
+
+    def _query(self, asset_id: int, file_name: str) -> dict:
+        return {
+            'query': json.dumps({'asset_id': asset_id, 'data.file_name': file_name})
+        }
+
+    def get(self, asset_id: int, file_name: str) -> Optional[Checkpoint]:
+        response = self.api.get(
+            f'v1/data/{self.provider}/{self.collection}/',
+            params={**self._query(asset_id=asset_id, file_name=file_name), 'limit': 1},
+        )
+        response.raise_for_status()
+
+        if not (records := response.json()):
+            return None
+
+        self._ids[asset_id, file_name] = records[0]['_id']
+
+        return Checkpoint.model_validate(records[0]['data'])
+
+    def save(self, checkpoint: Checkpoint) -> None:
+        key = checkpoint.asset_id, checkpoint.file_name
+        record = {
+            'asset_id': checkpoint.asset_id,
+            'company_id': checkpoint.company_id,
+            'timestamp': checkpoint.timestamp,
+            'collection': self.collection,
+            'provider': self.provider,
+            'data': checkpoint.model_dump(),
+        }
+
+        if key in self._ids:
+            update_data(
+                api=self.api,
+                id_=self._ids[key],
+                data=record,
+                collection=self.collection,
+                provider=self.provider,
+            )
+            return
+
+        self._ids[key] = save_data(
+            api=self.api,
+            data=[record],
+            collection=self.collection,
+            provider=self.provider,
+        ).inserted_ids[0]
+
+    def delete(self, asset_id: int, file_name: str) -> None:
+        self._ids.pop((asset_id, file_name), None)
+
+        self.api.delete(
+            f'v1/data/{self.provider}/{self.collection}/',
+            params=self._query(asset_id=asset_id, file_name=file_name),
+        ).raise_for_status()
+
+
+class Checkpointer:
+    """Saves the checkpoint as log data rows get committed.
+
+    The checkpoint is saved every `interval_rows` committed rows, so the number
+    of store writes doesn't grow with the number of save requests, and by `flush`
+    when the upload fails. Rows saved after the checkpoint (e.g. before a timeout)
+    are deleted on resume, see `src.app.delete_uncommitted_data`.
+    """
+
+    def __init__(
+        self,
+        store: Optional[CheckpointStore],
+        checkpoint: Checkpoint,
+        interval_rows: int,
+    ):
+        self.store = store
+        self.checkpoint = checkpoint
+        self.interval_rows = interval_rows
+        self._saved_rows = checkpoint.committed_rows
+
+    def save(self) -> None:
+        if self.store is not None:
+            self.store.save(checkpoint=self.checkpoint)
+
+        self._saved_rows = self.checkpoint.committed_rows
+
+    def flush(self) -> None:
+        """Saves rows committed since the last save."""
+
+        if self.checkpoint.committed_rows != self._saved_rows:
+            self.save()
+
+    def on_committed(self, n_rows: int, md: float) -> None:
+        self.checkpoint.committed_rows += n_rows
+        self.checkpoint.committed_md = md
+
+        if self.checkpoint.committed_rows - self._saved_rows >= self.interval_rows:
+            self.save()
+
+    def complete(self) -> None:
+        if self.store is not None:
+            self.store.delete(
+                asset_id=self.checkpoint.asset_id,
+                file_name=self.checkpoint.file_name,
+            )
+
+
+def get_checkpoint_store(
+    api: Api, store: Optional[str], directory: str, collection: str, provider: str
+) -> Optional[CheckpointStore]:
+    if store == 'file':
+        return FileCheckpointStore(directory=directory)
+
+    if store == 'dataset':
+        return DatasetCheckpointStore(api=api, collection=collection, provider=provider)
+
+    return None
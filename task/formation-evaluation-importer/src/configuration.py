@@ -1,20 +1,105 @@
+from typing import Dict, List, Literal, Optional
+
+from pydantic import BaseModel, PositiveInt
 from pydantic_settings import BaseSettings
 
 
+class Aliases(BaseModel):
+    """Extra aliases in `src.constants` format, e.g. {'gr': ['gamma', 'gr_edtc']}."""
+
+    mnemonics: Dict[str, List[str]] = {}
+    units: Dict[str, List[str]] = {}
+    unit_buckets: Dict[str, List[str]] = {}
+
+
 class Settings(BaseSettings):
     provider: str = 'big-data-energy'
     collection: str = 'formation-evaluation'
     version: int = 1
     app_name: str = 'formation-evaluation-importer'
+    # Leave NaN and ~W NULL values out of log data rows and store depth ranges
+    # of every curve on the metadata record.
+    drop_nulls: bool = False
+    # Resample log data to depths, that are multiples of this step (in the units
+    # of the index curve). None imports log data as is.
+    depth_step: Optional[float] = None
+    # How values of rows within a depth step are resampled: value of the nearest
+    # row, mean value or min and max values (envelope).
+    resample_method: Literal['nearest', 'mean', 'envelope'] = 'mean'
+    # Save full resolution log data to a separate collection as well, when
+    # log data is resampled.
+    keep_full_resolution: bool = False
+    # Extra mnemonic, unit and unit bucket aliases by company id, as JSON, e.g.
+    # {"1": {"mnemonics": {"gr": ["gamma"]}, "units": {"ohmm": ["ohm*m"]}}}.
+    company_aliases: Dict[int, Aliases] = {}
+    # Max number of log data rows per save request.
     chunk_size: int = 667
+    # Max size of encoded log data save request body.
+    max_request_bytes: int = 1_000_000
+    # Gzip log data save request bodies of at least this size, if the endpoint
+    # accepts `Content-Encoding: gzip`. None disables compression.
+    gzip_min_bytes: Optional[int] = None
+    # Retries of log data save requests throttled by the API (429).
+    throttle_retries: int = 5
+    # Exponential backoff factor (seconds) of throttled requests.
+    throttle_backoff: float = 1.0
+    # Skip re-imports of files, that were not modified (ETag) or have the same
+    # content hash, as the last complete import.
+    skip_unchanged: bool = False
+    # 'replace' deletes stored data of the file and imports it in full.
+    # 'diff' imports only rows, that were inserted, changed or removed by depth.
+    import_mode: Literal['replace', 'diff'] = 'replace'
+    # Page size of stored log data requests in diff mode.
+    diff_page_size: int = 10_000
+    # Where to store import checkpoints, so failed imports resume where they
+    # stopped. 'file' is local to the container, 'dataset' survives cold starts.
+    checkpoint_store: Optional[Literal['file', 'dataset']] = None
+    checkpoint_dir: str = '/tmp/formation-evaluation-importer/checkpoints'
+    # Save the checkpoint every N committed log data rows.
+    checkpoint_interval_rows: int = 10_000
+    # Download files of at least this size to a temporary file in spool_dir and
+    # parse them memory-mapped, instead of holding them in memory. None keeps
+    # all files in memory.
+    spool_min_bytes: Optional[PositiveInt] = None
+    spool_dir: str = '/tmp'
+    # Read ~A (ASCII Log Data) section from the HTTP response chunk by chunk,
+    # instead of downloading and parsing the whole file in memory.
+    streaming: bool = False
+    # Max number of concurrent log data save requests.
+    max_in_flight_requests: int = 4
+    # Number of log data save requests, that are parsed and encoded ahead
+    # in a background thread. 0 disables the background thread.
+    prefetch_chunks: int = 2
+
+    # Max number of files of a batch task, that are imported in parallel
+    # processes. 1 imports files one by one in-process. Every process holds a
+    # whole import in memory, so raise `settings.memory` in manifest.json with it.
+    max_processes: PositiveInt = 1
+
+    # Save metrics of every import (stage times, downloaded bytes, parsed rows,
+    # sent requests, payload bytes, peak RSS) to the metrics collection.
+    # Metrics are logged regardless.
+    save_metrics: bool = False
 
     @property
     def data_collection(self) -> str:
         return f'{self.collection}.data'
 
+    @property
+    def full_resolution_data_collection(self) -> str:
+        return f'{self.collection}.full-resolution-data'
+
     @property
     def metadata_collection(self) -> str:
         return f'{self.collection}.metadata'
 
+    @property
+    def metrics_collection(self) -> str:
+        return f'{self.collection}.metrics'
+
+    @property
+    def checkpoint_collection(self) -> str:
+        return f'{self.collection}.checkpoints'
+
 
 SETTINGS = Settings()
@@ -0,0 +1,58 @@
+from typing import Dict, Iterable, List, Mapping, NamedTuple, Optional, Union
+
+Row = Dict[str, Optional[Union[float, int]]]
+
+
+class LogDataDiff(NamedTuple):
+    """Difference between stored and new log data, matched by measured depth.
+
+    Attributes:
+      inserted: rows with depths, that are not stored.
+      changed: rows with stored depths, but different values, or depths stored
+        more than once.
+      deleted_depths: stored depths, that are not in new log data.
+    """
+
+    inserted: List[Row]
+    changed: List[Row]
+    deleted_depths: List[float]
+
+    @property
+    def upserted(self) -> List[Row]:
+        return self.inserted + self.changed
+
+
+def diff_log_data(
+    stored: Dict[float, Row],
+    rows: Iterable[Row],
+    stored_counts: Optional[Mapping[float, int]] = None,
+) -> LogDataDiff:
+    """Compares new log data rows with stored ones by depth index (md).
+
+    Args:
+      stored: stored rows by depth, one of them for depths stored more than once.
+      rows: new log data rows.
+      stored_counts: number of stored records by depth, if any depth may be
+        stored more than once. Such depths are changed, so that all their
+        records are deleted and the new row is inserted once.
+    """
+
+    stored_counts = stored_counts or {}
+    inserted = []
+    changed = []
+    seen_depths = set()
+
+    for row in rows:
+        depth = row['md']
+        seen_depths.add(depth)
+
+        if (stored_row := stored.get(depth)) is None:
+            inserted.append(row)
+        elif stored_row != row or stored_counts.get(depth, 1) > 1:
+            changed.append(row)
+
+    deleted_depths = [depth for depth in stored if depth not in seen_depths]
+
+    return LogDataDiff(
+        inserted=inserted, changed=changed, deleted_depths=deleted_depths
+    )
@@ -0,0 +1,102 @@
+import contextlib
+import resource
+import sys
+import threading
+import time
+from typing import Dict, Iterator, Optional
+
+
+class ImportMetrics:
+    """Wall time of import stages and counters of one import.
+
+    Counters are shared between upload threads.
+    """
+
+    def __init__(self):
+        self.stages: Dict[str, float] = {}
+        self.counters: Dict[str, int] = {
+            'bytes_downloaded': 0,
+            'rows_parsed': 0,
+            'requests_sent': 0,
+            'payload_bytes': 0,
+        }
+        self._start = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def add(self, **counts: int) -> None:
+        with self._lock:
+            for name, count in counts.items():
+                self.counters[name] = self.counters.get(name, 0) + count
+
+    @contextlib.contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """Adds wall time of the block to the stage, even if it raises."""
+
+        start = time.perf_counter()
+
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+
+            with self._lock:
+                self.stages[name] = self.stages.get(name, 0) + elapsed
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            return {
+                'total_seconds': round(time.perf_counter() - self._start, 3),
+                'stage_seconds': {
+                    name: round(seconds, 3) for name, seconds in self.stages.items()
+                },
+                **self.counters,
+                'peak_rss_bytes': peak_rss(),
+            }
+
+
+def peak_rss() -> int:
+    """Peak resident set size of the process.
+
+    It's the peak since the process start, so in a warm container it may come from
+    a previous import.
+    """
+
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    # kilobytes on Linux, bytes on macOS
+    return max_rss if sys.platform == 'darwin' else max_rss * 1024
+
+
+_current: Optional[ImportMetrics] = None
+
+
+def current() -> ImportMetrics:
+    """Metrics of the running import.
+
+    Outside of `collect` the metrics are collected, but not reported.
+    """
+
+    global _current
+
+    if _current is None:
+        _current = ImportMetrics()
+
+    return _current
+
+
+@contextlib.contextmanager
+def collect() -> Iterator[ImportMetrics]:
+    """Collects metrics of the import in the block.
+
+    Imports run one at a time per process, so the metrics are global and not
+    thread local, to be seen by upload threads as well.
+    """
+
+    global _current
+
+    _current = ImportMetrics()
+
+    try:
+        yield _current
+    finally:
+        _current = None
@@ -1,10 +1,9 @@
 import pathlib
-from typing import Dict, List, Union
+from typing import Dict, List, Literal, Optional, Union
 
+import numpy as np
 from pydantic import AnyHttpUrl, BaseModel, ConfigDict, Field, field_validator
 
-from src.constants import MNEMONICS, UNIT_BUCKETS, UNITS
-
 
 class CorvaModel(BaseModel):
     model_config = ConfigDict(populate_by_name=True)
@@ -13,12 +12,26 @@ class CorvaModel(BaseModel):
 class EventProperties(CorvaModel):
     file_path: pathlib.Path = Field(..., alias='file_name')
     file_url: AnyHttpUrl
+    # Mnemonics of curves to import, e.g. ['GR', 'RHOB']. The index curve is
+    # always imported. None imports all curves.
+    curves: Optional[List[str]] = None
 
     @property
     def file_name(self) -> str:
         return self.file_path.name
 
 
+class BatchEventProperties(CorvaModel):
+    files: List[EventProperties]
+
+
+class FileImportResult(CorvaModel):
+    file_name: str
+    file_url: str
+    status: Literal['imported', 'failed']
+    error: Optional[str] = None
+
+
 class LasSectionRowData(CorvaModel):
     """Stores "~V", "~W", "~C" or "~P" las section row data.
 
@@ -31,26 +44,19 @@ class LasSectionRowData(CorvaModel):
     value: str
     descr: str
 
+    @field_validator('value', mode='before')
+    @classmethod
+    def stringify_value(cls, v) -> str:
+        # lasio parses numeric values (e.g. ~W NULL, STRT) as floats
+        return v if isinstance(v, str) else str(v)
+
 
 class LasSectionRowMapping(CorvaModel):
+    """Corva mnemonic, unit and unit bucket of the row, see `src.normalization`."""
+
     mnemonic: str
     unit: str
-    bucket: str = Field(..., alias='unit')
-
-    @field_validator('mnemonic')
-    @classmethod
-    def set_mnemonic(cls, v: str) -> str:
-        return MNEMONICS.get(v.lower(), v)
-
-    @field_validator('unit')
-    @classmethod
-    def set_unit(cls, v: str) -> str:
-        return UNITS.get(v.lower(), v)
-
-    @field_validator('bucket')
-    @classmethod
-    def set_bucket(cls, v: str) -> str:
-        return UNIT_BUCKETS.get(v.lower(), 'Other')
+    bucket: str
 
 
 class ParsedLasSectionRow(CorvaModel):
@@ -58,24 +64,44 @@ class ParsedLasSectionRow(CorvaModel):
     mapping: LasSectionRowMapping
 
 
-class ParsedLasFile(CorvaModel):
-    """Stores parsed las file data.
+class ParsedLasHeader(CorvaModel):
+    """Stores parsed las file header sections.
 
     Attributes:
-      n_log_data_rows: number of rows in ~A (ASCII Log Data) section.
       well: ~W (Well Information) section.
       curves: ~C (Curve Information) section.
       params: ~P (Parameter Information) section.
       other: ~O (Other Information) section.
-      mapped_log_data: mapped log data.
+      curve_mnemonics: mapped ~C section mnemonics in ~A section column order.
+        Only mnemonics of the selected curves, if curves were selected.
+      columns: ~A section columns of the selected curves. None means all curves.
+      delimiter: ~A section column delimiter. None means any whitespace.
+      null_value: ~W section NULL value, that marks missing log data values.
     """
 
-    n_log_data_rows: int
     well: List[ParsedLasSectionRow]
     curves: List[ParsedLasSectionRow]
     params: List[ParsedLasSectionRow]
     other: str
-    mapped_log_data: List[Dict[str, Union[float, int]]]
+    curve_mnemonics: List[str]
+    columns: Optional[List[int]] = None
+    delimiter: Optional[str] = None
+    null_value: Optional[float] = None
+
+
+class ParsedLasFile(ParsedLasHeader):
+    """Stores parsed las file data.
+
+    Attributes:
+      n_log_data_rows: number of rows in ~A (ASCII Log Data) section.
+      log_data: ~A (ASCII Log Data) section as 2D float array. Columns are in
+        `curve_mnemonics` order.
+    """
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    n_log_data_rows: int
+    log_data: np.ndarray
 
 
 class FormationEvaluationMetadataData(CorvaModel):
@@ -83,6 +109,9 @@ class FormationEvaluationMetadataData(CorvaModel):
     well: List[ParsedLasSectionRow]
     curve: List[ParsedLasSectionRow]
     other: str
+    # [start, stop] depth ranges, where curves have values, by curve mnemonic.
+    # Stored, when null values are dropped from log data rows.
+    curve_depth_ranges: Optional[Dict[str, List[List[float]]]] = None
 
 
 class FormationEvaluationMetadata(CorvaModel):
@@ -96,6 +125,15 @@ class FormationEvaluationMetadata(CorvaModel):
     file: str = Field(..., alias='file_name')
     records_count: int
     version: int
+    # SHA-256 and ETag of the imported file. Set once all log data was saved.
+    file_hash: Optional[str] = None
+    file_etag: Optional[str] = None
+    # Depth step and method, log data was resampled with.
+    depth_step: Optional[float] = None
+    resample_method: Optional[str] = None
+    # Curves selected by the task properties. None, if all curves were imported.
+    # The curve section keeps all curves of the file regardless.
+    curves: Optional[List[str]] = None
 
 
 class FormationEvaluationDataMetadata(CorvaModel):
@@ -115,5 +153,25 @@ class FormationEvaluationData(CorvaModel):
     version: int
 
 
+class Checkpoint(CorvaModel):
+    """Stores the progress of the import.
+
+    Attributes:
+      formation_evaluation_id: id of the saved metadata record.
+      timestamp: timestamp of the import records.
+      committed_rows: number of leading log data rows, that were saved.
+      committed_md: measured depth of the last committed row.
+    """
+
+    asset_id: int
+    company_id: int
+    file_name: str
+    file_url: str
+    formation_evaluation_id: str
+    timestamp: int
+    committed_rows: int = 0
+    committed_md: Optional[float] = None
+
+
 class SaveDataReponse(CorvaModel):
     inserted_ids: List[str]
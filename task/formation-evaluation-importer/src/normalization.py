@@ -0,0 +1,146 @@
+import functools
+import re
+from typing import Callable, Dict, List, Optional
+
+import lasio
+
+from src.configuration import SETTINGS, Aliases
+from src.constants import MNEMONICS, UNIT_BUCKETS, UNITS, reverse_dict
+from src.models import LasSectionRowData, LasSectionRowMapping, ParsedLasSectionRow
+
+# Variants of an alias differ only by case and these characters between letters
+# or digits, e.g. 'Ohm.m', 'OHM-M' and 'ohmm'. Leading and trailing ones are
+# kept, as 'ohm-' (ohm-meter) and 'ohm' are different units.
+SEPARATORS = re.compile(r'(?<=[^\W_])[\s._-]+(?=[^\W_])')
+# Max number of memoized lookups per table.
+CACHE_SIZE = 4096
+
+
+def alias_variant(alias: str) -> str:
+    return SEPARATORS.sub('', alias.lower())
+
+
+def compile_table(aliases: Dict[str, str]) -> Dict[str, str]:
+    """Maps lowercase aliases and their variants (see `alias_variant`) to values.
+
+    Exact aliases take precedence over variants. Variants of aliases of different
+    values are ambiguous and are left out, as are empty variants (e.g. of '"').
+    """
+
+    variants: Dict[str, str] = {}
+    ambiguous = set()
+
+    for alias, value in aliases.items():
+        if not (variant := alias_variant(alias)):
+            continue
+
+        if variants.setdefault(variant, value) != value:
+            ambiguous.add(variant)
+
+    for variant in ambiguous:
+        del variants[variant]
+
+    return {**variants, **{alias.lower(): value for alias, value in aliases.items()}}
+
+
+def memoize(table: Dict[str, str]) -> Callable[[str], Optional[str]]:
+    """Memoized lookup of the alias or its variant in the compiled table."""
+
+    @functools.lru_cache(maxsize=CACHE_SIZE)
+    def lookup(alias: str) -> Optional[str]:
+        alias = alias.lower()
+
+        if (value := table.get(alias)) is None:
+            value = table.get(alias_variant(alias))
+
+        return value
+
+    return lookup
+
+
+class Normalizer:
+    """Maps mnemonics and units of LAS section rows to Corva names and buckets.
+
+    Tables are compiled once and lookups are memoized, as the same mnemonics and
+    units repeat across sections, files and imports of a warm container.
+    """
+
+    def __init__(
+        self,
+        mnemonics: Dict[str, str],
+        units: Dict[str, str],
+        unit_buckets: Dict[str, str],
+    ):
+        self.aliases = {
+            'mnemonics': mnemonics,
+            'units': units,
+            'unit_buckets': unit_buckets,
+        }
+        # lookups return None for unknown aliases
+        self.find_mnemonic = memoize(table=compile_table(mnemonics))
+        self.find_unit = memoize(table=compile_table(units))
+        self.find_bucket = memoize(table=compile_table(unit_buckets))
+
+    def mnemonic(self, mnemonic: str) -> str:
+        value = self.find_mnemonic(mnemonic)
+        return mnemonic if value is None else value
+
+    def unit(self, unit: str) -> str:
+        value = self.find_unit(unit)
+        return unit if value is None else value
+
+    def bucket(self, unit: str) -> str:
+        if (value := self.find_bucket(unit)) is None:
+            # units of extra aliases are bucketed by their Corva unit
+            value = self.find_bucket(self.unit(unit))
+
+        return 'Other' if value is None else value
+
+    def map_curve_mnemonics(self, curve_mnemonics: List[str]) -> List[str]:
+        return [self.mnemonic(mnemonic) for mnemonic in curve_mnemonics]
+
+    def map_section(self, section: lasio.SectionItems) -> List[ParsedLasSectionRow]:
+        """Parses and maps all rows of the section.
+
+        Rows come from lasio and are built without validation.
+        """
+
+        return [
+            ParsedLasSectionRow.model_construct(
+                data=LasSectionRowData.model_construct(
+                    mnemonic=row.mnemonic,
+                    units=row.unit,
+                    value=LasSectionRowData.stringify_value(row.value),
+                    descr=row.descr,
+                ),
+                mapping=LasSectionRowMapping.model_construct(
+                    mnemonic=self.mnemonic(row.mnemonic),
+                    unit=self.unit(row.unit),
+                    bucket=self.bucket(row.unit),
+                ),
+            )
+            for row in section
+        ]
+
+    def extend(self, aliases: Aliases) -> 'Normalizer':
+        """Normalizer with extra aliases in `src.constants` format."""
+
+        return Normalizer(
+            **{
+                name: {**table, **reverse_dict(dict_=getattr(aliases, name))}
+                for name, table in self.aliases.items()
+            }
+        )
+
+
+NORMALIZER = Normalizer(mnemonics=MNEMONICS, units=UNITS, unit_buckets=UNIT_BUCKETS)
+
+
+@functools.lru_cache(maxsize=None)
+def get_normalizer(company_id: int) -> Normalizer:
+    """Normalizer with the company aliases of `SETTINGS.company_aliases`."""
+
+    if (aliases := SETTINGS.company_aliases.get(company_id)) is None:
+        return NORMALIZER
+
+    return NORMALIZER.extend(aliases=aliases)
@@ -1,45 +1,180 @@
-from typing import Dict, List, Union
+import io
+import mmap
+import re
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, TextIO, Tuple, Union
 
 import lasio
+import numpy as np
 
-from src.constants import MNEMONICS
-from src.models import (
-    LasSectionRowData,
-    LasSectionRowMapping,
-    ParsedLasFile,
-    ParsedLasSectionRow,
+from src.models import ParsedLasFile, ParsedLasHeader
+from src.normalization import NORMALIZER, Normalizer
+
+# ~V (Version Information) section DLM values mapped to str.split separators.
+DELIMITERS = {'SPACE': None, 'COMMA': ',', 'TAB': '\t'}
+# ~A (ASCII Log Data) section title line.
+LOG_DATA_TITLE = re.compile(r'^[ \t]*~A.*(?:\r?\n|$)', re.IGNORECASE | re.MULTILINE)
+LOG_DATA_TITLE_BYTES = re.compile(
+    LOG_DATA_TITLE.pattern.encode(), re.IGNORECASE | re.MULTILINE
 )
 
+# Downloaded file as text or as a memory map of its bytes, see `src.api.get_file`.
+LasContent = Union[str, mmap.mmap]
+
+
+def map_curve_mnemonics(
+    curve_mnemonics: List[str],
+    normalizer: Normalizer = NORMALIZER,
+) -> List[str]:
+    return normalizer.map_curve_mnemonics(curve_mnemonics=curve_mnemonics)
+
+
+def select_columns(
+    curve_mnemonics: List[str],
+    curves: Optional[Sequence[str]],
+    normalizer: Normalizer = NORMALIZER,
+) -> Optional[List[int]]:
+    """~A (ASCII Log Data) section columns of the selected curves in file order.
+
+    Curves are matched by mapped, case insensitive mnemonics, e.g. DEPT matches md.
+    The index curve (i.e. first curve) is always selected.
+
+    Returns:
+        None, if all curves are selected.
+    """
+
+    if curves is None:
+        return None
 
-def parse_section(
-    section: lasio.SectionItems,
-) -> List[ParsedLasSectionRow]:
-    return [
-        ParsedLasSectionRow(
-            data=LasSectionRowData.model_validate(row.__dict__),
-            mapping=LasSectionRowMapping.model_validate(row.__dict__),
+    selected = set(
+        map_curve_mnemonics(
+            curve_mnemonics=[curve.lower() for curve in curves], normalizer=normalizer
         )
-        for row in section
+    )
+
+    return [0] + [
+        idx
+        for idx, mnemonic in enumerate(curve_mnemonics)
+        if idx and mnemonic in selected
     ]
 
 
+def get_valid_mask(log_data: np.ndarray, null_value: Optional[float]) -> np.ndarray:
+    """Marks log data values, that are neither NaN nor the NULL value.
+
+    The index curve (i.e. first curve) is always valid, so every row keeps its depth.
+    """
+
+    valid_mask = ~np.isnan(log_data)
+
+    if null_value is not None:
+        valid_mask &= log_data != null_value
+
+    valid_mask[:, :1] = True
+
+    return valid_mask
+
+
+def map_sparse_log_data(
+    log_data: np.ndarray, curve_mnemonics: List[str], null_value: Optional[float]
+) -> List[Dict[str, float]]:
+    """Materializes log data rows as dicts without null and NaN values.
+
+    Rows are grouped by the set of curves, that have values. Curve values of every
+    group are selected at once, so Python level work is done once per row only.
+    Rows are sorted by group once, instead of scanning all rows for every group.
+    """
+
+    valid_mask = get_valid_mask(log_data=log_data, null_value=null_value)
+    patterns, pattern_idxs, counts = np.unique(
+        valid_mask, axis=0, return_inverse=True, return_counts=True
+    )
+    # row indexes of every group in row order
+    grouped_row_idxs = np.split(
+        np.argsort(pattern_idxs.reshape(-1), kind='stable'), np.cumsum(counts)[:-1]
+    )
+    rows: List[Optional[Dict[str, float]]] = [None] * len(log_data)
+
+    for pattern, row_idxs in zip(patterns, grouped_row_idxs):
+        curve_idxs = np.flatnonzero(pattern)
+        mnemonics = [curve_mnemonics[curve_idx] for curve_idx in curve_idxs]
+
+        for row_idx, log_row in zip(
+            row_idxs.tolist(), log_data[np.ix_(row_idxs, curve_idxs)].tolist()
+        ):
+            rows[row_idx] = dict(zip(mnemonics, log_row))
+
+    return rows
+
+
 def map_log_data(
-    log_data: List[List[Union[float, int]]],
+    log_data: np.ndarray,
     curve_mnemonics: List[str],
-    mnemonics: Dict[str, str] = MNEMONICS,
-) -> List[Dict[str, Union[float, int]]]:
-    curve_mnemonics = [
-        mnemonics.get(mnemonic, mnemonic) for mnemonic in curve_mnemonics
-    ]
+    drop_nulls: bool = False,
+    null_value: Optional[float] = None,
+) -> List[Dict[str, Optional[float]]]:
+    """Materializes log data rows as dicts keyed by curve mnemonics.
+
+    NaN values are replaced with None (JSON null), as NaN is not valid JSON.
+    With `drop_nulls` NaN and `null_value` values are left out of the rows.
+    """
 
-    result = [dict(zip(curve_mnemonics, log_row)) for log_row in log_data]
+    if drop_nulls:
+        return map_sparse_log_data(
+            log_data=log_data, curve_mnemonics=curve_mnemonics, null_value=null_value
+        )
 
-    return result
+    nan_mask = np.isnan(log_data)
+
+    if nan_mask.any():
+        log_data = log_data.astype(object)
+        log_data[nan_mask] = None
+
+    return [dict(zip(curve_mnemonics, log_row)) for log_row in log_data.tolist()]
+
+
+class CurveDepthRanges:
+    """Collects depth ranges, where every curve has values.
+
+    Log data is passed chunk by chunk in depth order. Ranges, that continue
+    in the next chunk, are merged.
+    """
+
+    def __init__(self, curve_mnemonics: List[str], null_value: Optional[float]):
+        self.curve_mnemonics = curve_mnemonics
+        self.null_value = null_value
+        self.ranges: Dict[str, List[List[float]]] = {
+            mnemonic: [] for mnemonic in curve_mnemonics
+        }
+        # whether every curve had a value in the last row of the previous chunk
+        self._open = np.zeros(len(curve_mnemonics), dtype=bool)
+
+    def update(self, log_data: np.ndarray) -> None:
+        if not len(log_data):
+            return
+
+        valid_mask = get_valid_mask(log_data=log_data, null_value=self.null_value)
+        depths = log_data[:, 0].tolist()
+        # +1 marks the first row of a range, -1 the row after its last row
+        edges = np.diff(
+            np.pad(valid_mask.astype(np.int8), ((1, 1), (0, 0))), axis=0
+        )
+
+        for curve_idx, mnemonic in enumerate(self.curve_mnemonics):
+            starts = np.flatnonzero(edges[:, curve_idx] == 1).tolist()
+            stops = (np.flatnonzero(edges[:, curve_idx] == -1) - 1).tolist()
+            ranges = [[depths[start], depths[stop]] for start, stop in zip(starts, stops)]
+
+            if ranges and self._open[curve_idx] and starts[0] == 0:
+                self.ranges[mnemonic][-1][1] = ranges.pop(0)[1]
+
+            self.ranges[mnemonic].extend(ranges)
+
+        self._open = valid_mask[-1]
 
 
 def validate_index_curve_mnemonic(
     las_file: lasio.LASFile,
-    mnemonics: Dict[str, str] = MNEMONICS,
+    normalizer: Normalizer = NORMALIZER,
 ):
     """The index curve (i.e. first curve) must be depth.
 
@@ -48,30 +183,272 @@ def validate_index_curve_mnemonic(
     """
     curves = las_file.curves
 
-    if mnemonics.get(curves[0].mnemonic) != 'md':
+    if normalizer.find_mnemonic(curves[0].mnemonic) != 'md':
         raise ValueError('The index curve must be depth.')
 
 
-def parse(file: str) -> ParsedLasFile:
-    las_file = lasio.read(file, null_policy='none', mnemonic_case='lower')
+def parse_null_value(las_file: lasio.LASFile) -> Optional[float]:
+    null = las_file.well.get('NULL')
 
-    validate_index_curve_mnemonic(las_file=las_file)
+    try:
+        return float(null.value) if null is not None else None
+    except ValueError:
+        return None
 
-    # ~A (ASCII Log Data) section. Each column is a dataset.
-    log_data: List[List[Union[float, int]]] = las_file.data.tolist()
 
+def parse_header_sections(
+    las_file: lasio.LASFile,
+    curves: Optional[Sequence[str]] = None,
+    normalizer: Normalizer = NORMALIZER,
+) -> ParsedLasHeader:
+    """Parses header sections, see `select_columns` for `curves`.
+
+    ~C section keeps all curves, only `curve_mnemonics` are of the selected curves.
+    """
+
+    dlm = las_file.version.get('DLM')
     # ~C (Curve Information) section mnemonics. Each mnemonic is a dataset name.
     # Mnemonics are specified in the order they appear in the ~A (ASCII Log Data)
     # section.
-    curve_mnemonics: List[str] = [curve.mnemonic for curve in las_file.curves]
+    curve_mnemonics = map_curve_mnemonics(
+        curve_mnemonics=[curve.mnemonic for curve in las_file.curves],
+        normalizer=normalizer,
+    )
+    columns = select_columns(
+        curve_mnemonics=curve_mnemonics, curves=curves, normalizer=normalizer
+    )
 
-    return ParsedLasFile(
-        n_log_data_rows=len(log_data),
-        well=parse_section(section=las_file.well),
-        curves=parse_section(section=las_file.curves),
-        params=parse_section(section=las_file.params),
+    return ParsedLasHeader(
+        well=normalizer.map_section(section=las_file.well),
+        curves=normalizer.map_section(section=las_file.curves),
+        params=normalizer.map_section(section=las_file.params),
         other=las_file.other,
-        mapped_log_data=map_log_data(
-            log_data=log_data, curve_mnemonics=curve_mnemonics
+        curve_mnemonics=(
+            curve_mnemonics
+            if columns is None
+            else [curve_mnemonics[idx] for idx in columns]
         ),
+        columns=columns,
+        delimiter=DELIMITERS.get(str(dlm.value).upper()) if dlm is not None else None,
+        null_value=parse_null_value(las_file=las_file),
     )
+
+
+def read_lasio(file: str, **kwargs) -> lasio.LASFile:
+    return lasio.read(file, null_policy='none', mnemonic_case='lower', **kwargs)
+
+
+def decode(content: Union[str, bytes, mmap.mmap]) -> str:
+    return content if isinstance(content, str) else content[:].decode()
+
+
+def find_log_data_start(file: LasContent) -> Optional[int]:
+    """Position of the first line after the ~A (ASCII Log Data) section title."""
+
+    title = LOG_DATA_TITLE if isinstance(file, str) else LOG_DATA_TITLE_BYTES
+
+    if (match := title.search(file)) is None:
+        return None
+
+    return match.end()
+
+
+def iter_lines(file: LasContent, start: int) -> Iterable[str]:
+    """Lines of the file from the position, without copying the rest of a map."""
+
+    if isinstance(file, str):
+        return io.StringIO(file[start:])
+
+    file.seek(start)
+
+    return map(bytes.decode, iter(file.readline, b''))
+
+
+def read_log_data(
+    lines: Iterable[str], n_curves: int, columns: Optional[List[int]] = None
+) -> np.ndarray:
+    """Parses ~A (ASCII Log Data) section of one row per line in bulk.
+
+    Only `columns` are converted to floats, if given.
+
+    Raises:
+        ValueError: if rows are irregular or values are not numeric.
+    """
+
+    if columns is None:
+        log_data = np.loadtxt(lines, dtype=float, comments='#', ndmin=2)
+
+        if len(log_data) and log_data.shape[1] != n_curves:
+            raise ValueError(f'Expected {n_curves} values per row.')
+
+        return log_data.reshape(-1, n_curves)
+
+    # rows with less values, than curves, raise on the last column
+    usecols = sorted({*columns, n_curves - 1})
+    log_data = np.loadtxt(lines, dtype=float, comments='#', ndmin=2, usecols=usecols)
+
+    return log_data.reshape(-1, len(usecols))[:, [usecols.index(idx) for idx in columns]]
+
+
+def read_las_file(
+    file: LasContent,
+    curves: Optional[Sequence[str]] = None,
+    normalizer: Normalizer = NORMALIZER,
+) -> Tuple[lasio.LASFile, np.ndarray]:
+    """Reads the file with lasio, except for the ~A (ASCII Log Data) section.
+
+    lasio parses ~A section line by line, which takes most of the read time.
+    Header sections are read with lasio and ~A section of unwrapped,
+    whitespace delimited files is parsed by NumPy. Wrapped or irregular files are
+    read by lasio as a whole, memory-mapped files are decoded to text for that.
+
+    Returns:
+        the file and its log data of the selected curves, see `select_columns`.
+    """
+
+    if (log_data_start := find_log_data_start(file=file)) is None:
+        return read_lasio_log_data(file=file, curves=curves, normalizer=normalizer)
+
+    # header sections are read without the ~A section
+    las_file = read_lasio(decode(file[:log_data_start]), ignore_data=True)
+    wrap = las_file.version.get('WRAP')
+    dlm = las_file.version.get('DLM')
+
+    delimiter = DELIMITERS.get(str(dlm.value).upper(), '') if dlm is not None else None
+
+    if (wrap is not None and str(wrap.value).upper() != 'NO') or delimiter not in (
+        None,
+        '\t',
+    ):
+        return read_lasio_log_data(file=file, curves=curves, normalizer=normalizer)
+
+    try:
+        log_data = read_log_data(
+            lines=iter_lines(file=file, start=log_data_start),
+            n_curves=len(las_file.curves),
+            columns=select_columns(
+                curve_mnemonics=map_curve_mnemonics(
+                    curve_mnemonics=[curve.mnemonic for curve in las_file.curves],
+                    normalizer=normalizer,
+                ),
+                curves=curves,
+                normalizer=normalizer,
+            ),
+        )
+    except ValueError:
+        return read_lasio_log_data(file=file, curves=curves, normalizer=normalizer)
+
+    return las_file, log_data
+
+
+def read_lasio_log_data(
+    file: LasContent, curves: Optional[Sequence[str]], normalizer: Normalizer
+) -> Tuple[lasio.LASFile, np.ndarray]:
+    las_file = read_lasio(decode(file))
+    # ~A (ASCII Log Data) section. Each column is a dataset.
+    log_data = np.asarray(las_file.data, dtype=float)
+    columns = select_columns(
+        curve_mnemonics=map_curve_mnemonics(
+            curve_mnemonics=[curve.mnemonic for curve in las_file.curves],
+            normalizer=normalizer,
+        ),
+        curves=curves,
+        normalizer=normalizer,
+    )
+
+    if columns is not None and len(log_data):
+        log_data = log_data[:, columns]
+
+    return las_file, log_data
+
+
+def parse(
+    file: LasContent,
+    curves: Optional[Sequence[str]] = None,
+    normalizer: Normalizer = NORMALIZER,
+) -> ParsedLasFile:
+    """Parses the file, see `select_columns` for `curves`."""
+
+    las_file, log_data = read_las_file(file=file, curves=curves, normalizer=normalizer)
+
+    validate_index_curve_mnemonic(las_file=las_file, normalizer=normalizer)
+
+    header = parse_header_sections(
+        las_file=las_file, curves=curves, normalizer=normalizer
+    )
+
+    return ParsedLasFile(
+        **dict(header),
+        n_log_data_rows=len(log_data),
+        log_data=log_data,
+    )
+
+
+def read_header(file: TextIO) -> str:
+    """Reads the file up to and including the ~A (ASCII Log Data) section title."""
+
+    lines = []
+
+    for line in file:
+        lines.append(line)
+
+        if line.lstrip().upper().startswith('~A'):
+            break
+
+    return ''.join(lines)
+
+
+def parse_header(
+    file: TextIO,
+    curves: Optional[Sequence[str]] = None,
+    normalizer: Normalizer = NORMALIZER,
+) -> ParsedLasHeader:
+    """Parses header sections, leaving the file positioned at the first ~A row."""
+
+    las_file = read_lasio(read_header(file=file), ignore_data=True)
+
+    validate_index_curve_mnemonic(las_file=las_file, normalizer=normalizer)
+
+    return parse_header_sections(
+        las_file=las_file, curves=curves, normalizer=normalizer
+    )
+
+
+def iter_log_data(
+    file: TextIO, header: ParsedLasHeader, size: int
+) -> Iterator[np.ndarray]:
+    """Lazily reads ~A (ASCII Log Data) section in chunks of `size` rows.
+
+    Values are consumed as a stream of tokens, that are grouped by the number of
+    curves. This way wrapped files (WRAP. YES) are supported too. Only one chunk of
+    rows is held in memory at a time. Chunks have only `header.columns`, if set.
+    """
+
+    n_curves = len(header.curves)
+    chunk_values = size * n_curves
+    values: List[float] = []
+
+    def project(chunk: np.ndarray) -> np.ndarray:
+        return chunk if header.columns is None else chunk[:, header.columns]
+
+    for line in file:
+        line = line.strip()
+
+        if not line or line.startswith('#'):
+            continue
+
+        if line.startswith('~'):
+            break
+
+        values.extend(map(float, line.split(header.delimiter)))
+
+        while len(values) >= chunk_values:
+            yield project(np.array(values[:chunk_values]).reshape(size, n_curves))
+            del values[:chunk_values]
+
+    n_rows = len(values) // n_curves
+
+    if n_rows:
+        yield project(
+            np.array(values[: n_rows * n_curves]).reshape(n_rows, n_curves)
+        )
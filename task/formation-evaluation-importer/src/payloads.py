@@ -0,0 +1,56 @@
+from typing import Dict, Iterable, Iterator, List, Optional, Union
+
+from src.models import FormationEvaluationData, FormationEvaluationDataMetadata
+from src.serialization import Fragments
+
+
+class DataPayloadBuilder:
+    """Builds formation-evaluation.data records.
+
+    All record fields except `data` are the same for every log row of an import.
+    The envelope is validated once and per row `data` dicts are stamped into its
+    copies, which gives the same output as `FormationEvaluationData.model_dump`
+    without validating and dumping a model per row.
+    """
+
+    def __init__(
+        self,
+        asset_id: int,
+        timestamp: int,
+        company_id: int,
+        collection: str,
+        app: str,
+        provider: str,
+        formation_evaluation_id: str,
+        file_name: str,
+        version: int,
+    ):
+        self.envelope = FormationEvaluationData(
+            asset_id=asset_id,
+            timestamp=timestamp,
+            company_id=company_id,
+            collection=collection,
+            app=app,
+            provider=provider,
+            metadata=FormationEvaluationDataMetadata(
+                formation_evaluation_id=formation_evaluation_id,
+                file_name=file_name,
+            ),
+            data={},
+            version=version,
+        ).model_dump()
+
+        # Envelope is encoded once, rows are encoded between its fragments.
+        self.fragments = Fragments(envelope=self.envelope, key='data')
+
+    def build(self, rows: Iterable[Dict[str, Union[float, int]]]) -> List[dict]:
+        # `data` key already exists in the envelope, so it keeps its position.
+        envelope = self.envelope
+        return [{**envelope, 'data': row} for row in rows]
+
+    def encode(
+        self, rows: Iterable[Dict[str, Optional[Union[float, int]]]]
+    ) -> Iterator[bytes]:
+        """Encodes every record to JSON, without building the record dicts."""
+
+        return map(self.fragments.encode, rows)
@@ -0,0 +1,97 @@
+import multiprocessing
+import multiprocessing.connection
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    List,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Tuple,
+    TypeVar,
+)
+
+T = TypeVar('T')
+
+
+class ProcessResult(NamedTuple):
+    value: Any
+    error: Optional[str]
+
+
+def call(func: Callable[[T], Any], item: T) -> ProcessResult:
+    try:
+        return ProcessResult(value=func(item), error=None)
+    except Exception as exc:
+        return ProcessResult(value=None, error=f'{type(exc).__name__}: {exc}')
+
+
+def _worker(
+    func: Callable[[T], Any], item: T, conn: multiprocessing.connection.Connection
+) -> None:
+    try:
+        conn.send(call(func=func, item=item))
+    finally:
+        conn.close()
+
+
+def map_processes(
+    func: Callable[[T], Any], items: Sequence[T], processes: int
+) -> List[ProcessResult]:
+    """Calls the function for every item in a separate process.
+
+    At most `processes` processes run at a time, every process handles one item.
+    With a single process items are handled in the current process.
+
+    Processes are forked and report results through pipes. `multiprocessing.Pool`
+    and queues need shared memory (/dev/shm), that is not available on AWS Lambda.
+
+    Returns:
+        results in the order of items. Exceptions raised by the function and
+        crashes of the process are returned as errors.
+    """
+
+    if processes <= 1:
+        return [call(func=func, item=item) for item in items]
+
+    context = multiprocessing.get_context('fork')
+    results: List[Optional[ProcessResult]] = [None] * len(items)
+    running: Dict[multiprocessing.connection.Connection, Tuple[int, Any]] = {}
+    pending = iter(enumerate(items))
+
+    def start() -> bool:
+        if (next_item := next(pending, None)) is None:
+            return False
+
+        idx, item = next_item
+        receiver, sender = context.Pipe(duplex=False)
+        process = context.Process(target=_worker, args=(func, item, sender))
+        process.start()
+        sender.close()  # the child keeps its own copy
+        running[receiver] = idx, process
+
+        return True
+
+    while len(running) < processes and start():
+        pass
+
+    while running:
+        for receiver in multiprocessing.connection.wait(list(running)):
+            idx, process = running.pop(receiver)
+
+            try:
+                # receive before join, so a large result doesn't block the child
+                results[idx] = receiver.recv()
+            except EOFError:
+                process.join()
+                results[idx] = ProcessResult(
+                    value=None, error=f'Process exited with code {process.exitcode}.'
+                )
+            finally:
+                receiver.close()
+                process.join()
+
+            start()
+
+    return results
@@ -0,0 +1,141 @@
+from typing import Iterable, Iterator, List, Literal, Optional
+
+import numpy as np
+
+Method = Literal['nearest', 'mean', 'envelope']
+
+
+def resampled_curve_mnemonics(curve_mnemonics: List[str], method: Method) -> List[str]:
+    """Envelope keeps min and max values of every curve except the index curve."""
+
+    if method != 'envelope':
+        return curve_mnemonics
+
+    return curve_mnemonics[:1] + [
+        f'{mnemonic}_{stat}'
+        for mnemonic in curve_mnemonics[1:]
+        for stat in ('min', 'max')
+    ]
+
+
+def resample(
+    log_data: np.ndarray,
+    step: float,
+    method: Method,
+    null_value: Optional[float] = None,
+) -> np.ndarray:
+    """Resamples log data to depths, that are multiples of `step`.
+
+    Rows are grouped by the nearest multiple of `step` of their depth (the index
+    curve). Rows must be ordered by depth, increasing or decreasing.
+
+    Methods:
+      nearest: values of the row with the depth nearest to the group depth.
+      mean: mean curve values of the group.
+      envelope: min and max curve values of the group, see
+        `resampled_curve_mnemonics` for the column order.
+
+    Null values are replaced with NaN and are ignored by mean and envelope.
+    """
+
+    n_columns = len(resampled_curve_mnemonics(['md'] * log_data.shape[1], method))
+
+    if not len(log_data):
+        return np.empty((0, n_columns))
+
+    depths = log_data[:, 0]
+    values = log_data[:, 1:]
+
+    if null_value is not None:
+        values = np.where(values == null_value, np.nan, values)
+
+    depth_idxs = np.round(depths / step).astype(np.int64)
+    group_starts = np.flatnonzero(np.diff(depth_idxs, prepend=depth_idxs[0] - 1))
+    # rounding hides float errors of the multiplication, e.g. 3 * 0.1
+    resampled_depths = np.round(depth_idxs[group_starts] * step, 10)
+
+    if method == 'nearest':
+        group_idxs = np.cumsum(np.diff(depth_idxs, prepend=depth_idxs[0]) != 0)
+        distances = np.abs(depths - depth_idxs * step)
+        # sorted by group and then by distance, so every group starts with its
+        # nearest row
+        order = np.lexsort((distances, group_idxs))
+        resampled_values = values[order[group_starts]]
+    elif method == 'mean':
+        valid_mask = ~np.isnan(values)
+        sums = np.add.reduceat(np.where(valid_mask, values, 0), group_starts, axis=0)
+        counts = np.add.reduceat(valid_mask, group_starts, axis=0)
+
+        with np.errstate(invalid='ignore'):
+            resampled_values = sums / counts  # groups without values are NaN
+    else:
+        mins = np.fmin.reduceat(values, group_starts, axis=0)
+        maxs = np.fmax.reduceat(values, group_starts, axis=0)
+        resampled_values = np.stack([mins, maxs], axis=2).reshape(len(group_starts), -1)
+
+    return np.column_stack([resampled_depths, resampled_values])
+
+
+class Resampler:
+    """Resamples log data chunk by chunk.
+
+    The last depth group of a chunk may continue in the next chunk, so its rows
+    are held back until the next chunk or `flush`.
+    """
+
+    def __init__(self, step: float, method: Method, null_value: Optional[float]):
+        self.step = step
+        self.method = method
+        self.null_value = null_value
+        self._tail: Optional[np.ndarray] = None
+
+    def _resample(self, log_data: np.ndarray) -> np.ndarray:
+        return resample(
+            log_data=log_data,
+            step=self.step,
+            method=self.method,
+            null_value=self.null_value,
+        )
+
+    def update(self, log_data: np.ndarray) -> np.ndarray:
+        if self._tail is not None:
+            log_data = np.concatenate([self._tail, log_data])
+
+        if not len(log_data):
+            self._tail = log_data
+            return self._resample(log_data=log_data)
+
+        depth_idxs = np.round(log_data[:, 0] / self.step)
+        tail_start = len(log_data) - np.argmax(depth_idxs[::-1] != depth_idxs[-1])
+
+        if tail_start == len(log_data):
+            # all rows belong to the same group
+            tail_start = 0
+
+        self._tail = log_data[tail_start:]
+
+        return self._resample(log_data=log_data[:tail_start])
+
+    def flush(self) -> np.ndarray:
+        tail, self._tail = self._tail, None
+
+        if tail is None:
+            tail = np.empty((0, 1))
+
+        return self._resample(log_data=tail)
+
+
+def iter_resampled(
+    chunks: Iterable[np.ndarray],
+    step: float,
+    method: Method,
+    null_value: Optional[float] = None,
+) -> Iterator[np.ndarray]:
+    resampler = Resampler(step=step, method=method, null_value=null_value)
+
+    for chunk in chunks:
+        if len(resampled := resampler.update(log_data=chunk)):
+            yield resampled
+
+    if len(resampled := resampler.flush()):
+        yield resampled
@@ -0,0 +1,43 @@
+from typing import Any, List
+
+import orjson
+
+# NumPy arrays and scalars are encoded as lists and numbers.
+OPTIONS = orjson.OPT_SERIALIZE_NUMPY
+
+
+def dumps(obj: Any) -> bytes:
+    """Encodes to compact JSON.
+
+    Unlike `json.dumps`, NumPy values are supported and NaN and infinity
+    are encoded as null, which is valid JSON.
+    """
+
+    return orjson.dumps(obj, option=OPTIONS)
+
+
+def join(encoded: List[bytes]) -> bytes:
+    """Joins encoded values into a JSON array, as `dumps` would."""
+
+    return b'[' + b','.join(encoded) + b']'
+
+
+class Fragments:
+    """Encodes the envelope once and values of its `key` between its fragments.
+
+    Values of every record differ only by the value of one key, so records are
+    encoded without encoding the whole record every time.
+    """
+
+    PLACEHOLDER = '__placeholder__'
+
+    def __init__(self, envelope: dict, key: str):
+        # the key keeps its position in the envelope
+        prefix, suffix = dumps({**envelope, key: self.PLACEHOLDER}).rsplit(
+            dumps(self.PLACEHOLDER), 1
+        )
+        self.prefix = prefix
+        self.suffix = suffix
+
+    def encode(self, value: Any) -> bytes:
+        return self.prefix + dumps(value) + self.suffix
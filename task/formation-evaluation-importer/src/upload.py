@@ -0,0 +1,196 @@
+import concurrent.futures
+import http
+import time
+from typing import Callable, Dict, Iterable, List, Optional
+
+import requests
+from corva import Api, Logger
+
+from src.api import save_raw_data
+from src.batching import RequestLimits, batch_size
+from src.models import SaveDataReponse
+from src.serialization import join
+
+
+def get_retry_after(response: requests.Response, default: float) -> float:
+    try:
+        return float(response.headers['Retry-After'])
+    except (KeyError, ValueError):
+        return default
+
+
+def save_batch(
+    api: Api,
+    batch: List[bytes],
+    collection: str,
+    provider: str,
+    limits: RequestLimits,
+    throttle_retries: int,
+    throttle_backoff: float,
+) -> SaveDataReponse:
+    """Saves the batch of encoded records, backing off when the API pushes back.
+
+    413 (Payload Too Large): the batch is split in halves, that are saved
+      separately, and request limits are shrunk for the following batches.
+    429 (Too Many Requests): the batch is saved again after `Retry-After` seconds
+      or exponential backoff, up to `throttle_retries` times.
+    415 (Unsupported Media Type) of a compressed request: the batch is saved
+      again uncompressed and compression is disabled for the following batches.
+
+    Raises:
+        requests.HTTPError: if save was unsuccessful.
+    """
+
+    attempt = 0
+
+    while True:
+        gzip_min_bytes = limits.gzip_min_bytes
+
+        try:
+            response = save_raw_data(
+                api=api,
+                body=join(batch),
+                collection=collection,
+                provider=provider,
+                gzip_min_bytes=gzip_min_bytes,
+            )
+        except requests.HTTPError as exc:
+            status_code = exc.response.status_code
+
+            if (
+                status_code == http.HTTPStatus.UNSUPPORTED_MEDIA_TYPE
+                and gzip_min_bytes is not None
+            ):
+                Logger.warning('Compressed save request rejected, disabling gzip.')
+                limits.on_unsupported_encoding()
+                continue
+
+            if status_code == http.HTTPStatus.REQUEST_ENTITY_TOO_LARGE and len(batch) > 1:
+                limits.on_too_large(size=batch_size(batch))
+
+                half = len(batch) // 2
+                responses = [
+                    save_batch(
+                        api=api,
+                        batch=part,
+                        collection=collection,
+                        provider=provider,
+                        limits=limits,
+                        throttle_retries=throttle_retries,
+                        throttle_backoff=throttle_backoff,
+                    )
+                    for part in (batch[:half], batch[half:])
+                ]
+
+                return SaveDataReponse(
+                    inserted_ids=[
+                        inserted_id
+                        for response in responses
+                        for inserted_id in response.inserted_ids
+                    ]
+                )
+
+            if (
+                status_code == http.HTTPStatus.TOO_MANY_REQUESTS
+                and attempt < throttle_retries
+            ):
+                delay = get_retry_after(
+                    response=exc.response, default=throttle_backoff * 2**attempt
+                )
+                Logger.warning(f'Save request throttled, retrying in {delay}s.')
+                time.sleep(delay)
+                attempt += 1
+                continue
+
+            raise
+
+        limits.on_success()
+
+        return response
+
+
+def upload_chunks(
+    api: Api,
+    chunks: Iterable[List[bytes]],
+    collection: str,
+    provider: str,
+    max_in_flight: int,
+    limits: RequestLimits,
+    throttle_retries: int = 0,
+    throttle_backoff: float = 1,
+    on_committed: Optional[Callable[[int], None]] = None,
+) -> List[SaveDataReponse]:
+    """Saves chunks of encoded records concurrently.
+
+    At most `max_in_flight` requests are sent at a time. Chunks are pulled from
+    the iterable only when there is a free slot, so lazily generated chunks are not
+    accumulated in memory.
+
+    `on_committed` is called with the number of records of every chunk in chunk
+    order, once the chunk and all chunks before it were saved.
+
+    Returns:
+        responses in the order of chunks.
+
+    Raises:
+        requests.HTTPError: on the first unsuccessful save. Pending chunks are
+          cancelled.
+    """
+
+    responses: Dict[int, SaveDataReponse] = {}
+    chunk_sizes: Dict[int, int] = {}
+    next_committed_idx = 0
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_in_flight) as executor:
+        in_flight: Dict[concurrent.futures.Future, int] = {}
+
+        def collect(
+            return_when: str = concurrent.futures.FIRST_COMPLETED,
+        ) -> None:
+            nonlocal next_committed_idx
+
+            done, _ = concurrent.futures.wait(in_flight, return_when=return_when)
+            errors = [future.exception() for future in done if future.exception()]
+
+            if errors:
+                # let requests, that were already sent, finish,
+                # so their chunks are reported as committed
+                for pending in in_flight:
+                    pending.cancel()
+
+                done, _ = concurrent.futures.wait(in_flight)
+
+            for future in done:
+                idx = in_flight.pop(future)
+
+                if not future.cancelled() and future.exception() is None:
+                    responses[idx] = future.result()
+
+            while next_committed_idx in responses and on_committed is not None:
+                on_committed(chunk_sizes.pop(next_committed_idx))
+                next_committed_idx += 1
+
+            if errors:
+                raise errors[0]
+
+        for idx, chunk in enumerate(chunks):
+            if len(in_flight) >= max_in_flight:
+                collect()
+
+            future = executor.submit(
+                save_batch,
+                api=api,
+                batch=chunk,
+                collection=collection,
+                provider=provider,
+                limits=limits,
+                throttle_retries=throttle_retries,
+                throttle_backoff=throttle_backoff,
+            )
+            in_flight[future] = idx
+            chunk_sizes[idx] = len(chunk)
+
+        while in_flight:
+            collect(return_when=concurrent.futures.FIRST_EXCEPTION)
+
+    return [responses[idx] for idx in sorted(responses)]
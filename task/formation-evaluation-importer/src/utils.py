@@ -1,6 +1,91 @@
-from typing import Iterator
+import contextlib
+import queue
+import threading
+from typing import Iterable, Iterator, Sequence, TypeVar
 
+T = TypeVar('T')
+SequenceT = TypeVar('SequenceT', bound=Sequence)
+
+
+def chunker(seq: SequenceT, size: int) -> Iterator[SequenceT]:
+    """Yields slices of the sequence. Slices of NumPy arrays are views, not copies."""
 
-def chunker(seq: list, size: int) -> Iterator[list]:
     for idx in range(0, len(seq), size):
         yield seq[idx : idx + size]
+
+
+def skip_rows(chunks: Iterable[SequenceT], n_rows: int) -> Iterator[SequenceT]:
+    """Skips the first `n_rows` rows of the chunked sequence."""
+
+    for chunk in chunks:
+        if n_rows >= len(chunk):
+            n_rows -= len(chunk)
+            continue
+
+        yield chunk[n_rows:]
+        n_rows = 0
+
+
+@contextlib.contextmanager
+def prefetch(iterable: Iterable[T], size: int) -> Iterator[Iterator[T]]:
+    """Iterates over the iterable in a background thread, up to `size` items ahead.
+
+    Lets the producer (e.g. parsing) run, while the consumer waits (e.g. for
+    uploads). Exceptions of the producer are raised to the consumer.
+
+    The producer thread is stopped and joined when the block exits, also if the
+    consumer raises, so it doesn't outlive the call (e.g. in a warm container)
+    holding the items produced ahead.
+    """
+
+    if size <= 0:
+        yield iter(iterable)
+        return
+
+    items: queue.Queue = queue.Queue(maxsize=size)
+    stop = threading.Event()
+    done = object()
+
+    def put(item, exc=None) -> bool:
+        while not stop.is_set():
+            try:
+                items.put((item, exc), timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce() -> None:
+        try:
+            for item in iterable:
+                if not put(item):
+                    return
+        except BaseException as exc:
+            put(done, exc)
+        else:
+            put(done)
+
+    def consume() -> Iterator[T]:
+        while True:
+            item, exc = items.get()
+
+            if exc is not None:
+                raise exc
+
+            if item is done:
+                return
+
+            yield item
+
+    thread = threading.Thread(target=produce, name='prefetch', daemon=True)
+    thread.start()
+
+    try:
+        yield consume()
+    finally:
+        stop.set()
+        thread.join()
+
+        # release the items produced ahead
+        while not items.empty():
+            items.get_nowait()
@@ -0,0 +1,82 @@
+import gzip
+import hashlib
+import http
+import http.server
+import threading
+import zlib
+from typing import Dict, List, Optional
+
+import pytest
+
+
+class FileServer:
+    """Local HTTP stand-in for the file storage.
+
+    Serves `files` by path with ETag support and records request headers.
+    Responses are compressed with `content_encoding`, if the client accepts it.
+    """
+
+    def __init__(self):
+        self.files: Dict[str, bytes] = {}
+        self.requests: List[dict] = []
+        self.content_encoding: Optional[str] = None
+        self.sent_bytes = 0
+
+        server = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def do_GET(self):
+                server.requests.append(dict(self.headers))
+
+                if (content := server.files.get(self.path)) is None:
+                    self.send_error(http.HTTPStatus.NOT_FOUND)
+                    return
+
+                etag = server.etag(path=self.path)
+
+                if self.headers.get('If-None-Match') == etag:
+                    self.send_response(http.HTTPStatus.NOT_MODIFIED)
+                    self.end_headers()
+                    return
+
+                self.send_response(http.HTTPStatus.OK)
+                self.send_header('ETag', etag)
+
+                if server.content_encoding and server.content_encoding in self.headers.get(
+                    'Accept-Encoding', ''
+                ):
+                    content = server.compress(content)
+                    self.send_header('Content-Encoding', server.content_encoding)
+
+                self.send_header('Content-Length', str(len(content)))
+                self.end_headers()
+                self.wfile.write(content)
+                server.sent_bytes += len(content)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.httpd = http.server.ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+
+    def compress(self, content: bytes) -> bytes:
+        if self.content_encoding == 'gzip':
+            return gzip.compress(content)
+        return zlib.compress(content)
+
+    def etag(self, path: str) -> str:
+        return f'"{hashlib.sha1(self.files[path]).hexdigest()}"'
+
+    def url(self, path: str) -> str:
+        return f'http://127.0.0.1:{self.httpd.server_port}{path}'
+
+
+@pytest.fixture
+def file_server():
+    server = FileServer()
+    thread = threading.Thread(target=server.httpd.serve_forever, daemon=True)
+    thread.start()
+
+    yield server
+
+    server.httpd.shutdown()
+    server.httpd.server_close()
@@ -0,0 +1,179 @@
+import gzip
+import hashlib
+import json
+import mmap
+import pathlib
+import urllib.parse
+
+import pytest
+from corva import Api
+from requests_mock import Mocker as RequestsMocker
+
+from src.api import (
+    MAX_QUERY_BYTES,
+    delete_data_by_depths,
+    download_file,
+    get_file,
+    iter_data_by_file_name,
+    open_file,
+    save_raw_data,
+)
+from tests.conftest import FileServer
+from tests.test_app import LAS_V_2_0
+
+
+@pytest.mark.parametrize('content_encoding', ('gzip', 'deflate'))
+def test_compressed_download(content_encoding: str, file_server: FileServer):
+    """Compressed responses are decompressed and hashed by the original content."""
+
+    file_server.files['/file.las'] = LAS_V_2_0.encode() * 100
+    file_server.content_encoding = content_encoding
+    url = file_server.url('/file.las')
+    expected_sha256 = hashlib.sha256(LAS_V_2_0.encode() * 100).hexdigest()
+
+    assert get_file(url) == LAS_V_2_0 * 100
+    assert download_file(url).sha256 == expected_sha256
+
+    with open_file(url) as file:
+        assert file.text.readline() == LAS_V_2_0.splitlines(keepends=True)[0]
+        assert file.sha256() == expected_sha256
+
+    assert all(
+        request['Accept-Encoding'] == 'gzip, deflate'
+        for request in file_server.requests
+    )
+    assert file_server.sent_bytes < len(LAS_V_2_0) * 100
+
+
+@pytest.mark.parametrize('spool_min_bytes,mapped', ((None, False), (1, True), (10**9, False)))
+def test_spooled_download(
+    spool_min_bytes, mapped: bool, file_server: FileServer, tmp_path: pathlib.Path
+):
+    """Files of at least `spool_min_bytes` are memory-mapped temporary files."""
+
+    content = LAS_V_2_0.encode() * 100
+    file_server.files['/file.las'] = content
+    url = file_server.url('/file.las')
+
+    file = get_file(url, spool_min_bytes=spool_min_bytes, spool_dir=str(tmp_path))
+    downloaded = download_file(
+        url, spool_min_bytes=spool_min_bytes, spool_dir=str(tmp_path)
+    )
+
+    assert isinstance(file, mmap.mmap) == mapped
+    assert isinstance(downloaded.content, mmap.mmap) == mapped
+    assert (file[:] if mapped else file.encode()) == content
+    assert downloaded.sha256 == hashlib.sha256(content).hexdigest()
+    # temporary files are deleted as soon as they are mapped
+    assert not list(tmp_path.iterdir())
+
+
+@pytest.mark.parametrize(
+    'gzip_min_bytes,compressed', ((None, False), (10, True), (1_000_000, False))
+)
+def test_save_raw_data_compression(
+    gzip_min_bytes, compressed: bool, requests_mock: RequestsMocker
+):
+    api = Api(
+        api_url='https://api.localhost',
+        data_api_url='https://data.localhost',
+        api_key='',
+        app_key='',
+    )
+    body = json.dumps([{'data': {'md': md}} for md in range(100)]).encode()
+    post_mock = requests_mock.post(
+        'https://api.localhost/v1/data/provider/collection/',
+        json={'inserted_ids': []},
+    )
+
+    save_raw_data(
+        api=api,
+        body=body,
+        collection='collection',
+        provider='provider',
+        gzip_min_bytes=gzip_min_bytes,
+    )
+
+    request = post_mock.last_request
+
+    if compressed:
+        assert request.headers['Content-Encoding'] == 'gzip'
+        assert len(request.body) < len(body)
+        assert gzip.decompress(request.body) == body
+    else:
+        assert 'Content-Encoding' not in request.headers
+        assert request.body == body
+
+
+def test_iter_data_pages_through_equal_depths(requests_mock: RequestsMocker):
+    """A page that ends inside a run of equal depths doesn't drop the rest of it."""
+
+    api = Api(
+        api_url='https://api.localhost',
+        data_api_url='https://data.localhost',
+        api_key='',
+        app_key='',
+    )
+    records = [
+        {'_id': str(index), 'data': {'md': md}}
+        for index, md in enumerate([1.0, 2.0, 2.0, 2.0, 2.0, 2.0, 3.0])
+    ]
+
+    def get_page(request, context):
+        query = json.loads(request.qs['query'][0])
+        min_md = query.get('data.md', {}).get('$gte', float('-inf'))
+        skip = int(request.qs['skip'][0])
+        limit = int(request.qs['limit'][0])
+
+        return [record for record in records if record['data']['md'] >= min_md][
+            skip : skip + limit
+        ]
+
+    requests_mock.get(
+        'https://api.localhost/v1/data/provider/collection/', json=get_page
+    )
+
+    assert [
+        record['_id']
+        for record in iter_data_by_file_name(
+            api=api,
+            file_name='file',
+            asset_id=0,
+            collection='collection',
+            provider='provider',
+            page_size=2,
+        )
+    ] == [record['_id'] for record in records]
+
+
+def test_delete_data_by_depths_limits_query_size(requests_mock: RequestsMocker):
+    api = Api(
+        api_url='https://api.localhost',
+        data_api_url='https://data.localhost',
+        api_key='',
+        app_key='',
+    )
+    delete_mock = requests_mock.delete(
+        'https://api.localhost/v1/data/provider/collection/'
+    )
+    depths = [1000 + md / 7 for md in range(2000)]
+
+    delete_data_by_depths(
+        api=api,
+        file_name='file',
+        asset_id=0,
+        depths=depths,
+        collection='collection',
+        provider='provider',
+    )
+
+    assert delete_mock.call_count > 1
+    assert all(
+        len(urllib.parse.urlsplit(request.url).query) <= MAX_QUERY_BYTES + 6
+        for request in delete_mock.request_history
+    )
+    assert [
+        depth
+        for request in delete_mock.request_history
+        for depth in json.loads(request.qs['query'][0])['data.md']['$in']
+    ] == depths
@@ -1,7 +1,12 @@
+import contextlib
 import datetime
+import hashlib
 import inspect
 import io
+import json
 import re
+import types
+import warnings
 
 import freezegun
 import lasio
@@ -13,8 +18,12 @@ from pytest_mock import MockerFixture
 from requests_mock import Mocker as RequestsMocker
 
 from lambda_function import lambda_handler
+from src import processes
+from src.api import FileStream
+from src.app import BatchImportError
 from src.configuration import SETTINGS
 from src.models import (
+    BatchEventProperties,
     EventProperties,
     FormationEvaluationData,
     FormationEvaluationDataMetadata,
@@ -154,10 +163,8 @@ def test_validate_index_curve_mnemonic(
     mocker.patch('src.app.delete_data_by_file_name')
     mocker.patch('src.app.get_file', return_value=out.getvalue())
     # return early by throwing an exception
-    mocker.patch.object(
-        lasio.LASFile,
-        'data',
-        new_callable=mocker.PropertyMock,
+    mocker.patch(
+        'src.parser.parse_header_sections',
         side_effect=Exception('test_validate_index_curve_mnemonic'),
     )
 
@@ -353,6 +360,8 @@ def test_correct_formation_evaluation_data(
         json={'inserted_ids': ['0']},
     )
     mocker.patch.object(SETTINGS, 'chunk_size', 2)
+    # keep requests order deterministic
+    mocker.patch.object(SETTINGS, 'max_in_flight_requests', 1)
 
     # freeze time with non-zero tz_offset to validate,
     # that timestamp is taken from timezone aware datetime instance.
@@ -412,3 +421,552 @@ def test_fail_if_could_not_save_data(
     requests_mock.post(re.compile(r'v1/data/.+/.+\.data/'), status_code=400)
 
     pytest.raises(requests.HTTPError, app_runner, lambda_handler, event)
+
+
+@pytest.mark.parametrize('las_file', (LAS_V_1_2, LAS_V_2_0))
+def test_streaming_formation_evaluation_data(
+    las_file,
+    mocker: MockerFixture,
+    app_runner,
+    requests_mock: RequestsMocker,
+):
+    """Streaming mode saves the same data and updates metadata records count."""
+
+    properties = EventProperties(file_name='file/name', file_url='https://localhost')
+    event = TaskEvent(
+        asset_id=0,
+        company_id=0,
+        properties=properties.dict(by_alias=True),
+    )
+
+    mocker.patch('src.app.delete_data_by_file_name')
+    mocker.patch(
+        'src.app.open_file', return_value=contextlib.nullcontext(FileStream(raw=io.BytesIO(las_file.encode())))
+    )
+    metadata_post_mock = requests_mock.post(
+        re.compile(r'v1/data/.+/.+\.metadata/'),
+        status_code=200,
+        json={'inserted_ids': ['0']},
+    )
+    metadata_put_mock = requests_mock.put(
+        re.compile(r'v1/data/.+/.+\.metadata/0/'), status_code=200
+    )
+    data_post_mock = requests_mock.post(
+        re.compile(r'v1/data/.+/.+\.data/'),
+        status_code=200,
+        json={'inserted_ids': ['0']},
+    )
+    mocker.patch.object(SETTINGS, 'chunk_size', 2)
+    mocker.patch.object(SETTINGS, 'streaming', True)
+    mocker.patch.object(SETTINGS, 'max_in_flight_requests', 1)
+
+    app_runner(lambda_handler, event)
+
+    assert metadata_post_mock.last_request.json()[0]['records_count'] == 0
+    assert metadata_put_mock.last_request.json()['records_count'] == 3
+    assert [
+        [record['data'] for record in request.json()]
+        for request in data_post_mock.request_history
+    ] == [
+        [{'md': 1, 'curve': 4}, {'md': 2, 'curve': 5}],
+        [{'md': 3, 'curve': 6}],
+    ]
+
+
+@pytest.mark.parametrize('streaming', (False, True))
+def test_drop_nulls(
+    streaming: bool,
+    mocker: MockerFixture,
+    app_runner,
+    requests_mock: RequestsMocker,
+):
+    """Null values are left out of data rows and curve depth ranges are stored."""
+
+    las_file = (
+        LAS_V_2_0.replace('WELL  .WELL    :', 'NULL  .        -999.25 :')
+        .replace('1.00000    4.00000', '1.00000    -999.25')
+        .replace('3.00000    6.00000', '3.00000    nan')
+    )
+    properties = EventProperties(file_name='file/name', file_url='https://localhost')
+    event = TaskEvent(
+        asset_id=0,
+        company_id=0,
+        properties=properties.model_dump(by_alias=True),
+    )
+
+    mocker.patch('src.app.delete_data_by_file_name')
+    mocker.patch('src.app.get_file', return_value=las_file)
+    mocker.patch(
+        'src.app.open_file',
+        return_value=contextlib.nullcontext(FileStream(raw=io.BytesIO(las_file.encode()))),
+    )
+    metadata_post_mock = requests_mock.post(
+        re.compile(r'v1/data/.+/.+\.metadata/'), json={'inserted_ids': ['0']}
+    )
+    metadata_put_mock = requests_mock.put(re.compile(r'v1/data/.+/.+\.metadata/0/'))
+    data_post_mock = requests_mock.post(
+        re.compile(r'v1/data/.+/.+\.data/'), json={'inserted_ids': ['0']}
+    )
+    mocker.patch.object(SETTINGS, 'drop_nulls', True)
+    mocker.patch.object(SETTINGS, 'streaming', streaming)
+
+    app_runner(lambda_handler, event)
+
+    metadata = (
+        metadata_put_mock.last_request.json()
+        if streaming
+        else metadata_post_mock.last_request.json()[0]
+    )
+
+    assert [
+        record['data'] for record in data_post_mock.last_request.json()
+    ] == [{'md': 1}, {'md': 2, 'curve': 5}, {'md': 3}]
+    assert metadata['data']['curve_depth_ranges'] == {
+        'md': [[1, 3]],
+        'curve': [[2, 2]],
+    }
+
+
+@pytest.mark.parametrize('streaming', (False, True))
+def test_resample_log_data(
+    streaming: bool,
+    mocker: MockerFixture,
+    app_runner,
+    requests_mock: RequestsMocker,
+):
+    """Resampled log data is saved, full resolution data to a separate collection."""
+
+    properties = EventProperties(file_name='file/name', file_url='https://localhost')
+    event = TaskEvent(
+        asset_id=0,
+        company_id=0,
+        properties=properties.model_dump(by_alias=True),
+    )
+
+    mocker.patch('src.app.delete_data_by_file_name')
+    mocker.patch('src.app.get_file', return_value=LAS_V_2_0)
+    mocker.patch(
+        'src.app.open_file',
+        return_value=contextlib.nullcontext(FileStream(raw=io.BytesIO(LAS_V_2_0.encode()))),
+    )
+    metadata_post_mock = requests_mock.post(
+        re.compile(r'v1/data/.+/.+\.metadata/'), json={'inserted_ids': ['0']}
+    )
+    metadata_put_mock = requests_mock.put(re.compile(r'v1/data/.+/.+\.metadata/0/'))
+    data_post_mock = requests_mock.post(
+        re.compile(r'v1/data/.+/.+\.data/'), json={'inserted_ids': ['0']}
+    )
+    full_resolution_delete_mock = requests_mock.delete(
+        re.compile(r'v1/data/.+/.+\.full-resolution-data/')
+    )
+    full_resolution_post_mock = requests_mock.post(
+        re.compile(r'v1/data/.+/.+\.full-resolution-data/'), json={'inserted_ids': ['0']}
+    )
+    mocker.patch.object(SETTINGS, 'depth_step', 3.0)
+    mocker.patch.object(SETTINGS, 'resample_method', 'envelope')
+    mocker.patch.object(SETTINGS, 'keep_full_resolution', True)
+    mocker.patch.object(SETTINGS, 'streaming', streaming)
+
+    app_runner(lambda_handler, event)
+
+    metadata = (
+        metadata_put_mock.last_request.json()
+        if streaming
+        else metadata_post_mock.last_request.json()[0]
+    )
+
+    assert [
+        record['data']
+        for request in data_post_mock.request_history
+        for record in request.json()
+    ] == [
+        {'md': 0, 'curve_min': 4, 'curve_max': 4},
+        {'md': 3, 'curve_min': 5, 'curve_max': 6},
+    ]
+    assert [
+        record['data']
+        for request in full_resolution_post_mock.request_history
+        for record in request.json()
+    ] == [{'md': 1, 'curve': 4}, {'md': 2, 'curve': 5}, {'md': 3, 'curve': 6}]
+    assert full_resolution_delete_mock.call_count == 1
+    assert metadata['records_count'] == 2
+    assert (metadata['depth_step'], metadata['resample_method']) == (3.0, 'envelope')
+
+
+@pytest.mark.parametrize('streaming', (False, True))
+def test_import_selected_curves(
+    streaming: bool,
+    mocker: MockerFixture,
+    app_runner,
+    requests_mock: RequestsMocker,
+):
+    """Only selected curves are saved, metadata keeps all curves of the file."""
+
+    las_file = (
+        LAS_V_2_0.replace('CURVE .CURVE   :', 'CURVE .CURVE   :\nGR    .GAPI    :')
+        .replace('1.00000    4.00000', '1.00000    4.00000    7.00000')
+        .replace('2.00000    5.00000', '2.00000    5.00000    8.00000')
+        .replace('3.00000    6.00000', '3.00000    6.00000    9.00000')
+    )
+    properties = EventProperties(
+        file_name='file/name', file_url='https://localhost', curves=['GR']
+    )
+    event = TaskEvent(
+        asset_id=0,
+        company_id=0,
+        properties=properties.model_dump(by_alias=True),
+    )
+
+    mocker.patch('src.app.delete_data_by_file_name')
+    mocker.patch('src.app.get_file', return_value=las_file)
+    mocker.patch(
+        'src.app.open_file',
+        return_value=contextlib.nullcontext(FileStream(raw=io.BytesIO(las_file.encode()))),
+    )
+    metadata_post_mock = requests_mock.post(
+        re.compile(r'v1/data/.+/.+\.metadata/'), json={'inserted_ids': ['0']}
+    )
+    requests_mock.put(re.compile(r'v1/data/.+/.+\.metadata/0/'))
+    data_post_mock = requests_mock.post(
+        re.compile(r'v1/data/.+/.+\.data/'), json={'inserted_ids': ['0']}
+    )
+    mocker.patch.object(SETTINGS, 'streaming', streaming)
+
+    app_runner(lambda_handler, event)
+
+    metadata = metadata_post_mock.last_request.json()[0]
+
+    assert [record['data'] for record in data_post_mock.last_request.json()] == [
+        {'md': 1, 'gr': 7},
+        {'md': 2, 'gr': 8},
+        {'md': 3, 'gr': 9},
+    ]
+    assert [curve['data']['mnemonic'] for curve in metadata['data']['curve']] == [
+        'dept',
+        'curve',
+        'gr',
+    ]
+    assert metadata['curves'] == ['GR']
+
+
+@pytest.mark.parametrize('streaming', (False, True))
+def test_skip_not_modified_file(
+    streaming: bool,
+    file_server,
+    mocker: MockerFixture,
+    app_runner,
+    requests_mock: RequestsMocker,
+):
+    """The file is requested with stored ETag and not imported on 304."""
+
+    file_server.files['/file.las'] = LAS_V_2_0.encode()
+    properties = EventProperties(
+        file_name='file/name', file_url=file_server.url('/file.las')
+    )
+    event = TaskEvent(
+        asset_id=0,
+        company_id=0,
+        properties=properties.model_dump(by_alias=True),
+    )
+
+    requests_mock.get(
+        re.compile(r'v1/data/.+/.+\.metadata/'),
+        json=[{'file_etag': file_server.etag('/file.las'), 'file_hash': None}],
+    )
+    delete_mock = mocker.patch('src.app.delete_data_by_file_name')
+    mocker.patch.object(SETTINGS, 'skip_unchanged', True)
+    mocker.patch.object(SETTINGS, 'streaming', streaming)
+
+    app_runner(lambda_handler, event)
+
+    assert file_server.requests[-1]['If-None-Match'] == file_server.etag('/file.las')
+    delete_mock.assert_not_called()
+
+
+def test_skip_unchanged_file(
+    file_server,
+    mocker: MockerFixture,
+    app_runner,
+    requests_mock: RequestsMocker,
+):
+    """The file with the same content hash, as the stored one, is not imported."""
+
+    file_server.files['/file.las'] = LAS_V_2_0.encode()
+    properties = EventProperties(
+        file_name='file/name', file_url=file_server.url('/file.las')
+    )
+    event = TaskEvent(
+        asset_id=0,
+        company_id=0,
+        properties=properties.model_dump(by_alias=True),
+    )
+
+    requests_mock.get(
+        re.compile(r'v1/data/.+/.+\.metadata/'),
+        json=[
+            {
+                'file_etag': None,
+                'file_hash': hashlib.sha256(LAS_V_2_0.encode()).hexdigest(),
+            }
+        ],
+    )
+    delete_mock = mocker.patch('src.app.delete_data_by_file_name')
+    mocker.patch.object(SETTINGS, 'skip_unchanged', True)
+
+    app_runner(lambda_handler, event)
+
+    delete_mock.assert_not_called()
+
+
+@pytest.mark.parametrize('streaming', (False, True))
+def test_changed_file_hash_is_saved_after_import(
+    streaming: bool,
+    file_server,
+    mocker: MockerFixture,
+    app_runner,
+    requests_mock: RequestsMocker,
+):
+    file_server.files['/file.las'] = LAS_V_2_0.encode()
+    properties = EventProperties(
+        file_name='file/name', file_url=file_server.url('/file.las')
+    )
+    event = TaskEvent(
+        asset_id=0,
+        company_id=0,
+        properties=properties.model_dump(by_alias=True),
+    )
+
+    requests_mock.get(re.compile(r'v1/data/.+/.+\.metadata/'), json=[])
+    delete_mock = mocker.patch('src.app.delete_data_by_file_name')
+    metadata_post_mock = requests_mock.post(
+        re.compile(r'v1/data/.+/.+\.metadata/'), json={'inserted_ids': ['0']}
+    )
+    metadata_put_mock = requests_mock.put(re.compile(r'v1/data/.+/.+\.metadata/0/'))
+    requests_mock.post(re.compile(r'v1/data/.+/.+\.data/'), json={'inserted_ids': ['0']})
+    mocker.patch.object(SETTINGS, 'skip_unchanged', True)
+    mocker.patch.object(SETTINGS, 'streaming', streaming)
+
+    app_runner(lambda_handler, event)
+
+    delete_mock.assert_called_once()
+    assert metadata_post_mock.last_request.json()[0]['file_hash'] is None
+    assert metadata_put_mock.last_request.json()['file_hash'] == (
+        hashlib.sha256(LAS_V_2_0.encode()).hexdigest()
+    )
+    assert metadata_put_mock.last_request.json()['file_etag'] == (
+        file_server.etag('/file.las')
+    )
+    assert metadata_put_mock.last_request.json()['records_count'] == 3
+
+
+
+@pytest.mark.parametrize(
+    'failing_url,expected_statuses',
+    (
+        (None, ['imported', 'imported', 'imported']),
+        ('https://localhost/two', ['imported', 'failed', 'imported']),
+    ),
+)
+def test_batch_import_reports_results_per_file(
+    failing_url,
+    expected_statuses,
+    mocker: MockerFixture,
+    app_runner,
+    requests_mock: RequestsMocker,
+):
+    """Failed file doesn't stop imports of the other files of the batch."""
+
+    event = TaskEvent(
+        asset_id=0,
+        company_id=0,
+        properties=BatchEventProperties(
+            files=[
+                EventProperties(file_name=f'file/{name}', file_url=f'https://localhost/{name}')
+                for name in ('one', 'two', 'three')
+            ]
+        ).model_dump(by_alias=True, mode='json'),
+    )
+
+    def get_file(url, **kwargs):
+        if str(url) == failing_url:
+            raise Exception('test_batch_import')
+        return LAS_V_2_0
+
+    mocker.patch('src.app.delete_data_by_file_name')
+    mocker.patch('src.app.get_file', side_effect=get_file)
+    metadata_mock = requests_mock.post(
+        re.compile(r'v1/data/.+/.+\.metadata/'), json={'inserted_ids': ['0']}
+    )
+    requests_mock.post(re.compile(r'v1/data/.+/.+\.data/'), json={'inserted_ids': ['0']})
+    # import files in-process, so mocks apply
+    mocker.patch.object(SETTINGS, 'max_processes', 1)
+    map_processes_spy = mocker.spy(processes, 'map_processes')
+
+    if failing_url:
+        with pytest.raises(BatchImportError, match='1 of 3 files: two'):
+            app_runner(lambda_handler, event)
+    else:
+        app_runner(lambda_handler, event)
+
+    assert [result.error is None for result in map_processes_spy.spy_return] == [
+        status == 'imported' for status in expected_statuses
+    ]
+    assert [
+        request.json()[0]['file'] for request in metadata_mock.request_history
+    ] == [
+        name
+        for name, status in zip(('one', 'two', 'three'), expected_statuses)
+        if status == 'imported'
+    ]
+
+
+@pytest.mark.parametrize('failing_name', (None, 'two'))
+def test_batch_import_results_are_stored_in_task_payload(
+    failing_name, mocker: MockerFixture, requests_mock: RequestsMocker
+):
+    """Results of all files are stored in the task payload explicitly, also when
+    the task fails, and the handler returns nothing."""
+
+    def get_file(url, **kwargs):
+        if str(url) == f'https://localhost/{failing_name}':
+            raise Exception('test_batch_import')
+        return LAS_V_2_0
+
+    mocker.patch('src.app.delete_data_by_file_name')
+    mocker.patch('src.app.get_file', side_effect=get_file)
+    mocker.patch.object(SETTINGS, 'max_processes', 1)
+    requests_mock.get(
+        re.compile(r'v2/tasks/task_id$'),
+        json={
+            'id': 'task_id',
+            **TaskEvent(
+                asset_id=0,
+                company_id=0,
+                properties=BatchEventProperties(
+                    files=[
+                        EventProperties(
+                            file_name=f'file/{name}',
+                            file_url=f'https://localhost/{name}',
+                        )
+                        for name in ('one', 'two')
+                    ]
+                ).model_dump(by_alias=True, mode='json'),
+            ).model_dump(mode='json'),
+        },
+    )
+    payload_mock = requests_mock.put(re.compile(r'v2/tasks/task_id$'))
+    status_mock = requests_mock.put(re.compile(r'v2/tasks/task_id/'))
+    requests_mock.post(re.compile(r'v1/data/'), json={'inserted_ids': ['0']})
+    context = types.SimpleNamespace(
+        aws_request_id='aws_request_id',
+        client_context=types.SimpleNamespace(env={'API_KEY': 'api_key'}),
+    )
+
+    with warnings.catch_warnings():
+        warnings.simplefilter('error', FutureWarning)
+
+        if failing_name:
+            with pytest.raises(BatchImportError):
+                lambda_handler({'task_id': 'task_id', 'version': 2}, context)
+        else:
+            assert lambda_handler({'task_id': 'task_id', 'version': 2}, context) == [
+                None
+            ]
+
+    assert payload_mock.last_request.json() == {
+        'payload': {
+            'files': [
+                {
+                    'file_name': name,
+                    'file_url': f'https://localhost/{name}',
+                    'status': 'failed' if name == failing_name else 'imported',
+                    'error': (
+                        'Exception: test_batch_import' if name == failing_name else None
+                    ),
+                }
+                for name in ('one', 'two')
+            ]
+        }
+    }
+    assert status_mock.last_request.url.endswith(
+        '/fail' if failing_name else '/success'
+    )
+
+
+@pytest.mark.parametrize('streaming', (False, True))
+def test_import_metrics(
+    streaming: bool,
+    file_server,
+    mocker: MockerFixture,
+    app_runner,
+    requests_mock: RequestsMocker,
+):
+    """Metrics are logged as one line and saved to the metrics collection."""
+
+    file_server.files['/file.las'] = LAS_V_2_0.encode()
+    properties = EventProperties(
+        file_name='file/name', file_url=file_server.url('/file.las')
+    )
+    event = TaskEvent(
+        asset_id=0,
+        company_id=0,
+        properties=properties.model_dump(by_alias=True),
+    )
+
+    mocker.patch('src.app.delete_data_by_file_name')
+    requests_mock.post(
+        re.compile(r'v1/data/.+/.+\.metadata/'), json={'inserted_ids': ['0']}
+    )
+    requests_mock.put(re.compile(r'v1/data/.+/.+\.metadata/0/'))
+    data_post_mock = requests_mock.post(
+        re.compile(r'v1/data/.+/.+\.data/'), json={'inserted_ids': ['0']}
+    )
+    metrics_post_mock = requests_mock.post(
+        re.compile(r'v1/data/.+/.+\.metrics/'), json={'inserted_ids': ['0']}
+    )
+    mocker.patch.object(SETTINGS, 'streaming', streaming)
+    mocker.patch.object(SETTINGS, 'save_metrics', True)
+    logger_spy = mocker.spy(Logger, 'info')
+
+    app_runner(lambda_handler, event)
+
+    metrics = metrics_post_mock.last_request.json()[0]['data']
+    [log_line] = [
+        call.args[0]
+        for call in logger_spy.call_args_list
+        if call.args[0].startswith('Import metrics: ')
+    ]
+
+    assert json.loads(log_line.removeprefix('Import metrics: ')) == metrics
+    assert metrics['file_name'] == 'name'
+    assert metrics['status'] == 'imported'
+    assert metrics['bytes_downloaded'] == len(LAS_V_2_0.encode())
+    assert metrics['rows_parsed'] == 3
+    assert metrics['requests_sent'] == 1
+    assert metrics['payload_bytes'] == len(data_post_mock.last_request.body)
+    assert metrics['peak_rss_bytes'] > 0
+    assert 'upload' in metrics['stage_seconds']
+
+
+def test_import_metrics_of_failed_import(
+    mocker: MockerFixture, app_runner, requests_mock: RequestsMocker
+):
+    event = TaskEvent(
+        asset_id=0,
+        company_id=0,
+        properties=EventProperties(
+            file_name='file/name', file_url='https://localhost'
+        ).model_dump(by_alias=True),
+    )
+
+    mocker.patch('src.app.delete_data_by_file_name')
+    mocker.patch('src.app.get_file', side_effect=Exception('test_import_metrics'))
+    metrics_post_mock = requests_mock.post(
+        re.compile(r'v1/data/.+/.+\.metrics/'), json={'inserted_ids': ['0']}
+    )
+    mocker.patch.object(SETTINGS, 'save_metrics', True)
+
+    with pytest.raises(Exception, match='test_import_metrics'):
+        app_runner(lambda_handler, event)
+
+    assert metrics_post_mock.last_request.json()[0]['data']['status'] == 'failed'
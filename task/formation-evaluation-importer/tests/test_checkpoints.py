@@ -0,0 +1,220 @@
+import contextlib
+import io
+import json
+import re
+import threading
+import urllib.parse
+
+import pytest
+import requests
+from corva import TaskEvent
+from pytest_mock import MockerFixture
+from requests_mock import Mocker as RequestsMocker
+
+from lambda_function import lambda_handler
+from src.api import FileStream
+from src.checkpoints import FileCheckpointStore
+from src.configuration import SETTINGS
+from src.models import Checkpoint, EventProperties
+from tests.test_app import LAS_V_2_0
+
+
+@pytest.mark.parametrize('streaming', (False, True))
+def test_resume_from_checkpoint(
+    streaming: bool,
+    tmp_path,
+    mocker: MockerFixture,
+    app_runner,
+    requests_mock: RequestsMocker,
+):
+    """Failed import is resumed from the last committed row on retry."""
+
+    properties = EventProperties(file_name='file/name', file_url='https://localhost')
+    event = TaskEvent(
+        asset_id=0,
+        company_id=0,
+        properties=properties.model_dump(by_alias=True),
+    )
+    store = FileCheckpointStore(directory=str(tmp_path))
+
+    delete_mock = mocker.patch('src.app.delete_data_by_file_name')
+    mocker.patch('src.app.get_file', return_value=LAS_V_2_0)
+    mocker.patch(
+        'src.app.open_file',
+        side_effect=lambda url, etag: contextlib.nullcontext(
+            FileStream(raw=io.BytesIO(LAS_V_2_0.encode()))
+        ),
+    )
+    metadata_post_mock = requests_mock.post(
+        re.compile(r'v1/data/.+/.+\.metadata/'),
+        status_code=200,
+        json={'inserted_ids': ['0']},
+    )
+    requests_mock.put(re.compile(r'v1/data/.+/.+\.metadata/0/'), status_code=200)
+    data_post_mock = requests_mock.post(
+        re.compile(r'v1/data/.+/.+\.data/'),
+        [
+            {'status_code': 200, 'json': {'inserted_ids': ['0']}},
+            {'status_code': 400},
+            {'status_code': 200, 'json': {'inserted_ids': ['1']}},
+            {'status_code': 200, 'json': {'inserted_ids': ['2']}},
+        ],
+    )
+    data_delete_mock = requests_mock.delete(re.compile(r'v1/data/.+/.+\.data/'))
+    mocker.patch.object(SETTINGS, 'chunk_size', 1)
+    mocker.patch.object(SETTINGS, 'max_in_flight_requests', 1)
+    mocker.patch.object(SETTINGS, 'streaming', streaming)
+    mocker.patch.object(SETTINGS, 'checkpoint_store', 'file')
+    mocker.patch.object(SETTINGS, 'checkpoint_dir', str(tmp_path))
+    mocker.patch.object(SETTINGS, 'checkpoint_interval_rows', 1)
+
+    with pytest.raises(requests.HTTPError):
+        app_runner(lambda_handler, event)
+
+    checkpoint = store.get(asset_id=0, file_name=properties.file_name)
+    assert checkpoint is not None
+    assert checkpoint.committed_rows == 1
+    assert checkpoint.formation_evaluation_id == '0'
+
+    app_runner(lambda_handler, event)
+
+    delete_mock.assert_called_once()
+    assert json.loads(data_delete_mock.last_request.qs['query'][0])['data.md'] == {
+        '$gt': 1
+    }
+    assert metadata_post_mock.call_count == 1
+    assert [
+        request.json()[0]['data']['md'] for request in data_post_mock.request_history
+    ] == [1, 2, 2, 3]
+    assert store.get(asset_id=0, file_name=properties.file_name) is None
+
+
+class FakeDataset:
+    """Data collection, that stores posted records and deletes them by query."""
+
+    def __init__(self, fail_md: float):
+        self.records = []
+        # the first post of the record of this depth fails
+        self.fail_md = fail_md
+        self.lock = threading.Lock()
+
+    def post(self, request, context):
+        records = request.json()
+
+        with self.lock:
+            if any(record['data']['md'] == self.fail_md for record in records):
+                self.fail_md = None
+                context.status_code = 400
+                return {}
+
+            self.records.extend(records)
+
+        return {'inserted_ids': [str(idx) for idx, _ in enumerate(records)]}
+
+    def delete(self, request, context):
+        query = json.loads(
+            urllib.parse.parse_qs(urllib.parse.urlsplit(request.url).query)['query'][0]
+        )
+        condition = query.get('data.md', {})
+
+        def matches(record: dict) -> bool:
+            md = record['data']['md']
+
+            return (
+                record['metadata']['file'] == query['metadata.file']
+                and md > condition.get('$gt', float('-inf'))
+                and md < condition.get('$lt', float('inf'))
+            )
+
+        with self.lock:
+            self.records = [record for record in self.records if not matches(record)]
+
+        return {}
+
+
+@pytest.mark.parametrize('streaming', (False, True))
+def test_resumed_import_does_not_duplicate_rows(
+    streaming: bool,
+    tmp_path,
+    mocker: MockerFixture,
+    app_runner,
+    requests_mock: RequestsMocker,
+):
+    """Rows saved after the checkpoint or concurrently with the failed request are
+    deleted on resume, with the default checkpoint interval and concurrent uploads.
+    """
+
+    properties = EventProperties(file_name='file/name', file_url='https://localhost')
+    event = TaskEvent(
+        asset_id=0,
+        company_id=0,
+        properties=properties.model_dump(by_alias=True),
+    )
+    dataset = FakeDataset(fail_md=2)
+
+    mocker.patch('src.app.delete_data_by_file_name')
+    mocker.patch('src.app.get_file', return_value=LAS_V_2_0)
+    mocker.patch(
+        'src.app.open_file',
+        side_effect=lambda url, etag: contextlib.nullcontext(
+            FileStream(raw=io.BytesIO(LAS_V_2_0.encode()))
+        ),
+    )
+    requests_mock.post(
+        re.compile(r'v1/data/.+/.+\.metadata/'), json={'inserted_ids': ['0']}
+    )
+    requests_mock.put(re.compile(r'v1/data/.+/.+\.metadata/0/'))
+    requests_mock.post(re.compile(r'v1/data/.+/.+\.data/'), json=dataset.post)
+    requests_mock.delete(re.compile(r'v1/data/.+/.+\.data/'), json=dataset.delete)
+    mocker.patch.object(SETTINGS, 'chunk_size', 1)
+    mocker.patch.object(SETTINGS, 'streaming', streaming)
+    mocker.patch.object(SETTINGS, 'checkpoint_store', 'file')
+    mocker.patch.object(SETTINGS, 'checkpoint_dir', str(tmp_path))
+
+    assert SETTINGS.max_in_flight_requests > 1
+
+    with pytest.raises(requests.HTTPError):
+        app_runner(lambda_handler, event)
+
+    checkpoint = FileCheckpointStore(directory=str(tmp_path)).get(
+        asset_id=0, file_name=properties.file_name
+    )
+    assert (checkpoint.committed_rows, checkpoint.committed_md) == (1, 1)
+
+    app_runner(lambda_handler, event)
+
+    assert sorted(record['data']['md'] for record in dataset.records) == [1, 2, 3]
+
+
+def test_checkpoint_of_other_file_url_is_ignored(
+    tmp_path, mocker: MockerFixture, app_runner
+):
+    properties = EventProperties(file_name='file/name', file_url='https://localhost')
+    event = TaskEvent(
+        asset_id=0,
+        company_id=0,
+        properties=properties.model_dump(by_alias=True),
+    )
+    FileCheckpointStore(directory=str(tmp_path)).save(
+        checkpoint=Checkpoint(
+            asset_id=0,
+            company_id=0,
+            file_name=properties.file_name,
+            file_url='https://otherhost',
+            formation_evaluation_id='0',
+            timestamp=0,
+            committed_rows=1,
+        )
+    )
+
+    delete_mock = mocker.patch('src.app.delete_data_by_file_name')
+    # return early by patching it to raise.
+    mocker.patch('src.app.get_file', side_effect=Exception('test_checkpoint'))
+    mocker.patch.object(SETTINGS, 'checkpoint_store', 'file')
+    mocker.patch.object(SETTINGS, 'checkpoint_dir', str(tmp_path))
+
+    with pytest.raises(Exception, match=r'^test_checkpoint$'):
+        app_runner(lambda_handler, event)
+
+    delete_mock.assert_called_once()
+
@@ -0,0 +1,136 @@
+import json
+import re
+
+from corva import TaskEvent
+from pytest_mock import MockerFixture
+from requests_mock import Mocker as RequestsMocker
+
+from lambda_function import lambda_handler
+from src.configuration import SETTINGS
+from src.diff import diff_log_data
+from src.models import EventProperties
+from tests.test_app import LAS_V_2_0
+
+
+def test_diff_log_data():
+    log_data_diff = diff_log_data(
+        stored={
+            1.0: {'md': 1.0, 'curve': 4.0},
+            2.0: {'md': 2.0, 'curve': 0.0},
+            4.0: {'md': 4.0, 'curve': 7.0},
+        },
+        rows=[
+            {'md': 1.0, 'curve': 4.0},
+            {'md': 2.0, 'curve': 5.0},
+            {'md': 3.0, 'curve': 6.0},
+        ],
+    )
+
+    assert log_data_diff.inserted == [{'md': 3.0, 'curve': 6.0}]
+    assert log_data_diff.changed == [{'md': 2.0, 'curve': 5.0}]
+    assert log_data_diff.deleted_depths == [4.0]
+
+
+def test_diff_log_data_duplicate_depths():
+    """Depths stored more than once are changed, even with equal values."""
+
+    log_data_diff = diff_log_data(
+        stored={1.0: {'md': 1.0, 'curve': 4.0}, 2.0: {'md': 2.0, 'curve': 5.0}},
+        rows=[{'md': 1.0, 'curve': 4.0}, {'md': 2.0, 'curve': 5.0}],
+        stored_counts={1.0: 2, 2.0: 1},
+    )
+
+    assert log_data_diff.inserted == []
+    assert log_data_diff.changed == [{'md': 1.0, 'curve': 4.0}]
+    assert log_data_diff.deleted_depths == []
+
+
+def test_diff_import(mocker: MockerFixture, app_runner, requests_mock: RequestsMocker):
+    """Only changed rows are saved and only removed or changed depths deleted."""
+
+    properties = EventProperties(file_name='file/name', file_url='https://localhost')
+    event = TaskEvent(
+        asset_id=0,
+        company_id=0,
+        properties=properties.model_dump(by_alias=True),
+    )
+
+    mocker.patch('src.app.get_file', return_value=LAS_V_2_0)
+    delete_file_mock = mocker.patch('src.app.delete_data_by_file_name')
+    requests_mock.get(
+        re.compile(r'v1/data/.+/.+\.metadata/'), json=[{'_id': 'metadata_id'}]
+    )
+    requests_mock.get(
+        re.compile(r'v1/data/.+/.+\.data/'),
+        json=[
+            {'data': {'md': 1, 'curve': 4}},
+            {'data': {'md': 2, 'curve': 0}},
+            {'data': {'md': 4, 'curve': 7}},
+        ],
+    )
+    delete_mock = requests_mock.delete(re.compile(r'v1/data/.+/.+\.data/'))
+    post_mock = requests_mock.post(
+        re.compile(r'v1/data/.+/.+\.data/'), json={'inserted_ids': ['0', '1']}
+    )
+    put_mock = requests_mock.put(
+        re.compile(r'v1/data/.+/.+\.metadata/metadata_id/')
+    )
+    mocker.patch.object(SETTINGS, 'import_mode', 'diff')
+
+    app_runner(lambda_handler, event)
+
+    delete_file_mock.assert_not_called()
+    assert json.loads(delete_mock.last_request.qs['query'][0])['data.md'] == {
+        '$in': [4, 2]
+    }
+    assert [record['data'] for record in post_mock.last_request.json()] == [
+        {'md': 3, 'curve': 6},
+        {'md': 2, 'curve': 5},
+    ]
+    assert {
+        record['metadata']['formation_evaluation_id']
+        for record in post_mock.last_request.json()
+    } == {'metadata_id'}
+    assert put_mock.last_request.json()['records_count'] == 3
+
+
+def test_diff_import_duplicate_depths(
+    mocker: MockerFixture, app_runner, requests_mock: RequestsMocker
+):
+    """Records stored twice at the same depth are deleted and inserted once."""
+
+    properties = EventProperties(file_name='file/name', file_url='https://localhost')
+    event = TaskEvent(
+        asset_id=0,
+        company_id=0,
+        properties=properties.model_dump(by_alias=True),
+    )
+
+    mocker.patch('src.app.get_file', return_value=LAS_V_2_0)
+    requests_mock.get(
+        re.compile(r'v1/data/.+/.+\.metadata/'), json=[{'_id': 'metadata_id'}]
+    )
+    requests_mock.get(
+        re.compile(r'v1/data/.+/.+\.data/'),
+        json=[
+            {'data': {'md': 1, 'curve': 4}},
+            {'data': {'md': 1, 'curve': 4}},
+            {'data': {'md': 2, 'curve': 5}},
+            {'data': {'md': 3, 'curve': 6}},
+        ],
+    )
+    delete_mock = requests_mock.delete(re.compile(r'v1/data/.+/.+\.data/'))
+    post_mock = requests_mock.post(
+        re.compile(r'v1/data/.+/.+\.data/'), json={'inserted_ids': ['0']}
+    )
+    requests_mock.put(re.compile(r'v1/data/.+/.+\.metadata/metadata_id/'))
+    mocker.patch.object(SETTINGS, 'import_mode', 'diff')
+
+    app_runner(lambda_handler, event)
+
+    assert json.loads(delete_mock.last_request.qs['query'][0])['data.md'] == {
+        '$in': [1]
+    }
+    assert [record['data'] for record in post_mock.last_request.json()] == [
+        {'md': 1, 'curve': 4}
+    ]
@@ -0,0 +1,88 @@
+import lasio
+import pytest
+from pytest_mock import MockerFixture
+
+from src import normalization
+from src.configuration import SETTINGS, Aliases
+from src.constants import MNEMONICS, UNIT_BUCKETS, UNITS
+from src.normalization import NORMALIZER, compile_table, get_normalizer
+
+
+@pytest.mark.parametrize(
+    'unit,expected', (('OHMM', 'ohmm'), ('Ohm.m', 'ohmm'), ('ohm-m', 'ohmm'))
+)
+def test_unit_variants(unit: str, expected: str):
+    assert NORMALIZER.unit(unit) == expected
+    assert NORMALIZER.bucket(unit) == 'Resistivity'
+
+
+@pytest.mark.parametrize('unit', ('OHM', 'Ohm', 'ohm'))
+def test_ohm_is_not_ohmm(unit: str):
+    """The variant of alias 'ohm-' without its trailing separator isn't mapped."""
+
+    assert NORMALIZER.unit(unit) == unit
+    assert NORMALIZER.bucket(unit) == 'Other'
+
+
+def test_ambiguous_variants_are_left_out():
+    table = compile_table({'a.b': 'x', 'a-b': 'y', 'c.d': 'z', 'cd': 'w', '"': 'v'})
+
+    assert 'ab' not in table
+    assert table['cd'] == 'w'
+    assert table['"'] == 'v'
+    assert '' not in table
+
+
+def test_map_section_matches_constants():
+    """Exact aliases map as `src.constants` tables, other values are kept."""
+
+    section = lasio.SectionItems(
+        [
+            lasio.HeaderItem(mnemonic=mnemonic, unit=unit, value=1.5, descr='descr')
+            for mnemonic, unit in (
+                ('dept', 'F'),
+                ('depth', 'M'),
+                ('rhob', 'G/CC'),
+                ('temp', 'degC'),
+                ('curve', 'CURVE'),
+                ('empty', ''),
+            )
+        ]
+    )
+
+    rows = NORMALIZER.map_section(section=section)
+
+    assert [row.model_dump() for row in rows] == [
+        {
+            'data': {
+                'mnemonic': item.mnemonic,
+                'units': item.unit,
+                'value': '1.5',
+                'descr': 'descr',
+            },
+            'mapping': {
+                'mnemonic': MNEMONICS.get(item.mnemonic.lower(), item.mnemonic),
+                'unit': UNITS.get(item.unit.lower(), item.unit),
+                'bucket': UNIT_BUCKETS.get(item.unit.lower(), 'Other'),
+            },
+        }
+        for item in section
+    ]
+
+
+def test_company_aliases(mocker: MockerFixture):
+    mocker.patch.object(
+        SETTINGS,
+        'company_aliases',
+        {1: Aliases(mnemonics={'gr': ['gamma']}, units={'ohmm': ['ohm*m']})},
+    )
+    mocker.patch.object(normalization, 'get_normalizer', get_normalizer.__wrapped__)
+
+    normalizer = normalization.get_normalizer(company_id=1)
+
+    assert normalizer.mnemonic('GAMMA') == 'gr'
+    assert normalizer.unit('Ohm*M') == 'ohmm'
+    assert normalizer.bucket('ohm*m') == 'Resistivity'
+    assert normalizer.mnemonic('dept') == 'md'
+    assert normalization.get_normalizer(company_id=2) is NORMALIZER
+    assert NORMALIZER.mnemonic('gamma') == 'gamma'
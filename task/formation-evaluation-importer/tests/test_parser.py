@@ -0,0 +1,229 @@
+import io
+import mmap
+import pathlib
+
+import lasio
+import numpy as np
+import pytest
+from pytest_mock import MockerFixture
+
+from src import parser, utils
+from tests.test_app import LAS_V_1_2, LAS_V_2_0
+
+
+def test_map_log_data_replaces_nan_with_none():
+    log_data = np.array([[1.0, np.nan], [2.0, 5.0]])
+
+    assert parser.map_log_data(log_data=log_data, curve_mnemonics=['md', 'curve']) == [
+        {'md': 1.0, 'curve': None},
+        {'md': 2.0, 'curve': 5.0},
+    ]
+
+
+def test_map_log_data_drops_nulls():
+    log_data = np.array(
+        [
+            [1.0, -999.25, np.nan],
+            [2.0, 4.0, -999.25],
+            [3.0, 5.0, 7.0],
+            [4.0, -999.25, 8.0],
+        ]
+    )
+
+    assert parser.map_log_data(
+        log_data=log_data,
+        curve_mnemonics=['md', 'gr', 'rhob'],
+        drop_nulls=True,
+        null_value=-999.25,
+    ) == [
+        {'md': 1.0},
+        {'md': 2.0, 'gr': 4.0},
+        {'md': 3.0, 'gr': 5.0, 'rhob': 7.0},
+        {'md': 4.0, 'rhob': 8.0},
+    ]
+
+
+def test_curve_depth_ranges_are_merged_across_chunks():
+    log_data = np.array(
+        [
+            [1.0, -999.25, 1.0],
+            [2.0, 4.0, 1.0],
+            [3.0, 5.0, -999.25],
+            [4.0, -999.25, 1.0],
+            [5.0, 6.0, 1.0],
+        ]
+    )
+    expected_ranges = {
+        'md': [[1.0, 5.0]],
+        'gr': [[2.0, 3.0], [5.0, 5.0]],
+        'rhob': [[1.0, 2.0], [4.0, 5.0]],
+    }
+
+    for size in (1, 2, 5):
+        curve_depth_ranges = parser.CurveDepthRanges(
+            curve_mnemonics=['md', 'gr', 'rhob'], null_value=-999.25
+        )
+
+        for chunk in utils.chunker(seq=log_data, size=size):
+            curve_depth_ranges.update(log_data=chunk)
+
+        assert curve_depth_ranges.ranges == expected_ranges
+
+
+def test_parse_null_value():
+    las_file = LAS_V_2_0.replace('WELL  .WELL    :', 'NULL  .        -999.25 :')
+
+    assert parser.parse(file=las_file).null_value == -999.25
+    assert parser.parse(file=LAS_V_2_0).null_value is None
+
+
+def test_parse_keeps_log_data_columnar():
+    parse_result = parser.parse(file=LAS_V_2_0)
+
+    assert parse_result.curve_mnemonics == ['md', 'curve']
+    assert parse_result.n_log_data_rows == 3
+    np.testing.assert_array_equal(
+        parse_result.log_data, [[1.0, 4.0], [2.0, 5.0], [3.0, 6.0]]
+    )
+
+
+def test_streaming_wrapped_file():
+    """Wrapped rows are regrouped by the number of curves."""
+
+    las_file = LAS_V_2_0.replace('WRAP.    NO', 'WRAP.   YES').replace(
+        '    1.00000    4.00000', '    1.00000\n    4.00000'
+    )
+    file = io.StringIO(las_file)
+
+    header = parser.parse_header(file=file)
+
+    assert [
+        parser.map_log_data(log_data=chunk, curve_mnemonics=header.curve_mnemonics)
+        for chunk in parser.iter_log_data(file=file, header=header, size=2)
+    ] == [
+        [{'md': 1, 'curve': 4}, {'md': 2, 'curve': 5}],
+        [{'md': 3, 'curve': 6}],
+    ]
+
+
+def test_streaming_comma_delimited_file():
+    las_file = (
+        LAS_V_2_0.replace('DLM . SPACE', 'DLM . COMMA')
+        .replace('1.00000    4.00000', '1.00000,4.00000')
+        .replace('2.00000    5.00000', '2.00000,5.00000')
+        .replace('3.00000    6.00000', '3.00000,6.00000')
+    )
+    file = io.StringIO(las_file)
+
+    header = parser.parse_header(file=file)
+
+    assert header.delimiter == ','
+    assert [
+        chunk.tolist()
+        for chunk in parser.iter_log_data(file=file, header=header, size=3)
+    ] == [[[1.0, 4.0], [2.0, 5.0], [3.0, 6.0]]]
+
+
+def synthetic_las_file(n_rows: int, n_curves: int) -> str:
+    rng = np.random.default_rng(0)
+    log_data = rng.normal(scale=1000, size=(n_rows, n_curves))
+    log_data[:, 0] = np.arange(n_rows) * 0.1
+    log_data[:, 1:][rng.random(size=(n_rows, n_curves - 1)) < 0.1] = -999.25
+
+    las_file = lasio.LASFile()
+    las_file.well['NULL'].value = -999.25
+
+    for curve_idx in range(n_curves):
+        las_file.append_curve(
+            'DEPT' if curve_idx == 0 else f'C{curve_idx}', log_data[:, curve_idx]
+        )
+
+    out = io.StringIO()
+    las_file.write(out, fmt='%.6g')
+    return out.getvalue()
+
+
+@pytest.mark.parametrize(
+    'las_file,fast',
+    (
+        (LAS_V_1_2, True),
+        (LAS_V_2_0, True),
+        (
+            LAS_V_2_0.replace('DLM . SPACE', 'DLM .   TAB').replace(
+                '00    ', '00\t'
+            ),
+            True,
+        ),
+        (synthetic_las_file(n_rows=10_000, n_curves=20), True),
+        (
+            # wrapped
+            LAS_V_2_0.replace('WRAP.    NO', 'WRAP.   YES').replace(
+                '    1.00000    4.00000', '    1.00000\n    4.00000'
+            ),
+            False,
+        ),
+        (
+            # irregular, rows are split across lines
+            LAS_V_2_0.replace('    4.00000\n    2.00000', '    4.00000    2.00000\n'),
+            False,
+        ),
+    ),
+)
+@pytest.mark.parametrize('mapped', (False, True))
+def test_read_las_file_matches_lasio(
+    las_file: str, fast: bool, mapped: bool, mocker: MockerFixture, tmp_path: pathlib.Path
+):
+    read_lasio_spy = mocker.spy(parser, 'read_lasio')
+
+    if mapped:
+        path = tmp_path / 'file.las'
+        path.write_bytes(las_file.encode())
+
+        with path.open('rb') as file:
+            content = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    else:
+        content = las_file
+
+    las, log_data = parser.read_las_file(file=content)
+
+    # header only vs the whole file
+    assert (read_lasio_spy.call_args_list[-1].kwargs == {'ignore_data': True}) == fast
+
+    expected = lasio.read(las_file, null_policy='none', mnemonic_case='lower')
+
+    np.testing.assert_array_equal(log_data, expected.data)
+    assert [curve.mnemonic for curve in las.curves] == [
+        curve.mnemonic for curve in expected.curves
+    ]
+
+
+@pytest.mark.parametrize(
+    'las_file',
+    (
+        synthetic_las_file(n_rows=100, n_curves=5),
+        # wrapped, read by lasio
+        synthetic_las_file(n_rows=100, n_curves=5).replace(
+            'WRAP.    NO', 'WRAP.   YES'
+        ),
+    ),
+)
+def test_parse_selects_curves(las_file: str):
+    """Only selected curves are parsed, the curve section keeps all curves."""
+
+    expected = parser.parse(file=las_file)
+    parse_result = parser.parse(file=las_file, curves=['c3', 'C1', 'DEPT', 'missing'])
+
+    assert parse_result.curve_mnemonics == ['md', 'c1', 'c3']
+    assert parse_result.columns == [0, 1, 3]
+    assert parse_result.curves == expected.curves
+    np.testing.assert_array_equal(
+        parse_result.log_data, expected.log_data[:, [0, 1, 3]]
+    )
+
+    file = io.StringIO(las_file)
+    header = parser.parse_header(file=file, curves=['c3', 'C1'])
+
+    np.testing.assert_array_equal(
+        np.concatenate(list(parser.iter_log_data(file=file, header=header, size=30))),
+        parse_result.log_data,
+    )
@@ -0,0 +1,77 @@
+import json
+
+import numpy as np
+
+from src import serialization
+from src.models import FormationEvaluationData, FormationEvaluationDataMetadata
+from src.payloads import DataPayloadBuilder
+
+
+def test_data_payload_builder_matches_models():
+    """Built payloads serialize to the same bytes, as dumped models."""
+
+    rows = [{'md': 1.0, 'curve': 4}, {'md': 2.5, 'curve': -999.25}, {'md': 3}]
+
+    expected = [
+        FormationEvaluationData(
+            asset_id=1,
+            timestamp=2,
+            company_id=3,
+            collection='collection',
+            app='app',
+            provider='provider',
+            metadata=FormationEvaluationDataMetadata(
+                formation_evaluation_id='id', file_name='file'
+            ),
+            data=row,
+            version=4,
+        ).model_dump()
+        for row in rows
+    ]
+
+    actual = DataPayloadBuilder(
+        asset_id=1,
+        timestamp=2,
+        company_id=3,
+        collection='collection',
+        app='app',
+        provider='provider',
+        formation_evaluation_id='id',
+        file_name='file',
+        version=4,
+    ).build(rows=rows)
+
+    assert json.dumps(actual).encode() == json.dumps(expected).encode()
+
+
+def test_data_payload_builder_encode_matches_build():
+    """Encoded records joined into an array equal dumped built records."""
+
+    rows = [{'md': 1.0, 'curve': None}, {'md': 2.5, 'curve': -999.25}]
+    builder = DataPayloadBuilder(
+        asset_id=1,
+        timestamp=2,
+        company_id=3,
+        collection='collection',
+        app='app',
+        provider='provider',
+        formation_evaluation_id='id',
+        file_name='__data_placeholder__',
+        version=4,
+    )
+
+    assert serialization.join(list(builder.encode(rows=rows))) == serialization.dumps(
+        builder.build(rows=rows)
+    )
+
+
+def test_dumps_encodes_numpy_and_nan():
+    """NumPy values are encoded as JSON values, NaN isn't valid JSON, so it's null."""
+
+    data = {'values': np.array([1.5, np.nan]), 'count': np.int64(2), 'md': float('nan')}
+
+    assert json.loads(serialization.dumps(data)) == {
+        'values': [1.5, None],
+        'count': 2,
+        'md': None,
+    }
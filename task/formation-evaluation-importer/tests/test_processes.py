@@ -0,0 +1,34 @@
+import os
+
+from src.processes import ProcessResult, map_processes
+
+
+def square(item: int) -> int:
+    if item == 3:
+        raise ValueError('test_map_processes')
+    if item == 4:
+        os._exit(1)
+    return item * item
+
+
+def test_map_processes_returns_results_in_order():
+    assert map_processes(func=square, items=[0, 1, 2, 3, 4, 5], processes=2) == [
+        ProcessResult(value=0, error=None),
+        ProcessResult(value=1, error=None),
+        ProcessResult(value=4, error=None),
+        ProcessResult(value=None, error='ValueError: test_map_processes'),
+        ProcessResult(value=None, error='Process exited with code 1.'),
+        ProcessResult(value=25, error=None),
+    ]
+
+
+def test_map_processes_runs_in_separate_processes():
+    pids = map_processes(func=lambda _: os.getpid(), items=[0, 1, 2], processes=3)
+
+    assert os.getpid() not in [result.value for result in pids]
+
+
+def test_single_process_runs_in_current_process():
+    pids = map_processes(func=lambda _: os.getpid(), items=[0, 1], processes=1)
+
+    assert [result.value for result in pids] == [os.getpid(), os.getpid()]
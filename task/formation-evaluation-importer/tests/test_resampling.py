@@ -0,0 +1,70 @@
+import numpy as np
+import pytest
+
+from src import resampling, utils
+
+LOG_DATA = np.array(
+    [
+        [1.0, 1.0, 10.0],
+        [1.2, 2.0, -999.25],
+        [1.4, 3.0, 30.0],
+        [1.6, 4.0, 40.0],
+        [1.8, 5.0, -999.25],
+        [2.0, 6.0, -999.25],
+        [2.2, 7.0, 70.0],
+    ]
+)
+
+
+@pytest.mark.parametrize(
+    'method,expected',
+    (
+        (
+            'nearest',
+            [[1.0, 1.0, 10.0], [1.5, 3.0, 30.0], [2.0, 6.0, np.nan]],
+        ),
+        (
+            'mean',
+            [[1.0, 1.5, 10.0], [1.5, 3.5, 35.0], [2.0, 6.0, 70.0]],
+        ),
+        (
+            'envelope',
+            [
+                [1.0, 1.0, 2.0, 10.0, 10.0],
+                [1.5, 3.0, 4.0, 30.0, 40.0],
+                [2.0, 5.0, 7.0, 70.0, 70.0],
+            ],
+        ),
+    ),
+)
+def test_resample(method, expected):
+    resampled = resampling.resample(
+        log_data=LOG_DATA, step=0.5, method=method, null_value=-999.25
+    )
+
+    np.testing.assert_array_equal(resampled, expected)
+
+
+@pytest.mark.parametrize('method', ('nearest', 'mean', 'envelope'))
+@pytest.mark.parametrize('size', (1, 2, 3, 7))
+def test_resampled_chunks_match_resampled_log_data(method, size):
+    for log_data in (LOG_DATA, LOG_DATA[::-1]):
+        chunks = resampling.iter_resampled(
+            chunks=utils.chunker(seq=log_data, size=size),
+            step=0.5,
+            method=method,
+            null_value=-999.25,
+        )
+
+        np.testing.assert_array_equal(
+            np.concatenate(list(chunks)),
+            resampling.resample(
+                log_data=log_data, step=0.5, method=method, null_value=-999.25
+            ),
+        )
+
+
+def test_resampled_curve_mnemonics():
+    assert resampling.resampled_curve_mnemonics(
+        curve_mnemonics=['md', 'gr'], method='envelope'
+    ) == ['md', 'gr_min', 'gr_max']
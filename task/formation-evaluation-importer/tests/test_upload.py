@@ -0,0 +1,261 @@
+import itertools
+import threading
+import time
+
+import pytest
+import requests
+from pytest_mock import MockerFixture
+
+from src.batching import RequestLimits, batch_encoded
+from src.models import SaveDataReponse
+from src.upload import save_batch, upload_chunks
+from src.utils import prefetch
+
+LIMITS = RequestLimits(max_bytes=1_000_000, max_rows=100)
+
+
+def http_error(status_code: int, headers: dict = None) -> requests.HTTPError:
+    response = requests.Response()
+    response.status_code = status_code
+    response.headers.update(headers or {})
+    return requests.HTTPError(response=response)
+
+
+def test_upload_chunks_keeps_order(mocker: MockerFixture):
+    """Responses are returned in chunk order, even if requests finish out of order."""
+
+    def fake_save_batch(batch, **kwargs):
+        # first chunks finish last
+        time.sleep(0.01 * (5 - batch[0]))
+        return SaveDataReponse(inserted_ids=[str(batch[0])])
+
+    mocker.patch('src.upload.save_batch', side_effect=fake_save_batch)
+
+    responses = upload_chunks(
+        api=None,
+        chunks=([idx] for idx in range(5)),
+        collection='collection',
+        provider='provider',
+        max_in_flight=5,
+        limits=LIMITS,
+    )
+
+    assert [response.inserted_ids for response in responses] == [
+        ['0'],
+        ['1'],
+        ['2'],
+        ['3'],
+        ['4'],
+    ]
+
+
+def test_upload_chunks_bounds_in_flight_requests(mocker: MockerFixture):
+    lock = threading.Lock()
+    in_flight = 0
+    max_in_flight = 0
+
+    def fake_save_batch(**kwargs):
+        nonlocal in_flight, max_in_flight
+
+        with lock:
+            in_flight += 1
+            max_in_flight = max(max_in_flight, in_flight)
+
+        time.sleep(0.01)
+
+        with lock:
+            in_flight -= 1
+
+        return SaveDataReponse(inserted_ids=[])
+
+    mocker.patch('src.upload.save_batch', side_effect=fake_save_batch)
+
+    upload_chunks(
+        api=None,
+        chunks=([idx] for idx in range(10)),
+        collection='collection',
+        provider='provider',
+        max_in_flight=2,
+        limits=LIMITS,
+    )
+
+    assert max_in_flight == 2
+
+
+def test_upload_chunks_fails_fast(mocker: MockerFixture):
+    """The first failed save stops pulling new chunks and raises."""
+
+    def fake_save_batch(**kwargs):
+        raise requests.HTTPError('test_upload_chunks_fails_fast')
+
+    mocker.patch('src.upload.save_batch', side_effect=fake_save_batch)
+    chunks = iter([[idx] for idx in range(100)])
+
+    with pytest.raises(requests.HTTPError, match=r'^test_upload_chunks_fails_fast$'):
+        upload_chunks(
+            api=None,
+            chunks=chunks,
+            collection='collection',
+            provider='provider',
+            max_in_flight=2,
+            limits=LIMITS,
+        )
+
+    assert len(list(chunks)) >= 97
+
+
+def test_batch_encoded_limits_rows_and_bytes():
+    encoded = [b'1' * 10] * 5
+
+    assert [
+        len(batch)
+        for batch in batch_encoded(
+            encoded=encoded, limits=RequestLimits(max_bytes=1_000, max_rows=2)
+        )
+    ] == [2, 2, 1]
+    # every record takes 11 bytes in a JSON array, with a separator or a bracket,
+    # so 3 records with the closing bracket take exactly 34 bytes
+    assert [
+        len(batch)
+        for batch in batch_encoded(
+            encoded=encoded, limits=RequestLimits(max_bytes=34, max_rows=100)
+        )
+    ] == [3, 2]
+
+
+def test_save_batch_splits_too_large_batch(mocker: MockerFixture):
+    """413 splits the batch in halves and shrinks the limits."""
+
+    def save_raw_data(api, body, collection, provider, gzip_min_bytes):
+        if body.count(b',') > 1:
+            raise http_error(status_code=413)
+        return SaveDataReponse(inserted_ids=[body.decode()])
+
+    save_mock = mocker.patch('src.upload.save_raw_data', side_effect=save_raw_data)
+    limits = RequestLimits(max_bytes=1_000_000, max_rows=100)
+
+    response = save_batch(
+        api=None,
+        batch=[b'1', b'2', b'3', b'4'],
+        collection='collection',
+        provider='provider',
+        limits=limits,
+        throttle_retries=0,
+        throttle_backoff=0,
+    )
+
+    assert response.inserted_ids == ['[1,2]', '[3,4]']
+    assert save_mock.call_count == 3
+    assert limits.max_bytes < 1_000_000
+
+
+def test_save_batch_retries_throttled_request(mocker: MockerFixture):
+    save_mock = mocker.patch(
+        'src.upload.save_raw_data',
+        side_effect=[
+            http_error(status_code=429, headers={'Retry-After': '0'}),
+            SaveDataReponse(inserted_ids=['0']),
+        ],
+    )
+    sleep_mock = mocker.patch('time.sleep')
+
+    response = save_batch(
+        api=None,
+        batch=[b'1'],
+        collection='collection',
+        provider='provider',
+        limits=LIMITS,
+        throttle_retries=1,
+        throttle_backoff=1,
+    )
+
+    assert response.inserted_ids == ['0']
+    assert save_mock.call_count == 2
+    sleep_mock.assert_called_once_with(0.0)
+
+
+def test_save_batch_gives_up_after_throttle_retries(mocker: MockerFixture):
+    mocker.patch(
+        'src.upload.save_raw_data', side_effect=http_error(status_code=429)
+    )
+    sleep_mock = mocker.patch('time.sleep')
+
+    with pytest.raises(requests.HTTPError):
+        save_batch(
+            api=None,
+            batch=[b'1'],
+            collection='collection',
+            provider='provider',
+            limits=LIMITS,
+            throttle_retries=2,
+            throttle_backoff=1,
+        )
+
+    assert [call.args for call in sleep_mock.call_args_list] == [(1,), (2,)]
+
+
+def test_save_batch_disables_rejected_compression(mocker: MockerFixture):
+    """415 of a compressed request resends it uncompressed and disables gzip."""
+
+    save_mock = mocker.patch(
+        'src.upload.save_raw_data',
+        side_effect=[http_error(status_code=415), SaveDataReponse(inserted_ids=['0'])],
+    )
+    limits = RequestLimits(max_bytes=1_000_000, max_rows=100, gzip_min_bytes=0)
+
+    response = save_batch(
+        api=None,
+        batch=[b'1'],
+        collection='collection',
+        provider='provider',
+        limits=limits,
+        throttle_retries=0,
+        throttle_backoff=0,
+    )
+
+    assert response.inserted_ids == ['0']
+    assert [call.kwargs['gzip_min_bytes'] for call in save_mock.call_args_list] == [0, None]
+    assert limits.gzip_min_bytes is None
+
+
+def test_prefetch_keeps_order_and_raises_producer_errors():
+    def produce():
+        yield from range(5)
+        raise ValueError('test_prefetch')
+
+    items = []
+
+    with pytest.raises(ValueError, match=r'^test_prefetch$'):
+        with prefetch(iterable=produce(), size=2) as prefetched:
+            for item in prefetched:
+                items.append(item)
+
+    assert items == [0, 1, 2, 3, 4]
+
+
+def test_prefetch_stops_producer_when_consumer_stops():
+    produced = []
+
+    def produce():
+        for idx in range(100):
+            produced.append(idx)
+            yield idx
+
+    with prefetch(iterable=produce(), size=2) as prefetched:
+        for item in prefetched:
+            if item == 1:
+                break
+
+    assert len(produced) < 100
+
+
+def test_prefetch_joins_producer_if_consumer_raises():
+    def produce():
+        yield from itertools.count()
+
+    with pytest.raises(ValueError, match=r'^test_prefetch$'):
+        with prefetch(iterable=produce(), size=2) as prefetched:
+            next(prefetched)
+            raise ValueError('test_prefetch')
+
+    assert not [thread for thread in threading.enumerate() if thread.name == 'prefetch']